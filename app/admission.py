@@ -0,0 +1,131 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Sequence
+
+from app.metrics import metrics
+
+requests_rejected = metrics.counter(
+    "aegis_requests_rejected_total", "Requests turned away by admission control, by reason.", ("reason",)
+)
+
+
+class RateLimiter:
+    """
+    Token buckets per key (an agent, a task): each holds up to ``burst``
+    tokens and refills at ``rate`` per second, and a request takes one.
+
+    A bucket is two numbers, updated in O(1) when a request arrives rather
+    than refilled by a timer. At most ``max_keys`` buckets are kept, least
+    recently used first out, and an evicted key starts again with a full
+    bucket, however drained it was. Callers should therefore only charge
+    keys they know to be real (agents and tasks that exist), so that made
+    up keys can neither get fresh buckets nor push out busy ones. A
+    ``rate`` of zero or less admits everything.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        clock: Callable[[], float] = time.monotonic,
+        max_keys: int = 100_000,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # Key -> [tokens, last update].
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+
+    def acquire(self, key: Hashable, tokens: float = 1.0) -> float:
+        """Take ``tokens`` from the key's bucket: 0 if admitted, else the seconds until they would be."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._refill(key)
+            if bucket[0] >= tokens:
+                bucket[0] -= tokens
+                return 0.0
+            return (tokens - bucket[0]) / self.rate
+
+    def wait(self, key: Hashable, tokens: float = 1.0) -> float:
+        """Like ``acquire``, but without taking the tokens."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._refill(key)
+            return 0.0 if bucket[0] >= tokens else (tokens - bucket[0]) / self.rate
+
+    def _refill(self, key: Hashable) -> list:
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+def retry_after(seconds: float) -> str:
+    """A ``Retry-After`` value: whole seconds, rounded up."""
+    return str(max(1, math.ceil(seconds)))
+
+
+class LoadShedMiddleware:
+    """
+    ASGI middleware rejecting requests with 503 and ``Retry-After`` while
+    ``max_in_flight`` are already being handled, so that under overload
+    the requests that are let in still finish quickly instead of every
+    request queueing behind all the others. Long-lived requests (event
+    streams and long polls) and scrapes are not counted or shed; neither
+    is anything when ``max_in_flight`` is zero or less.
+    """
+
+    def __init__(self, app, max_in_flight: int, exempt_prefixes: Sequence[str] = ("/events/", "/metrics")):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.exempt_prefixes = tuple(exempt_prefixes)
+        # Only touched on the event loop thread.
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_in_flight <= 0 or scope["path"].startswith(self.exempt_prefixes):
+            await self.app(scope, receive, send)
+            return
+        if self.in_flight >= self.max_in_flight:
+            requests_rejected.inc("overloaded")
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"content-type", b"application/json"), (b"retry-after", b"1")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server overloaded"}'})
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+
+# Bids per second (and burst) each agent may submit and each task may
+# receive; AEGIS_AGENT_BID_RATE=0 or AEGIS_TASK_BID_RATE=0 lifts a limit.
+agent_bid_limiter = RateLimiter(
+    float(os.environ.get("AEGIS_AGENT_BID_RATE", "100")), float(os.environ.get("AEGIS_AGENT_BID_BURST", "200"))
+)
+task_bid_limiter = RateLimiter(
+    float(os.environ.get("AEGIS_TASK_BID_RATE", "50")), float(os.environ.get("AEGIS_TASK_BID_BURST", "100"))
+)
+# Requests handled at once before new ones are shed; 0 disables shedding.
+MAX_IN_FLIGHT = int(os.environ.get("AEGIS_MAX_IN_FLIGHT", "512"))
@@ -0,0 +1,322 @@
+import glob
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.encoding import task_payloads
+from app.metrics import metrics
+from app.models import ArchivedTask, TaskStatus
+
+logger = logging.getLogger(__name__)
+
+archiver_runs = metrics.counter("aegis_archiver_runs_total", "Background archiver runs, by outcome.", ("outcome",))
+
+SEGMENT_PATTERN = "archive-{:06d}.log"
+# Tasks in these statuses are finished and, after the retention window, archived.
+ARCHIVED_STATUSES = (TaskStatus.VERIFIED, TaskStatus.REJECTED, TaskStatus.PAID, TaskStatus.EXPIRED)
+
+# A frame is the task id, the record format and the length of the record,
+# followed by the record: the ``ArchivedTask`` JSON, zlib-compressed.
+_FRAME = struct.Struct(">16sBI")
+# Index entries of sealed segments: task id and frame offset, sorted by id.
+_ENTRY = struct.Struct(">16sQ")
+
+# Records are compressed one at a time so any one can be read on its own,
+# which leaves zlib little to work with; a preset dictionary of what every
+# record repeats (most frequent last) makes up for most of that. Records
+# name the format they were written with, so a better dictionary can be
+# added as a new format, but this one must never change.
+_FORMAT_V1 = 1
+_ZDICT_V1 = (
+    b'"archived_at":"verification_status":"FAILED","verification_status":"PASSED",'
+    b'"deliverable_blob":null,"deliverable":{"result":"work_products":[{"work_id":"'
+    b'"bidding_deadline":null},"status":"REJECTED","status":"VERIFIED","reward_amount":'
+    b'"required_capabilities":["description":"title":"bid_amount":"agent_id":"'
+    b'"bids":[{"bid_id":"task_id":"{"task":{"task_id":"'
+)
+_ZDICTS = {_FORMAT_V1: _ZDICT_V1}
+
+_encode_record = ArchivedTask.__pydantic_serializer__.to_json
+
+
+def _search(index, key: bytes) -> Optional[int]:
+    """Binary search of a sealed segment's index for the offset of ``key``'s frame."""
+    lo, hi = 0, len(index) // _ENTRY.size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        entry_key, offset = _ENTRY.unpack_from(index, mid * _ENTRY.size)
+        if entry_key < key:
+            lo = mid + 1
+        elif entry_key > key:
+            hi = mid
+        else:
+            return offset
+    return None
+
+
+class ColdStore:
+    """
+    Compressed, append-only on-disk store of archived tasks.
+
+    Records go to the active segment file, fsynced per batch, and are found
+    through an in-memory index of that segment. Once the segment reaches
+    ``segment_bytes`` it is sealed: its index is written next to it as a
+    file of sorted fixed-size entries, which lookups binary search through
+    ``mmap``, so memory use does not grow with the archive. Opening the
+    store scans the active segment to rebuild its index and cuts off a
+    frame torn by a crash. A task archived more than once (after a crash
+    between archiving and removing it) is read back from its newest copy.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, compress_level: int = 6):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.compress_level = compress_level
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Sealed segments, oldest first: (data file descriptor, index).
+        self._sealed: List[Tuple[int, object]] = []
+        segments = sorted(glob.glob(os.path.join(directory, "archive-*.log")))
+        for path in segments[:-1]:
+            fd = os.open(path, os.O_RDONLY)
+            if not os.path.exists(path[:-len(".log")] + ".idx"):
+                self._write_index(path, self._scan(fd, path)[0])
+            self._sealed.append((fd, self._map_index(path)))
+        self._open_active(segments[-1] if segments else os.path.join(directory, SEGMENT_PATTERN.format(0)))
+
+    # Writing
+
+    def append(self, records: List[ArchivedTask]):
+        """Write ``records`` and fsync them."""
+        if not records:
+            return
+        frames = []
+        for record in records:
+            compressor = zlib.compressobj(self.compress_level, zdict=_ZDICT_V1)
+            payload = compressor.compress(_encode_record(record)) + compressor.flush()
+            key = record.task.task_id.bytes
+            frames.append((key, _FRAME.pack(key, _FORMAT_V1, len(payload)) + payload))
+        with self._lock:
+            offset = self._active_size
+            os.write(self._active_fd, b"".join(frame for _, frame in frames))
+            os.fsync(self._active_fd)
+            for key, frame in frames:
+                self._active_index[key] = offset
+                offset += len(frame)
+            self._active_size = offset
+            if self._active_size >= self.segment_bytes:
+                self._seal()
+
+    def _seal(self):
+        self._write_index(self._active_path, self._active_index)
+        # The descriptor is kept for reads, which may be under way with it.
+        self._sealed.append((self._active_fd, self._map_index(self._active_path)))
+        number = int(os.path.basename(self._active_path)[len("archive-"):-len(".log")])
+        self._open_active(os.path.join(self.directory, SEGMENT_PATTERN.format(number + 1)))
+
+    # Reading
+
+    def get(self, task_id: UUID) -> Optional[ArchivedTask]:
+        """The newest archived copy of a task, or ``None``."""
+        key = task_id.bytes
+        with self._lock:
+            offset = self._active_index.get(key)
+            fd = self._active_fd
+            if offset is None:
+                for fd, index in reversed(self._sealed):
+                    offset = _search(index, key)
+                    if offset is not None:
+                        break
+                else:
+                    return None
+            # Descriptors stay open until the store is closed, so read outside the lock.
+        _, record_format, length = _FRAME.unpack(os.pread(fd, _FRAME.size, offset))
+        decompressor = zlib.decompressobj(zdict=_ZDICTS[record_format])
+        payload = decompressor.decompress(os.pread(fd, length, offset + _FRAME.size))
+        return ArchivedTask.model_validate_json(payload)
+
+    def __len__(self) -> int:
+        """Records written, counting a task archived twice twice."""
+        with self._lock:
+            return len(self._active_index) + sum(len(index) // _ENTRY.size for _, index in self._sealed)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._active_size + sum(os.fstat(fd).st_size for fd, _ in self._sealed)
+
+    def close(self):
+        with self._lock:
+            os.close(self._active_fd)
+            for fd, index in self._sealed:
+                os.close(fd)
+                if isinstance(index, mmap.mmap):
+                    index.close()
+            self._sealed = []
+
+    # Files
+
+    def _open_active(self, path: str):
+        self._active_path = path
+        self._active_fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._active_index, self._active_size = self._scan(self._active_fd, path)
+
+    @staticmethod
+    def _scan(fd: int, path: str) -> Tuple[Dict[bytes, int], int]:
+        """Index a segment by reading its frames, cutting off a torn one at the end; also returns its size."""
+        index: Dict[bytes, int] = {}
+        size = os.fstat(fd).st_size
+        offset = 0
+        while offset + _FRAME.size <= size:
+            key, _, length = _FRAME.unpack(os.pread(fd, _FRAME.size, offset))
+            if offset + _FRAME.size + length > size:
+                break
+            index[key] = offset
+            offset += _FRAME.size + length
+        if offset < size:
+            os.truncate(path, offset)
+        return index, offset
+
+    @staticmethod
+    def _write_index(path: str, index: Dict[bytes, int]):
+        index_path = path[:-len(".log")] + ".idx"
+        with open(index_path + ".tmp", "wb") as f:
+            f.write(b"".join(_ENTRY.pack(key, offset) for key, offset in sorted(index.items())))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(index_path + ".tmp", index_path)
+
+    @staticmethod
+    def _map_index(path: str):
+        with open(path[:-len(".log")] + ".idx", "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class TaskArchiver:
+    """
+    Moves finished tasks, with their bids and work products, out of the
+    repository into a ``ColdStore`` once they have been finished for
+    ``retention_seconds``, so the repository holds active work rather than
+    all history. Records are written to the store before the task board
+    removes them, and a task that changed in between is left in place.
+
+    The retention window runs from when the archiver first sees a task
+    finished, as tasks carry no finishing time, so a restart starts it
+    over for tasks still in the repository.
+    """
+
+    def __init__(self, task_board, store: ColdStore, retention_seconds: float = 86400.0,
+                 clock=time.time, batch_size: int = 1000):
+        self.task_board = task_board
+        self.repository = task_board.repository
+        self.store = store
+        self.retention_seconds = retention_seconds
+        self.clock = clock
+        self.batch_size = batch_size
+        self._finished_at: Dict[UUID, float] = {}
+        # One run at a time.
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run(self) -> int:
+        """Archive every task finished for longer than the retention window; returns how many."""
+        with self._lock:
+            now = self.clock()
+            due = []
+            finished_at = {}
+            for status in ARCHIVED_STATUSES:
+                cursor = None
+                while True:
+                    tasks, cursor = self.repository.page_tasks(status, None, None, cursor, self.batch_size)
+                    for task in tasks:
+                        finished_at[task.task_id] = self._finished_at.get(task.task_id, now)
+                        if now - finished_at[task.task_id] >= self.retention_seconds:
+                            due.append(task)
+                    if cursor is None:
+                        break
+            self._finished_at = finished_at
+            if not due:
+                return 0
+
+            due_ids = {task.task_id for task in due}
+            work_products = defaultdict(list)
+            for work_product in self.repository.all_work_products():
+                if work_product.task_id in due_ids:
+                    work_products[work_product.task_id].append(work_product)
+            archived = 0
+            for start in range(0, len(due), self.batch_size):
+                batch = [
+                    ArchivedTask(
+                        task=task,
+                        bids=self.repository.top_bids(task.task_id, self.repository.count_bids(task.task_id)),
+                        work_products=work_products[task.task_id],
+                        archived_at=now,
+                    )
+                    for task in due[start:start + self.batch_size]
+                ]
+                self.store.append(batch)
+                for task_id in self.task_board.remove_archived(batch):
+                    self._finished_at.pop(task_id, None)
+                    task_payloads.invalidate(task_id)
+                    archived += 1
+            return archived
+
+    def _loop(self, interval: float):
+        while not self._stopping.wait(interval):
+            # A failed run (a full disk, say) is retried at the next interval
+            # rather than ending the thread; the tasks stay in the repository.
+            try:
+                self.run()
+            except Exception:
+                logger.exception("Archiving finished tasks failed")
+                archiver_runs.inc("error")
+                continue
+            archiver_runs.inc("ok")
+
+    def start(self, interval: float = 300.0):
+        """Archive every ``interval`` seconds on a background thread."""
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="task-archiver", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+_cold_store: Optional[ColdStore] = None
+
+
+def get_cold_store() -> Optional[ColdStore]:
+    """The active cold store, or ``None`` when archiving is disabled."""
+    return _cold_store
+
+
+def set_cold_store(store: Optional[ColdStore]):
+    global _cold_store
+    _cold_store = store
+
+
+def open_cold_store_from_env(subdirectory: str = "") -> Optional[ColdStore]:
+    """
+    Open the cold store configured by ``AEGIS_ARCHIVE_DIR`` (unset disables
+    archiving), in ``subdirectory`` of it if given.
+    """
+    directory = os.environ.get("AEGIS_ARCHIVE_DIR")
+    if not directory:
+        return None
+    return ColdStore(os.path.join(directory, subdirectory))
+
+
+# Seconds a task stays in the repository after finishing, and between archiver runs.
+ARCHIVE_RETENTION = float(os.environ.get("AEGIS_ARCHIVE_RETENTION", "86400"))
+ARCHIVE_INTERVAL = float(os.environ.get("AEGIS_ARCHIVE_INTERVAL", "300"))
@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from app.metrics import metrics
+from app.models import Bid, Task, OPEN_TASK_STATUSES
+
+# Longest the scheduler sleeps between looks at the clock, so that a
+# change of wall-clock time is noticed.
+MAX_SLEEP_SECONDS = 5.0
+
+auctions_closed = metrics.counter(
+    "aegis_auctions_closed_total", "Auctions closed at their bidding deadline, by outcome.", ("outcome",)
+)
+
+
+class AuctionScheduler:
+    """
+    Closes auctions when their bidding deadline passes.
+
+    Deadlines are kept in a binary heap, so scheduling one and taking the
+    earliest are O(log n), and a single task on the event loop sleeps until
+    the earliest is due; there is no thread or timer per task. Expired
+    auctions are handed to ``close`` (the bidding system's
+    ``close_auction``, which publishes the assignment, or the expiry of an
+    auction nobody bid on) on a worker thread, so the loop never blocks on
+    locks or the journal; they are taken off the heap ``batch_size`` at a
+    time, which bounds how long scheduling waits for the heap's lock.
+
+    Rescheduling or cancelling a task leaves its old heap entry behind; the
+    entry is recognised as stale and skipped when it comes up.
+    """
+
+    def __init__(
+        self,
+        close: Callable[[UUID], Optional[Bid]],
+        clock: Callable[[], float] = time.time,
+        batch_size: int = 256,
+    ):
+        self.close = close
+        self.clock = clock
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[float, int, UUID]] = []
+        self._deadlines: Dict[UUID, float] = {}
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    def schedule(self, task_id: UUID, deadline: float):
+        """Close the task's auction at ``deadline`` (Unix time); safe to call from any thread."""
+        with self._lock:
+            self._deadlines[task_id] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._seq), task_id))
+            earliest = self._heap[0][0] >= deadline
+        if earliest and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def schedule_tasks(self, tasks: Iterable[Task]):
+        """Schedule the auctions of those ``tasks`` that are open and have a deadline."""
+        for task in tasks:
+            if task.bidding_deadline is not None and task.status in OPEN_TASK_STATUSES:
+                self.schedule(task.task_id, task.bidding_deadline)
+
+    def cancel(self, task_id: UUID):
+        """Forget the task's deadline, e.g. once its auction was decided otherwise."""
+        with self._lock:
+            self._deadlines.pop(task_id, None)
+
+    def pending(self) -> int:
+        """Auctions waiting for their deadline."""
+        return len(self._deadlines)
+
+    def next_deadline(self) -> Optional[float]:
+        with self._lock:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def _drop_stale(self):
+        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def take_due(self, now: float) -> List[UUID]:
+        """Up to ``batch_size`` tasks whose deadline is at or before ``now``, earliest first."""
+        due = []
+        with self._lock:
+            self._drop_stale()
+            while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                _, _, task_id = heapq.heappop(self._heap)
+                del self._deadlines[task_id]
+                due.append(task_id)
+                self._drop_stale()
+        return due
+
+    def close_all(self, task_ids: List[UUID]) -> int:
+        """Close the given auctions; returns how many got a winner."""
+        assigned = 0
+        for task_id in task_ids:
+            try:
+                winner = self.close(task_id)
+            except Exception:
+                auctions_closed.inc("error")
+                continue
+            # No winner: the auction expired without bids, or was already decided by hand.
+            auctions_closed.inc("assigned" if winner is not None else "no_winner")
+            assigned += winner is not None
+        return assigned
+
+    def run_due(self, now: Optional[float] = None) -> int:
+        """Close every auction that is due now, on the calling thread."""
+        now = self.clock() if now is None else now
+        assigned = 0
+        while True:
+            due = self.take_due(now)
+            if not due:
+                return assigned
+            assigned += self.close_all(due)
+
+    # Lifecycle
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            deadline = self.next_deadline()
+            delay = MAX_SLEEP_SECONDS if deadline is None else min(deadline - self.clock(), MAX_SLEEP_SECONDS)
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # One hand-off to a worker thread closes everything due, however far behind.
+            await loop.run_in_executor(None, self.run_due)
+
+    def start_thread(self):
+        """Start closing auctions on an event loop of its own, for processes without one."""
+        loop = asyncio.new_event_loop()
+        loop.call_soon(self.start)
+        threading.Thread(target=loop.run_forever, name="auction-scheduler", daemon=True).start()
+
+    def start(self):
+        """Start closing auctions; call from the event loop that should run the scheduler."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._runner = self._loop.create_task(self._run())
+
+    async def stop(self):
+        """Stop the scheduler; pending deadlines stay scheduled."""
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        self._runner = None
+        self._loop = None
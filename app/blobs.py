@@ -0,0 +1,177 @@
+import hashlib
+import os
+import re
+import struct
+import tempfile
+import zlib
+from typing import Iterator, Optional, Tuple
+
+from app.models import BlobRef
+
+# Deliverables whose JSON encoding is larger than this are kept in the blob
+# store, and the work product only carries a reference to them.
+INLINE_DELIVERABLE_LIMIT = 64 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+# Compressed blobs start with their uncompressed size.
+_SIZE_HEADER = struct.Struct("<Q")
+
+
+class BlobWriter:
+    """
+    Streams one blob into the store, hashing (and optionally compressing)
+    it on the way to a temporary file. ``close`` moves the file into place
+    under its digest, or drops it if the store already has that content.
+    """
+
+    def __init__(self, store: "BlobStore", media_type: str):
+        self.store = store
+        self.media_type = media_type
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._compressor = zlib.compressobj(store.compress_level) if store.compress else None
+        self._file = tempfile.NamedTemporaryFile(dir=store.root, prefix=".upload-", delete=False)
+        if self._compressor is not None:
+            self._file.write(_SIZE_HEADER.pack(0))
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        self._hash.update(chunk)
+        if self._compressor is not None:
+            chunk = self._compressor.compress(chunk)
+        self._file.write(chunk)
+
+    def close(self) -> BlobRef:
+        if self._compressor is not None:
+            self._file.write(self._compressor.flush())
+            self._file.seek(0)
+            self._file.write(_SIZE_HEADER.pack(self.size))
+        self._file.close()
+        digest = self._hash.hexdigest()
+        if self.store.stat(digest) is None:
+            path = self.store._path(digest, self._compressor is not None)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._file.name, path)
+        else:
+            os.unlink(self._file.name)
+        return BlobRef(digest=digest, size=self.size, media_type=self.media_type)
+
+    def abort(self):
+        self._file.close()
+        os.unlink(self._file.name)
+
+
+class BlobStore:
+    """
+    Local content-addressed store for large payloads such as deliverables.
+
+    A blob is stored once under the SHA-256 of its content, so identical
+    uploads share one file. With ``compress`` new blobs are written
+    zlib-compressed; digests and sizes always refer to the original bytes,
+    and byte ranges of a compressed blob are served by decompressing up
+    to the end of the range.
+    """
+
+    def __init__(self, root: str, compress: bool = False, compress_level: int = 6):
+        self.root = root
+        self.compress = compress
+        self.compress_level = compress_level
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str, compressed: bool) -> str:
+        return os.path.join(self.root, digest[:2], digest + (".z" if compressed else ""))
+
+    def writer(self, media_type: str = "application/octet-stream") -> BlobWriter:
+        return BlobWriter(self, media_type)
+
+    def put(self, data: bytes, media_type: str = "application/octet-stream") -> BlobRef:
+        writer = self.writer(media_type)
+        try:
+            writer.write(data)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.close()
+
+    def stat(self, digest: str) -> Optional[Tuple[int, bool]]:
+        """The blob's size and whether it is stored compressed, or ``None`` if it is not stored."""
+        if not _DIGEST.fullmatch(digest):
+            return None
+        path = self._path(digest, False)
+        if os.path.exists(path):
+            return os.path.getsize(path), False
+        path = self._path(digest, True)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return _SIZE_HEADER.unpack(f.read(_SIZE_HEADER.size))[0], True
+        return None
+
+    def read(self, digest: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """The blob's bytes from ``start`` up to (not including) ``end``, in chunks."""
+        stat = self.stat(digest)
+        if stat is None:
+            raise KeyError(digest)
+        size, compressed = stat
+        end = size if end is None else min(end, size)
+        if compressed:
+            return self._read_compressed(self._path(digest, True), start, end)
+        return self._read_raw(self._path(digest, False), start, end)
+
+    @staticmethod
+    def _read_raw(path: str, start: int, end: int) -> Iterator[bytes]:
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(READ_CHUNK_BYTES, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+
+    @staticmethod
+    def _read_compressed(path: str, start: int, end: int) -> Iterator[bytes]:
+        decompressor = zlib.decompressobj()
+        position = 0
+        data = b""
+        with open(path, "rb") as f:
+            f.seek(_SIZE_HEADER.size)
+            while position < end:
+                if not data:
+                    data = f.read(READ_CHUNK_BYTES)
+                    if not data:
+                        # Whatever zlib still holds back is less than its window.
+                        tail = decompressor.flush()[max(start - position, 0):end - position]
+                        if tail:
+                            yield tail
+                        return
+                # Inflate a chunk at a time, as a few kilobytes of input can
+                # expand to gigabytes; the rest of the input is kept for later.
+                chunk = decompressor.decompress(data, READ_CHUNK_BYTES)
+                data = decompressor.unconsumed_tail
+                chunk_start, position = position, position + len(chunk)
+                if position > start:
+                    yield chunk[max(start - chunk_start, 0):end - chunk_start]
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """
+    The process-wide blob store, in ``AEGIS_BLOB_DIR`` (default ``./blobs``),
+    compressing new blobs when ``AEGIS_BLOB_COMPRESS`` is ``1``.
+    """
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore(
+            os.environ.get("AEGIS_BLOB_DIR", "blobs"),
+            compress=os.environ.get("AEGIS_BLOB_COMPRESS", "0") == "1",
+        )
+    return _blob_store
+
+
+def set_blob_store(store: Optional[BlobStore]):
+    global _blob_store
+    _blob_store = store
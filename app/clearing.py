@@ -0,0 +1,213 @@
+import heapq
+import threading
+import time
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from app.models import Agent, Bid, MarketClearing, TaskStatus
+
+# Quality assumed for agents without any verified work yet.
+NEW_AGENT_QUALITY = 0.5
+# Bids considered per task at a clearing tick; the cheapest ones.
+MAX_BIDS_PER_TASK = 1000
+TASK_PAGE_SIZE = 1000
+
+
+def agent_quality(agent: Agent) -> float:
+    """
+    How much to trust an agent, from 0 to 1: its mean verification score
+    (out of 100) times the fraction of its work that passed.
+    """
+    if agent.completed_tasks + agent.failed_tasks == 0:
+        return NEW_AGENT_QUALITY
+    return min(max(agent.reputation_score / 100.0, 0.0), 1.0) * agent.success_rate
+
+
+def bid_cost(bid: Bid, agent: Agent, reputation_weight: float) -> float:
+    """
+    What accepting a bid costs the market: its amount, marked up by up to
+    ``reputation_weight`` times for an agent of no proven quality.
+    """
+    return bid.bid_amount * (1.0 + reputation_weight * (1.0 - agent_quality(agent)))
+
+
+def solve_assignment(
+    options: Sequence[Sequence[Tuple[Hashable, float]]],
+    capacities: Dict[Hashable, int],
+    unassigned_cost: float,
+) -> List[Optional[Hashable]]:
+    """
+    Min-cost assignment of tasks to agents with per-agent capacities.
+
+    ``options[t]`` lists the ``(agent, cost)`` pairs task ``t`` can go to
+    (costs must not be negative); an agent takes at most ``capacities[agent]``
+    tasks, and leaving a task unassigned costs ``unassigned_cost``. Returns
+    each task's agent, or ``None``.
+
+    This is min-cost flow over the bid graph by successive shortest paths:
+    tasks are added one at a time, each along the cheapest path in the
+    residual graph, which may move already placed tasks to other agents
+    (or back to unassigned) to make room. Dijkstra runs on reduced costs
+    from node potentials, so the reverse edges' negative costs are no
+    obstacle, and stops as soon as the path is found; with the search
+    bounded by ``unassigned_cost`` it stays local. Only the bid edges are
+    touched, so the cost is driven by the number of bids, not tasks times
+    agents.
+    """
+    # Nodes are ints: tasks first, then agents; the sink is -1.
+    task_count = len(options)
+    agent_keys = list(capacities)
+    agent_node = {agent: task_count + index for index, agent in enumerate(agent_keys)}
+    capacity = [capacities[agent] for agent in agent_keys]
+    edges = [[(agent_node[agent], cost) for agent, cost in task_options] for task_options in options]
+    holders: List[List[int]] = [[] for _ in agent_keys]
+    assigned: List[Optional[int]] = [None] * task_count
+    assigned_cost = [0.0] * task_count
+    # Agents that fill up drift below zero; free agents and the sink stay at zero.
+    potential = [0.0] * (task_count + len(agent_keys))
+    infinity = float("inf")
+    sink = -1
+
+    for source in range(task_count):
+        if not edges[source]:
+            continue
+        distance = {source: 0.0}
+        previous = {}
+        scanned = {}
+        heap = [(0.0, source)]
+        while True:
+            d, node = heapq.heappop(heap)
+            if node == sink:
+                reached = d
+                break
+            if node in scanned:
+                continue
+            scanned[node] = d
+            base = d + potential[node]
+            if node < task_count:
+                own = assigned[node]
+                for agent, cost in edges[node]:
+                    if agent == own:
+                        continue
+                    candidate = base + cost - potential[agent]
+                    if candidate < d:
+                        candidate = d  # rounding
+                    if candidate < distance.get(agent, infinity):
+                        distance[agent] = candidate
+                        previous[agent] = node
+                        heapq.heappush(heap, (candidate, agent))
+                candidate = base + unassigned_cost
+            else:
+                held = holders[node - task_count]
+                for task in held:
+                    candidate = base - assigned_cost[task] - potential[task]
+                    if candidate < d:
+                        candidate = d
+                    if candidate < distance.get(task, infinity):
+                        distance[task] = candidate
+                        previous[task] = node
+                        heapq.heappush(heap, (candidate, task))
+                if len(held) >= capacity[node - task_count]:
+                    continue
+                candidate = base if base > d else d
+            if candidate < distance.get(sink, infinity):
+                distance[sink] = candidate
+                previous[sink] = node
+                heapq.heappush(heap, (candidate, sink))
+
+        # Keep reduced costs non-negative for the next search.
+        for node, d in scanned.items():
+            potential[node] += d - reached
+
+        # Walk the path back: source -> agent -> task -> agent ... -> sink.
+        # Each agent on it takes the task before it; a path ending at a
+        # task (rather than an agent with room) leaves that task unassigned.
+        node = previous[sink]
+        if node == source:
+            continue
+        if node < task_count:
+            holders[assigned[node] - task_count].remove(node)
+            assigned[node] = None
+            node = previous[node]
+        while True:
+            task = previous[node]
+            if assigned[task] is not None:
+                holders[assigned[task] - task_count].remove(task)
+            assigned[task] = node
+            assigned_cost[task] = next(cost for agent, cost in edges[task] if agent == node)
+            holders[node - task_count].append(task)
+            if task == source:
+                break
+            node = previous[task]
+    return [None if agent is None else agent_keys[agent - task_count] for agent in assigned]
+
+
+class MarketClearer:
+    """
+    Batch market clearing: at a clearing tick, all tasks open for bidding
+    and their bids are assigned together, minimising the total reputation-
+    weighted cost with each agent holding at most ``capacity`` tasks
+    (counting those it was awarded earlier and has yet to submit), rather
+    than each task simply going to its lowest bid. Works over the local or
+    the sharded components alike.
+    """
+
+    def __init__(self, task_board, agent_registry, bidding_system):
+        self.task_board = task_board
+        self.agent_registry = agent_registry
+        self.bidding_system = bidding_system
+        # One clearing tick at a time; a concurrent one would only find its auctions taken.
+        self._lock = threading.Lock()
+
+    def open_auctions(self) -> Tuple[List[UUID], List[List[Bid]], Dict[UUID, Agent]]:
+        task_ids, bids, agents = [], [], {}
+        cursor = None
+        while True:
+            tasks, cursor = self.task_board.list_tasks(TaskStatus.BIDDING_OPEN, None, None, cursor, TASK_PAGE_SIZE)
+            for task in tasks:
+                task_bids = self.bidding_system.get_top_bids(task.task_id, MAX_BIDS_PER_TASK)
+                if not task_bids:
+                    continue
+                task_ids.append(task.task_id)
+                bids.append(task_bids)
+                for bid in task_bids:
+                    if bid.agent_id not in agents:
+                        agents[bid.agent_id] = self.agent_registry.get_agent(bid.agent_id)
+            if cursor is None:
+                return task_ids, bids, agents
+
+    def clear(self, capacity: int = 1, reputation_weight: float = 1.0, dry_run: bool = False) -> MarketClearing:
+        """Assign the open auctions; with ``dry_run``, only report what would be assigned."""
+        with self._lock:
+            return self._clear(capacity, reputation_weight, dry_run)
+
+    def _clear(self, capacity: int, reputation_weight: float, dry_run: bool) -> MarketClearing:
+        started = time.perf_counter()
+        task_ids, bids, agents = self.open_auctions()
+        options = []
+        for task_bids in bids:
+            options.append([
+                (bid.agent_id, bid_cost(bid, agents[bid.agent_id], reputation_weight))
+                for bid in task_bids
+                if agents.get(bid.agent_id) is not None
+            ])
+        highest = max((cost for task_options in options for _, cost in task_options), default=0.0)
+        held = self.task_board.held_task_counts(list(agents))
+        capacities = {agent_id: max(capacity - held.get(agent_id, 0), 0) for agent_id in agents}
+        # Leaving a task open is worse than taking any single bid on it.
+        solution = solve_assignment(options, capacities, 2 * highest + 1)
+
+        result = MarketClearing(tasks=len(task_ids), agents=len(agents), dry_run=dry_run)
+        for task_id, task_bids, task_options, agent_id in zip(task_ids, bids, options, solution):
+            if agent_id is None:
+                result.unassigned.append(task_id)
+                continue
+            bid = next(bid for bid in task_bids if bid.agent_id == agent_id)
+            if not dry_run and self.bidding_system.award_bid(task_id, bid.bid_id) is None:
+                # The auction changed since it was read (new bids, a manual decision); next tick.
+                result.unassigned.append(task_id)
+                continue
+            result.assignments.append(bid)
+            result.total_cost += dict(task_options)[agent_id]
+        result.elapsed_seconds = time.perf_counter() - started
+        return result
@@ -0,0 +1,543 @@
+import math
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sortedcontainers import SortedList
+
+from app.indexes import ReputationIndex
+from app.models import Task, Agent, Bid, WorkProduct, TaskStatus, HELD_TASK_STATUSES, OPEN_TASK_STATUSES
+from app.repository import AlreadyExists, Repository
+
+# Task statuses are stored as their position in the enum.
+TASK_STATUSES = tuple(TaskStatus)
+STATUS_CODES = {status: code for code, status in enumerate(TASK_STATUSES)}
+OPEN_STATUS_CODES = frozenset(STATUS_CODES[status] for status in OPEN_TASK_STATUSES)
+HELD_STATUS_CODES = frozenset(STATUS_CODES[status] for status in HELD_TASK_STATUSES)
+# The status code of a removed task's row.
+REMOVED = -1
+
+# Ordered indexes hold a single int per entry: an order-preserving encoding
+# of an amount in the high bits and the row number in the low ``ROW_BITS``,
+# so entries sort by (amount, row) without a tuple and a float per entry.
+ROW_BITS = 40
+ROW_MASK = (1 << ROW_BITS) - 1
+_DOUBLE = struct.Struct("<d")
+
+
+def _sort_key(amount: float, row: int) -> int:
+    bits = int.from_bytes(_DOUBLE.pack(amount + 0.0), "little", signed=True)
+    if bits < 0:
+        # Negative doubles order backwards as integers; flip all but the sign.
+        bits ^= 0x7FFFFFFFFFFFFFFF
+    return bits << ROW_BITS | row
+
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _split(uuid: UUID) -> Tuple[int, int]:
+    return uuid.int >> 64, uuid.int & 0xFFFFFFFFFFFFFFFF
+
+
+class AgentRecord:
+    """An agent's mutable fields, with its capabilities as a capability set ID."""
+
+    __slots__ = (
+        "capability_set", "reputation_score", "completed_tasks", "failed_tasks", "success_rate",
+        "score_variance", "recent_score", "recent_score_weight", "last_scored_at",
+    )
+
+    def __init__(self, capability_set: int, agent: Agent):
+        self.capability_set = capability_set
+        self.reputation_score = agent.reputation_score
+        self.completed_tasks = agent.completed_tasks
+        self.failed_tasks = agent.failed_tasks
+        self.success_rate = agent.success_rate
+        self.score_variance = agent.score_variance
+        self.recent_score = agent.recent_score
+        self.recent_score_weight = agent.recent_score_weight
+        self.last_scored_at = agent.last_scored_at
+
+
+class CompactRepository(Repository):
+    """
+    In-process repository that keeps tasks and bids in column arrays
+    instead of one pydantic object per entity.
+
+    A task is a row number: its ID, reward and status code live in typed
+    arrays, its capabilities as the ID of an interned capability set (most
+    tasks share a handful of sets), and only the title and description are
+    Python strings. Bids are rows of (task row, agent row, amount) columns.
+    Ordered indexes hold plain ints (see ``_sort_key``), and models are
+    only built when an entity is handed out, so each call returns a fresh
+    copy and changes are written back through the ``update_*`` methods.
+    Building those copies makes reads several times slower than the
+    ``InMemoryRepository``, which hands out the stored objects themselves.
+    Reads take the lock that writes hold, so a row is never read half
+    written or half removed. Work products, in a plain dict, need no lock.
+
+    Bid rows are never reused, so a withdrawn or replaced bid keeps its
+    40 bytes of columns until ``clear()``, and so does a removed task's
+    row (its strings and index entries are dropped); work products are
+    few and keep their free-form deliverables, so they are stored as
+    models.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Capabilities and capability sets, interned.
+        self._capability_ids: Dict[str, int] = {}
+        self._set_ids: Dict[Tuple[int, ...], int] = {}
+        self._set_names: List[Tuple[str, ...]] = []
+        self._set_masks: List[int] = []
+
+        # Tasks, one row each.
+        self._task_rows: Dict[int, int] = {}
+        self._task_id_high = array("Q")
+        self._task_id_low = array("Q")
+        self._titles: List[str] = []
+        self._descriptions: List[str] = []
+        self._task_sets = array("l")
+        self._rewards = array("d")
+        self._statuses = array("b")
+        # NaN where a task has no bidding deadline.
+        self._deadlines = array("d")
+        # The winning bid, once assigned: its ID, amount and agent row (-1 for none).
+        self._winner_id_high = array("Q")
+        self._winner_id_low = array("Q")
+        self._winner_amounts = array("d")
+        self._winner_agents = array("q")
+        # Tasks held (assigned or in progress) per agent row.
+        self._held: Dict[int, int] = {}
+        # Task rows by status, ordered by row or by reward key; ``None`` holds every task.
+        self._by_status: Dict[int, SortedList] = {code: SortedList() for code in STATUS_CODES.values()}
+        self._by_reward: Dict[Optional[int], SortedList] = {code: SortedList() for code in [None, *STATUS_CODES.values()]}
+        self._rows_by_capability: Dict[int, array] = {}
+        self._open_rows_by_set: Dict[int, Set[int]] = {}
+
+        # Agents, one row each; agents only seen through bids have no record.
+        self._agent_rows: Dict[int, int] = {}
+        self._agent_ids: List[UUID] = []
+        self._agents: List[Optional[AgentRecord]] = []
+        self._agent_rows_by_set: Dict[int, Set[int]] = {}
+        self._reputation = ReputationIndex()
+
+        # Bids, one row each, and each task's live bids as a sorted book of keys.
+        self._bid_rows: Dict[int, int] = {}
+        self._bid_rows_by_agent: Dict[int, int] = {}
+        self._bid_id_high = array("Q")
+        self._bid_id_low = array("Q")
+        self._bid_tasks = array("q")
+        self._bid_agents = array("q")
+        self._bid_amounts = array("d")
+        self._books: Dict[int, SortedList] = {}
+
+        self._work_products: Dict[UUID, WorkProduct] = {}
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def count_entities(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "tasks": len(self._task_rows),
+                "agents": sum(record is not None for record in self._agents),
+                "bids": sum(len(book) for book in self._books.values()),
+                "work_products": len(self._work_products),
+            }
+
+    # Interning
+
+    def _capability_set(self, capabilities: List[str]) -> int:
+        ids = []
+        for capability in capabilities:
+            capability_id = self._capability_ids.get(capability)
+            if capability_id is None:
+                capability_id = self._capability_ids[sys.intern(capability)] = len(self._capability_ids)
+            ids.append(capability_id)
+        key = tuple(ids)
+        set_id = self._set_ids.get(key)
+        if set_id is None:
+            set_id = self._set_ids[key] = len(self._set_names)
+            self._set_names.append(tuple(sys.intern(capability) for capability in capabilities))
+            mask = 0
+            for capability_id in ids:
+                mask |= 1 << capability_id
+            self._set_masks.append(mask)
+        return set_id
+
+    def _known_mask(self, capabilities: Iterable[str]) -> int:
+        mask = 0
+        for capability in capabilities:
+            capability_id = self._capability_ids.get(capability)
+            if capability_id is not None:
+                mask |= 1 << capability_id
+        return mask
+
+    def _agent_row(self, agent_id: UUID) -> int:
+        row = self._agent_rows.get(agent_id.int)
+        if row is None:
+            row = len(self._agent_ids)
+            self._agent_ids.append(agent_id)
+            self._agents.append(None)
+            self._agent_rows[agent_id.int] = row
+        return row
+
+    # Tasks
+
+    def _task(self, row: int) -> Task:
+        return Task(
+            task_id=UUID(int=self._task_id_high[row] << 64 | self._task_id_low[row]),
+            title=self._titles[row],
+            description=self._descriptions[row],
+            required_capabilities=list(self._set_names[self._task_sets[row]]),
+            reward_amount=self._rewards[row],
+            status=TASK_STATUSES[self._statuses[row]],
+            bidding_deadline=None if math.isnan(self._deadlines[row]) else self._deadlines[row],
+            winning_bid=self._winner(row),
+        )
+
+    def _winner(self, row: int) -> Optional[Bid]:
+        agent_row = self._winner_agents[row]
+        if agent_row < 0:
+            return None
+        return Bid(
+            bid_id=UUID(int=self._winner_id_high[row] << 64 | self._winner_id_low[row]),
+            task_id=UUID(int=self._task_id_high[row] << 64 | self._task_id_low[row]),
+            agent_id=self._agent_ids[agent_row],
+            bid_amount=self._winner_amounts[row],
+        )
+
+    def _set_winner(self, row: int, bid: Optional[Bid]):
+        if bid is None:
+            self._winner_agents[row] = -1
+            return
+        self._winner_id_high[row], self._winner_id_low[row] = _split(bid.bid_id)
+        self._winner_amounts[row] = bid.bid_amount
+        self._winner_agents[row] = self._agent_row(bid.agent_id)
+
+    def _hold(self, row: int, code: int, delta: int):
+        """Count a task in status ``code`` for (``delta`` 1) or against (-1) the agent it was awarded to."""
+        agent_row = self._winner_agents[row]
+        if code in HELD_STATUS_CODES and agent_row >= 0:
+            held = self._held.get(agent_row, 0) + delta
+            if held:
+                self._held[agent_row] = held
+            else:
+                del self._held[agent_row]
+
+    def add_task(self, task: Task):
+        with self._lock:
+            if task.task_id.int in self._task_rows:
+                raise AlreadyExists("Task already exists")
+            row = len(self._titles)
+            set_id = self._capability_set(task.required_capabilities)
+            code = STATUS_CODES[task.status]
+            high, low = _split(task.task_id)
+            self._task_id_high.append(high)
+            self._task_id_low.append(low)
+            self._titles.append(task.title)
+            self._descriptions.append(task.description)
+            self._task_sets.append(set_id)
+            self._rewards.append(task.reward_amount)
+            self._statuses.append(code)
+            self._deadlines.append(math.nan if task.bidding_deadline is None else task.bidding_deadline)
+            self._winner_id_high.append(0)
+            self._winner_id_low.append(0)
+            self._winner_amounts.append(0.0)
+            self._winner_agents.append(-1)
+            self._set_winner(row, task.winning_bid)
+            self._hold(row, code, 1)
+            self._index_status(row, code)
+            for capability_id in _bits(self._set_masks[set_id]):
+                self._rows_by_capability.setdefault(capability_id, array("q")).append(row)
+            self._task_rows[task.task_id.int] = row
+
+    def _index_status(self, row: int, code: int):
+        reward_key = _sort_key(self._rewards[row], row)
+        self._by_status[code].add(row)
+        self._by_reward[code].add(reward_key)
+        self._by_reward[None].add(reward_key)
+        if code in OPEN_STATUS_CODES:
+            self._open_rows_by_set.setdefault(self._task_sets[row], set()).add(row)
+
+    def get_task(self, task_id: UUID) -> Optional[Task]:
+        with self._lock:
+            row = self._task_rows.get(task_id.int)
+            return None if row is None else self._task(row)
+
+    def update_task_status(self, task: Task, status: TaskStatus):
+        task.status = status
+        code = STATUS_CODES[status]
+        with self._lock:
+            row = self._task_rows[task.task_id.int]
+            old_code = self._statuses[row]
+            self._hold(row, old_code, -1)
+            self._set_winner(row, task.winning_bid)
+            self._hold(row, code, 1)
+            if old_code == code:
+                return
+            self._by_status[old_code].remove(row)
+            self._by_reward[old_code].remove(_sort_key(self._rewards[row], row))
+            if old_code in OPEN_STATUS_CODES and code not in OPEN_STATUS_CODES:
+                self._open_rows_by_set[self._task_sets[row]].discard(row)
+            self._statuses[row] = code
+            reward_key = _sort_key(self._rewards[row], row)
+            self._by_status[code].add(row)
+            self._by_reward[code].add(reward_key)
+            if code in OPEN_STATUS_CODES:
+                self._open_rows_by_set.setdefault(self._task_sets[row], set()).add(row)
+
+    def all_tasks(self) -> List[Task]:
+        with self._lock:
+            return [self._task(row) for row in range(len(self._titles)) if self._statuses[row] != REMOVED]
+
+    def page_tasks(self, status, capability, min_reward, cursor, limit):
+        with self._lock:
+            rows = self._page_rows(status, capability, min_reward, cursor, limit)
+            next_cursor = rows[limit - 1] if len(rows) > limit else None
+            return [self._task(row) for row in rows[:limit]], next_cursor
+
+    def _page_rows(self, status, capability, min_reward, cursor, limit) -> List[int]:
+        code = None if status is None else STATUS_CODES[status]
+        capability_id = None
+        if capability is not None:
+            capability_id = self._capability_ids.get(capability)
+            if capability_id is None:
+                return []
+        if min_reward is not None:
+            start = _sort_key(min_reward, 0) - 1
+            if cursor is not None:
+                if not 0 <= cursor < len(self._titles):
+                    raise ValueError("Invalid cursor")
+                start = max(start, _sort_key(self._rewards[cursor], cursor))
+            rows = (key & ROW_MASK for key in self._by_reward[code].irange(minimum=start, inclusive=(False, True)))
+            if capability_id is not None:
+                bit = 1 << capability_id
+                rows = (row for row in rows if self._set_masks[self._task_sets[row]] & bit)
+        elif capability_id is not None:
+            postings = self._rows_by_capability.get(capability_id, array("q"))
+            rows = islice(postings, bisect_right(postings, -1 if cursor is None else cursor), None)
+            if code is not None:
+                rows = (row for row in rows if self._statuses[row] == code)
+            else:
+                rows = (row for row in rows if self._statuses[row] != REMOVED)
+        elif code is not None:
+            rows = self._by_status[code].irange(minimum=cursor, inclusive=(False, True))
+        else:
+            rows = range(0 if cursor is None else max(cursor + 1, 0), len(self._titles))
+            rows = (row for row in rows if self._statuses[row] != REMOVED)
+        return list(islice(rows, limit + 1))
+
+    def eligible_tasks(self, capabilities: Iterable[str]) -> List[Task]:
+        with self._lock:
+            agent_mask = self._known_mask(capabilities)
+            rows = sorted(
+                row
+                for set_id, open_rows in self._open_rows_by_set.items()
+                if not self._set_masks[set_id] & ~agent_mask
+                for row in open_rows
+            )
+            return [self._task(row) for row in rows]
+
+    def remove_task(self, task_id: UUID) -> Optional[Task]:
+        with self._lock:
+            row = self._task_rows.pop(task_id.int, None)
+            if row is None:
+                return None
+            task = self._task(row)
+            code = self._statuses[row]
+            reward_key = _sort_key(self._rewards[row], row)
+            self._by_status[code].remove(row)
+            self._by_reward[code].remove(reward_key)
+            self._by_reward[None].remove(reward_key)
+            if code in OPEN_STATUS_CODES:
+                self._open_rows_by_set[self._task_sets[row]].discard(row)
+            self._hold(row, code, -1)
+            # Capability postings keep the row; listings skip removed rows.
+            self._statuses[row] = REMOVED
+            self._titles[row] = self._descriptions[row] = ""
+            for key in self._books.pop(row, ()):
+                bid_row = key & ROW_MASK
+                del self._bid_rows[self._bid_id_high[bid_row] << 64 | self._bid_id_low[bid_row]]
+                del self._bid_rows_by_agent[row << ROW_BITS | self._bid_agents[bid_row]]
+            return task
+
+    def count_held_tasks(self, agent_ids: Iterable[UUID]) -> Dict[UUID, int]:
+        with self._lock:
+            held = {}
+            for agent_id in agent_ids:
+                agent_row = self._agent_rows.get(agent_id.int)
+                if agent_row in self._held:
+                    held[agent_id] = self._held[agent_row]
+            return held
+
+    # Agents
+
+    def _agent(self, row: int) -> Agent:
+        record = self._agents[row]
+        return Agent(
+            agent_id=self._agent_ids[row],
+            capabilities=list(self._set_names[record.capability_set]),
+            reputation_score=record.reputation_score,
+            completed_tasks=record.completed_tasks,
+            failed_tasks=record.failed_tasks,
+            success_rate=record.success_rate,
+            score_variance=record.score_variance,
+            recent_score=record.recent_score,
+            recent_score_weight=record.recent_score_weight,
+            last_scored_at=record.last_scored_at,
+        )
+
+    def add_agent(self, agent: Agent):
+        with self._lock:
+            row = self._agent_row(agent.agent_id)
+            previous = self._agents[row]
+            if previous is not None:
+                self._agent_rows_by_set[previous.capability_set].discard(row)
+            record = AgentRecord(self._capability_set(agent.capabilities), agent)
+            self._agents[row] = record
+            self._agent_rows_by_set.setdefault(record.capability_set, set()).add(row)
+            self._reputation.add_agent(agent)
+
+    def get_agent(self, agent_id: UUID) -> Optional[Agent]:
+        with self._lock:
+            row = self._agent_rows.get(agent_id.int)
+            if row is None or self._agents[row] is None:
+                return None
+            return self._agent(row)
+
+    def update_agent(self, agent: Agent):
+        self.add_agent(agent)
+
+    def all_agents(self) -> List[Agent]:
+        with self._lock:
+            return [self._agent(row) for row, record in enumerate(self._agents) if record is not None]
+
+    def qualified_agents(self, required_capabilities: Iterable[str]) -> List[Agent]:
+        required = set(required_capabilities)
+        with self._lock:
+            task_mask = self._known_mask(required)
+            if len(required) != bin(task_mask).count("1"):
+                # Some requirement was never interned, so no agent can have it.
+                return []
+            rows = sorted(
+                row
+                for set_id, agent_rows in self._agent_rows_by_set.items()
+                if self._set_masks[set_id] & task_mask == task_mask
+                for row in agent_rows
+            )
+            return [self._agent(row) for row in rows]
+
+    def top_agents(self, capability: Optional[str], k: int) -> List[Agent]:
+        with self._lock:
+            agent_ids = self._reputation.top(capability, k)
+            return [self._agent(self._agent_rows[agent_id.int]) for agent_id in agent_ids]
+
+    def agent_rank(self, agent_id: UUID, capability: Optional[str]) -> Optional[int]:
+        with self._lock:
+            return self._reputation.rank(agent_id, capability)
+
+    # Bids
+
+    def _bid(self, row: int) -> Bid:
+        task_row = self._bid_tasks[row]
+        return Bid(
+            bid_id=UUID(int=self._bid_id_high[row] << 64 | self._bid_id_low[row]),
+            task_id=UUID(int=self._task_id_high[task_row] << 64 | self._task_id_low[task_row]),
+            agent_id=self._agent_ids[self._bid_agents[row]],
+            bid_amount=self._bid_amounts[row],
+        )
+
+    def _remove_bid(self, row: int):
+        task_row = self._bid_tasks[row]
+        self._books[task_row].remove(_sort_key(self._bid_amounts[row], row))
+        del self._bid_rows[self._bid_id_high[row] << 64 | self._bid_id_low[row]]
+        del self._bid_rows_by_agent[task_row << ROW_BITS | self._bid_agents[row]]
+
+    def add_bid(self, bid: Bid) -> Optional[Bid]:
+        with self._lock:
+            task_row = self._task_rows[bid.task_id.int]
+            agent_row = self._agent_row(bid.agent_id)
+            replaced = None
+            previous = self._bid_rows_by_agent.get(task_row << ROW_BITS | agent_row)
+            same_id = self._bid_rows.get(bid.bid_id.int)
+            if same_id is not None and same_id != previous:
+                raise AlreadyExists("Bid already exists")
+            if previous is not None:
+                replaced = self._bid(previous)
+                self._remove_bid(previous)
+            row = len(self._bid_amounts)
+            high, low = _split(bid.bid_id)
+            self._bid_id_high.append(high)
+            self._bid_id_low.append(low)
+            self._bid_tasks.append(task_row)
+            self._bid_agents.append(agent_row)
+            self._bid_amounts.append(bid.bid_amount)
+            if task_row not in self._books:
+                self._books[task_row] = SortedList()
+            self._books[task_row].add(_sort_key(bid.bid_amount, row))
+            self._bid_rows[bid.bid_id.int] = row
+            self._bid_rows_by_agent[task_row << ROW_BITS | agent_row] = row
+            return replaced
+
+    def withdraw_bid(self, task_id: UUID, bid_id: UUID) -> Optional[Bid]:
+        with self._lock:
+            row = self._bid_rows.get(bid_id.int)
+            if row is None or self._bid_tasks[row] != self._task_rows.get(task_id.int):
+                return None
+            bid = self._bid(row)
+            self._remove_bid(row)
+            return bid
+
+    def count_bids(self, task_id: UUID) -> int:
+        with self._lock:
+            return len(self._books.get(self._task_rows.get(task_id.int), ()))
+
+    def has_bid(self, task_id: UUID, agent_id: UUID) -> bool:
+        with self._lock:
+            task_row = self._task_rows.get(task_id.int)
+            agent_row = self._agent_rows.get(agent_id.int)
+            if task_row is None or agent_row is None:
+                return False
+            return task_row << ROW_BITS | agent_row in self._bid_rows_by_agent
+
+    def top_bids(self, task_id: UUID, k: int) -> List[Bid]:
+        with self._lock:
+            book = self._books.get(self._task_rows.get(task_id.int), ())
+            return [self._bid(key & ROW_MASK) for key in islice(book, k)]
+
+    def all_bids(self) -> List[Bid]:
+        with self._lock:
+            return [self._bid(key & ROW_MASK) for book in self._books.values() for key in book]
+
+    # Work products
+
+    def add_work_product(self, work_product: WorkProduct):
+        self._work_products[work_product.work_id] = work_product
+
+    def get_work_product(self, work_id: UUID) -> Optional[WorkProduct]:
+        return self._work_products.get(work_id)
+
+    def update_work_product(self, work_product: WorkProduct):
+        self._work_products[work_product.work_id] = work_product
+
+    def all_work_products(self) -> List[WorkProduct]:
+        return list(self._work_products.values())
+
+    def remove_work_product(self, work_id: UUID) -> Optional[WorkProduct]:
+        return self._work_products.pop(work_id, None)
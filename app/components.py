@@ -1,79 +1,471 @@
-from typing import Optional, List
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, List, Tuple
 from uuid import UUID
-from app.models import Task, Agent, Bid, WorkProduct, TaskStatus, VerificationStatus
-from app.database import db
+from app.models import ArchivedTask, Task, Agent, Bid, WorkProduct, TaskStatus, VerificationStatus, HELD_TASK_STATUSES, OPEN_TASK_STATUSES, TASK_STATUS_TRANSITIONS
+from app.repository import AlreadyExists, Repository, get_repository
+from app.archive import get_cold_store
+from app.events import event_bus
+from app.journal import get_journal
+from app.market_stats import market_stats
+from app.metrics import bids_per_task, metrics, task_transitions, timed
 
-class TaskBoard:
+# Writers lock only the stripes of the tasks and agents they touch, so
+# contention is confined to operations on the same task (or agent). Stripes
+# are always taken in a fixed order (tasks, then agents, by index) to rule
+# out deadlocks between multi-entity operations such as batches.
+LOCK_STRIPES = 64
+_task_locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+_agent_locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+
+# Live bids a task accepts; further agents are turned away, while agents
+# already bidding can still replace their bids.
+MAX_BIDS_PER_TASK = int(os.environ.get("AEGIS_MAX_BIDS_PER_TASK", "1000"))
+
+class InvalidTransition(ValueError):
+    """Raised when a task status change is not allowed by the task lifecycle."""
+
+class NotFound(ValueError):
+    """Raised when an operation refers to a task, agent or work product that does not exist."""
+
+class NotQualified(ValueError):
+    """Raised when an agent bids on a task it lacks the capabilities for."""
+
+class TooManyBids(ValueError):
+    """Raised when a new bidder arrives at a task already holding ``MAX_BIDS_PER_TASK`` live bids."""
+
+class NotAssigned(ValueError):
+    """Raised when work for a task is submitted by an agent other than the one it was awarded to."""
+
+def _stripes(locks: List[threading.RLock], ids: Iterable[UUID]) -> List[threading.RLock]:
+    return [locks[index] for index in sorted({entity_id.int % LOCK_STRIPES for entity_id in ids})]
+
+@contextmanager
+def _holding(locks: List[threading.RLock]):
+    acquired = []
+    try:
+        for lock in locks:
+            lock.acquire()
+            acquired.append(lock)
+        yield
+    finally:
+        for lock in reversed(acquired):
+            lock.release()
+
+def _set_status(repository: Repository, task: Task, status: TaskStatus):
+    """Move a task along its lifecycle, keeping storage and subscribers in step."""
+    if task.status == status:
+        return
+    if status not in TASK_STATUS_TRANSITIONS[task.status]:
+        raise InvalidTransition(f"Cannot move task from {task.status.value} to {status.value}")
+    repository.update_task_status(task, status)
+    event_bus.publish(task)
+    if metrics.enabled:
+        task_transitions.inc(status.value)
+
+def _check_assignee(task: Task, agent_id: UUID):
+    """Only the winner of a task it holds may submit work for it."""
+    if task.status in HELD_TASK_STATUSES and (task.winning_bid is None or task.winning_bid.agent_id != agent_id):
+        raise NotAssigned("Task is not assigned to this agent")
+
+def _record(event_type: str, **entities):
+    """Append a state change to the journal, when journaling is enabled."""
+    journal = get_journal()
+    if journal is not None:
+        journal.append(event_type, **entities)
+
+def snapshot_state(repository: Optional[Repository] = None) -> Tuple[int, Dict[str, List[dict]]]:
+    """
+    Capture a snapshot point for the journal: roll the journal over with
+    every writer excluded, then dump the repository while writers carry on.
+
+    Only the rollover stops the world. The dump may already hold changes
+    made after the snapshot point, but each of those has a journal record
+    after that point carrying the entity's whole post-change state, and
+    records replay as upserts and removals, so replaying them over the dump
+    recovers the same state as over an exact one.
+    """
+    repository = repository or get_repository()
+    with _holding(_task_locks + _agent_locks):
+        seq = get_journal().rotate()
+    return seq, repository.dump()
+
+class _Component:
+    def __init__(self, repository: Optional[Repository] = None):
+        self.repository = repository or get_repository()
+
+    @contextmanager
+    def _mutation(self, task_ids: Iterable[UUID] = (), agent_ids: Iterable[UUID] = ()):
+        """
+        Apply writes to the given tasks and agents as one unit, holding only
+        their lock stripes. With a durable journal, only return once the
+        writes are on disk; the wait happens after the locks are released
+        so concurrent writers share a group commit.
+        """
+        with _holding(_stripes(_task_locks, task_ids) + _stripes(_agent_locks, agent_ids)), self.repository.transaction():
+            yield
+        journal = get_journal()
+        if journal is not None:
+            journal.wait_durable()
+
+class TaskBoard(_Component):
+    @timed("task_board", "post_task")
     def post_task(self, task: Task) -> Task:
-        db["tasks"][task.task_id] = task
+        with self._mutation(task_ids=[task.task_id]):
+            self._post_task(task)
+            _record("task_posted", tasks=[task])
+            return task
+
+    @timed("task_board", "post_tasks")
+    def post_tasks(self, tasks: List[Task]) -> List[Task]:
+        """
+        Post a batch of tasks under a single acquisition of their locks.
+        Tasks whose id is already taken are skipped and left out of the result.
+        """
+        with self._mutation(task_ids=[task.task_id for task in tasks]):
+            posted = []
+            for task in tasks:
+                try:
+                    posted.append(self._post_task(task))
+                except AlreadyExists:
+                    pass
+            _record("task_posted", tasks=posted)
+            return posted
+
+    def _post_task(self, task: Task) -> Task:
+        self.repository.add_task(task)
+        event_bus.publish(task)
+        market_stats.task_posted(task)
         return task
 
     def get_task(self, task_id: UUID) -> Optional[Task]:
-        return db["tasks"].get(task_id)
+        return self.repository.get_task(task_id)
 
     def get_all_tasks(self) -> List[Task]:
-        return list(db["tasks"].values())
+        return self.repository.all_tasks()
+
+    def get_archived_task(self, task_id: UUID) -> Optional[ArchivedTask]:
+        """A task moved to the cold store, with its bids and work products."""
+        store = get_cold_store()
+        return store.get(task_id) if store is not None else None
+
+    @timed("task_board", "remove_archived")
+    def remove_archived(self, archived: List[ArchivedTask]) -> List[UUID]:
+        """
+        Remove tasks, with their bids and work products, once they have been
+        written to the cold store, except those that changed since. Returns
+        the ids of the tasks removed.
+        """
+        with self._mutation(task_ids=[record.task.task_id for record in archived]):
+            removed_tasks, removed_work_products = [], []
+            for record in archived:
+                task = self.repository.get_task(record.task.task_id)
+                if task is None or task.status != record.task.status:
+                    continue
+                self.repository.remove_task(task.task_id)
+                removed_tasks.append(task.task_id)
+                for work_product in record.work_products:
+                    self.repository.remove_work_product(work_product.work_id)
+                    removed_work_products.append(work_product.work_id)
+            if removed_tasks:
+                _record("tasks_archived", removed_tasks=removed_tasks, removed_work_products=removed_work_products)
+            return removed_tasks
+
+    @timed("task_board", "list_tasks")
+    def list_tasks(
+        self,
+        status: Optional[TaskStatus] = None,
+        capability: Optional[str] = None,
+        min_reward: Optional[float] = None,
+        cursor: Optional[int] = None,
+        limit: int = 100,
+    ) -> Tuple[List[Task], Optional[int]]:
+        """One page of tasks matching the filters, plus the cursor for the next page."""
+        return self.repository.page_tasks(status, capability, min_reward, cursor, limit)
 
-class QualificationEngine:
+    def held_task_counts(self, agent_ids: List[UUID]) -> Dict[UUID, int]:
+        """How many tasks each agent was awarded and has yet to submit; agents holding none are left out."""
+        return self.repository.count_held_tasks(agent_ids)
+
+class AgentRegistry(_Component):
+    def register_agent(self, agent: Agent) -> Agent:
+        with self._mutation(agent_ids=[agent.agent_id]):
+            self._register_agent(agent)
+            _record("agent_registered", agents=[agent])
+            return agent
+
+    def register_agents(self, agents: List[Agent]) -> List[Agent]:
+        """Register a batch of agents under a single acquisition of their locks."""
+        with self._mutation(agent_ids=[agent.agent_id for agent in agents]):
+            registered = [self._register_agent(agent) for agent in agents]
+            _record("agent_registered", agents=registered)
+            return registered
+
+    def _register_agent(self, agent: Agent) -> Agent:
+        self.repository.add_agent(agent)
+        return agent
+
+    def replicate_agent(self, agent: Agent):
+        """Overwrite the local copy of an agent whose owner lives elsewhere (another shard)."""
+        with self._mutation(agent_ids=[agent.agent_id]):
+            self.repository.update_agent(agent)
+            _record("reputation_updated", agents=[agent])
+
+    def get_agent(self, agent_id: UUID) -> Optional[Agent]:
+        return self.repository.get_agent(agent_id)
+
+class QualificationEngine(_Component):
     def is_agent_qualified(self, agent: Agent, task: Task) -> bool:
         # Simplified qualification logic
-        return all(cap in agent.capabilities for cap in task.required_capabilities)
+        return set(task.required_capabilities).issubset(agent.capabilities)
+
+    def get_eligible_tasks(self, agent: Agent) -> List[Task]:
+        """Open tasks the agent is qualified for, answered from the capability index."""
+        return self.repository.eligible_tasks(agent.capabilities)
 
-class BiddingSystem:
+    def get_qualified_agents(self, task: Task) -> List[Agent]:
+        """Registered agents qualified for the task, answered from the capability index."""
+        return self.repository.qualified_agents(task.required_capabilities)
+
+class BiddingSystem(_Component):
+    @timed("bidding_system", "submit_bid")
     def submit_bid(self, bid: Bid) -> Bid:
-        if bid.task_id not in db["tasks"]:
-            raise ValueError("Task not found")
-        if bid.agent_id not in db["agents"]:
-            raise ValueError("Agent not found")
+        with self._mutation(task_ids=[bid.task_id]):
+            return self._submit_bid(bid)
+
+    @timed("bidding_system", "submit_bids")
+    def submit_bids(self, bids: List[Bid]) -> List[Optional[ValueError]]:
+        """
+        Submit a batch of bids under a single acquisition of their tasks' locks.
+
+        Bids are applied independently; the result holds ``None`` for each
+        accepted bid and the ``ValueError`` for each rejected one.
+        """
+        results = []
+        with self._mutation(task_ids=[bid.task_id for bid in bids]):
+            for bid in bids:
+                try:
+                    self._submit_bid(bid)
+                    results.append(None)
+                except ValueError as e:
+                    results.append(e)
+        return results
+
+    def _submit_bid(self, bid: Bid) -> Bid:
+        task = self.repository.get_task(bid.task_id)
+        if not task:
+            raise NotFound("Task not found")
+        agent = self.repository.get_agent(bid.agent_id)
+        if not agent:
+            raise NotFound("Agent not found")
         
-        if db["tasks"][bid.task_id].status != TaskStatus.POSTED:
+        if task.status not in OPEN_TASK_STATUSES:
             raise ValueError("Task is not open for bidding")
+        if task.bidding_deadline is not None and time.time() >= task.bidding_deadline:
+            raise ValueError("Bidding deadline has passed")
+        # Enforced here as well as in the endpoint, for direct callers.
+        if not QualificationEngine(self.repository).is_agent_qualified(agent, task):
+            raise NotQualified("Agent not qualified for this task")
 
-        if bid.task_id not in db["bids"]:
-            db["bids"][bid.task_id] = []
-        
-        db["bids"][bid.task_id].append(bid)
-        db["tasks"][bid.task_id].status = TaskStatus.BIDDING_OPEN
+        # A repeat bid from the same agent replaces its previous one, so it is let in at the cap.
+        if (self.repository.count_bids(task.task_id) >= MAX_BIDS_PER_TASK
+                and not self.repository.has_bid(task.task_id, bid.agent_id)):
+            raise TooManyBids("Task has too many bids")
+        self.repository.add_bid(bid)
+        _set_status(self.repository, task, TaskStatus.BIDDING_OPEN)
+        market_stats.bid_submitted(task, bid)
+        _record("bid_submitted", tasks=[task], bids=[bid])
         return bid
 
+    @timed("bidding_system", "withdraw_bid")
+    def withdraw_bid(self, task_id: UUID, bid_id: UUID) -> Optional[Bid]:
+        with self._mutation(task_ids=[task_id]):
+            task = self.repository.get_task(task_id)
+            if not task:
+                raise NotFound("Task not found")
+            if task.status not in OPEN_TASK_STATUSES:
+                raise ValueError("Task is not open for bidding")
+            bid = self.repository.withdraw_bid(task_id, bid_id)
+            if bid:
+                _record("bid_withdrawn", withdrawn_bids=[(task_id, bid_id)])
+            return bid
+
+    @timed("bidding_system", "get_top_bids")
+    def get_top_bids(self, task_id: UUID, k: int) -> List[Bid]:
+        """The ``k`` lowest live bids on a task, best first."""
+        return self.repository.top_bids(task_id, k)
+
+    @timed("bidding_system", "select_winner")
     def select_winner(self, task_id: UUID) -> Optional[Bid]:
-        if task_id not in db["bids"] or not db["bids"][task_id]:
+        with self._mutation(task_ids=[task_id]):
+            task = self.repository.get_task(task_id)
+            if not task or task.status not in OPEN_TASK_STATUSES:
+                return None
+            best = self.repository.top_bids(task_id, 1)
+            if not best:
+                return None
+
+            # Simplified selection: lowest bid wins
+            winning_bid = best[0]
+            live_bids = self.repository.count_bids(task_id)
+            if metrics.enabled:
+                bids_per_task.observe(live_bids)
+
+            task.winning_bid = winning_bid
+            _set_status(self.repository, task, TaskStatus.ASSIGNED)
+            market_stats.task_awarded(task, winning_bid, live_bids)
+            _record("winner_selected", tasks=[task])
+            return winning_bid
+
+    @timed("bidding_system", "close_auction")
+    def close_auction(self, task_id: UUID) -> Optional[Bid]:
+        """
+        Close an auction once its bidding is over: the best bid wins, as
+        with ``select_winner``, and an open task without a live bid
+        expires, which takes it off the open listings. Returns the winner,
+        or ``None``.
+        """
+        with self._mutation(task_ids=[task_id]):
+            winner = self.select_winner(task_id)
+            if winner is not None:
+                return winner
+            task = self.repository.get_task(task_id)
+            if task and task.status in OPEN_TASK_STATUSES and not self.repository.count_bids(task_id):
+                _set_status(self.repository, task, TaskStatus.EXPIRED)
+                _record("auction_expired", tasks=[task])
             return None
-        
-        # Simplified selection: lowest bid wins
-        winning_bid = min(db["bids"][task_id], key=lambda b: b.bid_amount)
-        
-        task = db["tasks"][task_id]
-        task.status = TaskStatus.ASSIGNED
-        return winning_bid
 
-class WorkVerificationService:
+    @timed("bidding_system", "award_bid")
+    def award_bid(self, task_id: UUID, bid_id: UUID) -> Optional[Bid]:
+        """
+        Assign a task to a bid other than (perhaps) its lowest, as market
+        clearing does. The award is recorded as the task's ``winning_bid``;
+        the other bids are left as they are. ``None`` if the task is no
+        longer open or the bid no longer live.
+        """
+        with self._mutation(task_ids=[task_id]):
+            task = self.repository.get_task(task_id)
+            if not task or task.status not in OPEN_TASK_STATUSES:
+                return None
+            live_bids = self.repository.count_bids(task_id)
+            for bid in self.repository.top_bids(task_id, live_bids):
+                if bid.bid_id == bid_id:
+                    break
+            else:
+                return None
+            if metrics.enabled:
+                bids_per_task.observe(live_bids)
+            task.winning_bid = bid
+            _set_status(self.repository, task, TaskStatus.ASSIGNED)
+            market_stats.task_awarded(task, bid, live_bids)
+            _record("winner_selected", tasks=[task])
+            return bid
+
+class WorkVerificationService(_Component):
+    @timed("work_verification_service", "submit_work")
     def submit_work(self, work_product: WorkProduct) -> WorkProduct:
-        db["work_products"][work_product.work_id] = work_product
-        db["tasks"][work_product.task_id].status = TaskStatus.SUBMITTED
-        return work_product
+        with self._mutation(task_ids=[work_product.task_id]):
+            task = self.repository.get_task(work_product.task_id)
+            if not task:
+                raise NotFound("Task not found")
+            _check_assignee(task, work_product.agent_id)
+            _set_status(self.repository, task, TaskStatus.SUBMITTED)
+            self.repository.add_work_product(work_product)
+            _record("work_submitted", tasks=[task], work_products=[work_product])
+            return work_product
 
+    def get_work_product(self, work_id: UUID) -> Optional[WorkProduct]:
+        return self.repository.get_work_product(work_id)
+
+    def pending_work(self) -> List[Tuple[WorkProduct, Task]]:
+        """Work products waiting to be verified, with their tasks."""
+        return [
+            (work_product, self.repository.get_task(work_product.task_id))
+            for work_product in self.repository.all_work_products()
+            if work_product.verification_status == VerificationStatus.PENDING
+        ]
+
+    @timed("work_verification_service", "verify_work")
     def verify_work(self, work_id: UUID, score: float) -> WorkProduct:
-        work_product = db["work_products"].get(work_id)
+        work_product = self.repository.get_work_product(work_id)
         if not work_product:
-            raise ValueError("WorkProduct not found")
+            raise NotFound("WorkProduct not found")
 
-        if score >= 75:
-            work_product.verification_status = VerificationStatus.PASSED
-            db["tasks"][work_product.task_id].status = TaskStatus.VERIFIED
-        else:
-            work_product.verification_status = VerificationStatus.FAILED
-            db["tasks"][work_product.task_id].status = TaskStatus.REJECTED
-        return work_product
+        with self._mutation(task_ids=[work_product.task_id]):
+            work_product = self.repository.get_work_product(work_id)
+            if work_product.verification_status != VerificationStatus.PENDING:
+                raise InvalidTransition("WorkProduct has already been verified")
+            task = self.repository.get_task(work_product.task_id)
+            if score >= 75:
+                _set_status(self.repository, task, TaskStatus.VERIFIED)
+                work_product.verification_status = VerificationStatus.PASSED
+            else:
+                _set_status(self.repository, task, TaskStatus.REJECTED)
+                work_product.verification_status = VerificationStatus.FAILED
+            self.repository.update_work_product(work_product)
+            _record("work_verified", tasks=[task], work_products=[work_product])
+            return work_product
 
-class ReputationLedger:
-    def record_success(self, agent_id: UUID, score: float):
-        agent = db["agents"].get(agent_id)
-        if not agent:
-            return
+# Seconds after which a score counts half as much towards ``recent_score``.
+REPUTATION_HALF_LIFE = 30 * 24 * 3600.0
 
-        # Simplified reputation update
+def _update_reputation(agent: Agent, score: float, passed: bool, now: float):
+    if passed:
         agent.completed_tasks += 1
-        agent.reputation_score = (agent.reputation_score + score) / agent.completed_tasks
-        # In a real system, success rate would be more nuanced
-        agent.success_rate = ((agent.success_rate * (agent.completed_tasks -1)) + 1) / agent.completed_tasks
+    else:
+        agent.failed_tasks += 1
+    count = agent.completed_tasks + agent.failed_tasks
+    agent.success_rate = agent.completed_tasks / count
+
+    # Welford: update the mean and the sum of squared deviations together.
+    squared_deviations = agent.score_variance * (count - 1)
+    delta = score - agent.reputation_score
+    agent.reputation_score += delta / count
+    squared_deviations += delta * (score - agent.reputation_score)
+    agent.score_variance = squared_deviations / count
+
+    decay = 0.0
+    if agent.last_scored_at is not None:
+        decay = 0.5 ** (max(now - agent.last_scored_at, 0.0) / REPUTATION_HALF_LIFE)
+    weight = agent.recent_score_weight * decay
+    agent.recent_score = (agent.recent_score * weight + score) / (weight + 1)
+    agent.recent_score_weight = weight + 1
+    agent.last_scored_at = now
+
+class ReputationLedger(_Component):
+    """
+    Per-agent reputation statistics, updated in O(1) per verified task.
+
+    ``reputation_score`` is the mean verification score and
+    ``score_variance`` its variance, both maintained with Welford's
+    algorithm. ``recent_score`` is an average whose weights halve every
+    ``REPUTATION_HALF_LIFE`` seconds, so it tracks current form.
+    """
+
+    def record_success(self, agent_id: UUID, score: float):
+        self.record_outcome(agent_id, score, passed=True)
+
+    def record_failure(self, agent_id: UUID, score: float):
+        self.record_outcome(agent_id, score, passed=False)
+
+    @timed("reputation_ledger", "record_outcome")
+    def record_outcome(self, agent_id: UUID, score: float, passed: bool, now: Optional[float] = None):
+        with self._mutation(agent_ids=[agent_id]):
+            agent = self.repository.get_agent(agent_id)
+            if not agent:
+                return
+            _update_reputation(agent, score, passed, time.time() if now is None else now)
+            self.repository.update_agent(agent)
+            _record("reputation_updated", agents=[agent])
+
+    @timed("reputation_ledger", "leaderboard")
+    def leaderboard(self, capability: Optional[str] = None, k: int = 10) -> List[Agent]:
+        """The ``k`` best-ranked agents, optionally among those with ``capability``."""
+        return self.repository.top_agents(capability, k)
+
+    @timed("reputation_ledger", "rank")
+    def rank(self, agent_id: UUID, capability: Optional[str] = None) -> Optional[int]:
+        """The agent's 1-based leaderboard rank, or ``None`` if it is not ranked for ``capability``."""
+        return self.repository.agent_rank(agent_id, capability)
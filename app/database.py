@@ -1,3 +1,5 @@
+from app.indexes import CapabilityIndex, TaskIndex, ReputationIndex
+
 # In-Memory Database
 db = {
     "tasks": {},
@@ -5,3 +7,10 @@ db = {
     "bids": {},
     "work_products": {},
 }
+
+# Secondary indexes over ``db``, kept current by the components.
+indexes = {
+    "capabilities": CapabilityIndex(),
+    "tasks": TaskIndex(),
+    "reputation": ReputationIndex(),
+}
@@ -0,0 +1,66 @@
+from typing import Any, Dict, Iterable, Mapping, Optional
+from uuid import UUID
+
+import orjson
+from fastapi import Response
+
+from app.models import Task, TaskStatus
+
+# pydantic-core's serializer writes a model straight to JSON bytes, without
+# building the intermediate dict that ``model_dump`` + ``json.dumps`` need.
+_encode_task = Task.__pydantic_serializer__.to_json
+
+
+class TaskPayloadCache:
+    """
+    Encoded JSON bytes for each task, reused across responses.
+
+    A task's status is the only field that changes after it is posted
+    (the winning bid is set along with the move to assigned), so each
+    entry remembers the status it was encoded with and is replaced as soon
+    as the task is seen with a different one. Lists are assembled by
+    joining the cached fragments, so listing a page costs one dictionary
+    lookup per task rather than a validation and an encoding.
+    """
+
+    def __init__(self):
+        # Keyed by ``task_id.int``, which hashes in C where a UUID hashes in
+        # Python, and kept as two flat dicts rather than one of (status,
+        # payload) tuples, which the garbage collector would keep rescanning.
+        self._payloads: Dict[int, bytes] = {}
+        self._statuses: Dict[int, TaskStatus] = {}
+
+    def clear(self):
+        self._payloads.clear()
+        self._statuses.clear()
+
+    def invalidate(self, task_id: UUID):
+        self._statuses.pop(task_id.int, None)
+        self._payloads.pop(task_id.int, None)
+
+    def encode(self, task: Task) -> bytes:
+        key = task.task_id.int
+        if self._statuses.get(key) is task.status:
+            payload = self._payloads.get(key)
+            if payload is not None:
+                return payload
+        # Racing requests may both encode; either result is correct.
+        payload = _encode_task(task)
+        self._payloads[key] = payload
+        self._statuses[key] = task.status
+        return payload
+
+    def encode_list(self, tasks: Iterable[Task]) -> bytes:
+        return b"[" + b",".join(map(self.encode, tasks)) + b"]"
+
+
+task_payloads = TaskPayloadCache()
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """
+    A JSON response for already-encoded bytes or trusted JSON-compatible
+    data, encoded with orjson and without response-model validation.
+    """
+    body = content if isinstance(content, bytes) else orjson.dumps(content)
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
@@ -1,38 +1,332 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from typing import List, Optional, Tuple, Dict
+import asyncio
+import json
+import os
+import threading
 from uuid import UUID
 
-from app.models import Task, Agent, Bid, WorkProduct, VerificationStatus
-from app.database import db
+import orjson
+
+from app.models import (
+    Task, Agent, Bid, WorkProduct, TaskStatus, VerificationStatus, AgentRank, BatchItemResult, BlobRef,
+    VerificationJob, VerificationQueueStats, MarketClearing, MarketStats, TASK_STATUS_TRANSITIONS,
+)
+from app.admission import agent_bid_limiter, requests_rejected, retry_after, task_bid_limiter
+from app.auctions import AuctionScheduler
+from app.blobs import INLINE_DELIVERABLE_LIMIT, get_blob_store
+from app.clearing import MarketClearer
+from app.events import event_bus
+from app.journal import get_journal
+from app.market_stats import market_stats
+from app.metrics import metrics
+from app.repository import AlreadyExists, get_repository
+from app.encoding import task_payloads, json_response
 from app.components import (
     TaskBoard,
+    AgentRegistry,
     QualificationEngine,
     BiddingSystem,
     WorkVerificationService,
     ReputationLedger,
+    InvalidTransition,
+    NotFound,
+    NotAssigned,
+    NotQualified,
+    TooManyBids,
 )
+from app.sharding import router_from_env
+from app.verification import VerificationQueue, verifiers_from_env
 
 router = APIRouter()
 
-task_board = TaskBoard()
-qualification_engine = QualificationEngine()
-bidding_system = BiddingSystem()
-work_verification_service = WorkVerificationService()
-reputation_ledger = ReputationLedger()
+# Largest number of items, and of body bytes, accepted by a single batch request.
+MAX_BATCH_ITEMS = 50000
+MAX_BATCH_BYTES = 64 * 1024 * 1024
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+# Largest blob accepted by ``POST /blobs/``, and how much of an upload is
+# gathered before it is handed to a worker thread to be written.
+MAX_BLOB_BYTES = int(os.environ.get("AEGIS_MAX_BLOB_BYTES", str(1024 * 1024 * 1024)))
+BLOB_WRITE_BYTES = 1024 * 1024
+# Status codes of rejected bids, by error type; other errors are a 400.
+BID_ERROR_STATUS = {NotFound: 404, NotQualified: 403, TooManyBids: 409, AlreadyExists: 409}
+
+_batch_adapters = {model: TypeAdapter(List[model]) for model in (Task, Agent, Bid)}
+
+def _describe_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+async def _read_batch(request: Request, model) -> Tuple[List, Dict[int, str]]:
+    """
+    Read a JSON array or NDJSON request body and validate it on a worker
+    thread, so that large batches do not hold up the event loop.
+
+    Returns the validated items (``None`` where an item is invalid) and the
+    validation error message for each invalid index. Bodies over
+    ``MAX_BATCH_BYTES`` are turned away by their ``Content-Length`` before
+    being read, and batches over ``MAX_BATCH_ITEMS`` once counted, before
+    any item is validated.
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_BATCH_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch bodies are limited to {MAX_BATCH_BYTES} bytes")
+    body = await request.body()
+    if len(body) > MAX_BATCH_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch bodies are limited to {MAX_BATCH_BYTES} bytes")
+    ndjson = request.headers.get("content-type", "").split(";")[0].strip() in NDJSON_MEDIA_TYPES
+    return await run_in_threadpool(_parse_batch, body, ndjson, model)
+
+def _check_batch_size(count: int):
+    if count > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batches are limited to {MAX_BATCH_ITEMS} items")
+
+def _parse_batch(body: bytes, ndjson: bool, model) -> Tuple[List, Dict[int, str]]:
+    if ndjson:
+        lines = [line for line in body.splitlines() if line.strip()]
+        _check_batch_size(len(lines))
+        try:
+            return _batch_adapters[model].validate_json(b"[" + b",".join(lines) + b"]"), {}
+        except ValidationError:
+            # Fall back to item-by-item validation to report per-item errors.
+            raw_items, validate = lines, model.model_validate_json
+    else:
+        try:
+            raw_items = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Malformed JSON body")
+        if not isinstance(raw_items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array or NDJSON body")
+        _check_batch_size(len(raw_items))
+        try:
+            return _batch_adapters[model].validate_python(raw_items), {}
+        except ValidationError:
+            validate = model.model_validate
+    items, errors = [], {}
+    for index, raw in enumerate(raw_items):
+        try:
+            items.append(validate(raw))
+        except ValidationError as e:
+            items.append(None)
+            errors[index] = _describe_validation_error(e)
+    return items, errors
+
+def _invalid_result(index: int, error: str) -> BatchItemResult:
+    return BatchItemResult(index=index, status_code=422, error=error)
+
+_bid_admission_lock = threading.Lock()
+
+def _bid_admission_wait(bid: Bid) -> float:
+    """
+    0 if the bid is within its agent's and its task's rate limits, else the
+    seconds to wait. Tokens are only taken when both admit the bid, so a
+    bid turned away by one limit costs nothing against the other. Only
+    called once the agent and the task are known to exist, so buckets are
+    never made for IDs a client invented.
+    """
+    with _bid_admission_lock:
+        agent_wait = agent_bid_limiter.wait(bid.agent_id)
+        task_wait = task_bid_limiter.wait(bid.task_id)
+        if not agent_wait and not task_wait:
+            agent_bid_limiter.acquire(bid.agent_id)
+            task_bid_limiter.acquire(bid.task_id)
+            return 0.0
+    requests_rejected.inc("agent_rate" if agent_wait else "task_rate")
+    return max(agent_wait, task_wait)
+
+# How long an idle SSE connection waits before sending a keep-alive comment.
+SSE_KEEPALIVE_SECONDS = 15.0
+
+# With AEGIS_SHARDS set, marketplace state lives in shard processes and the
+# components below are routing facades over them (see app.sharding).
+shards = router_from_env()
+if shards is None:
+    task_board = TaskBoard()
+    agent_registry = AgentRegistry()
+    qualification_engine = QualificationEngine()
+    bidding_system = BiddingSystem()
+    work_verification_service = WorkVerificationService()
+    reputation_ledger = ReputationLedger()
+    market_statistics = market_stats
+else:
+    task_board = shards.task_board
+    agent_registry = shards.agent_registry
+    qualification_engine = shards.qualification_engine
+    bidding_system = shards.bidding_system
+    work_verification_service = shards.work_verification_service
+    reputation_ledger = shards.reputation_ledger
+    market_statistics = shards.market_stats
+
+def _apply_verification(work_id: UUID, score: float) -> WorkProduct:
+    """Record a verification score and its effect on the agent's reputation."""
+    work_product = work_verification_service.verify_work(work_id, score)
+    if work_product.verification_status == VerificationStatus.PASSED:
+        reputation_ledger.record_success(work_product.agent_id, score)
+    else:
+        reputation_ledger.record_failure(work_product.agent_id, score)
+    return work_product
+
+def _load_deliverable(work_product: WorkProduct) -> dict:
+    if work_product.deliverable_blob is None:
+        return work_product.deliverable
+    return orjson.loads(b"".join(get_blob_store().read(work_product.deliverable_blob.digest)))
+
+# Verifies submitted work in the background; started and stopped with the app.
+verification_queue = VerificationQueue(
+    _apply_verification,
+    _load_deliverable,
+    verifiers=verifiers_from_env(),
+    workers=int(os.environ.get("AEGIS_VERIFICATION_WORKERS", "2")),
+    processes=int(os.environ.get("AEGIS_VERIFICATION_PROCESSES", "0")),
+)
+
+market_clearer = MarketClearer(task_board, agent_registry, bidding_system)
+
+# Closes auctions at their bidding deadline; started and stopped with the
+# app. Shard processes close the auctions of their own tasks, so a sharded
+# front end schedules none.
+auction_scheduler = AuctionScheduler(bidding_system.close_auction)
+
+def _schedule_auctions(tasks: List[Task]):
+    if shards is None:
+        auction_scheduler.schedule_tasks(tasks)
+
+# Gauges read when /metrics is scraped. A sharded front end holds no
+# entities itself, so it reports none; each shard process has its own.
+if shards is None:
+    metrics.gauge(
+        "aegis_entities", "Stored entities, by kind.",
+        lambda: [((kind,), count) for kind, count in get_repository().count_entities().items()], ("kind",),
+    )
+metrics.gauge("aegis_verification_queue_depth", "Work products waiting for verification.",
+              lambda: [((), verification_queue.depth())])
+metrics.gauge("aegis_verification_in_progress", "Work products being verified.",
+              lambda: [((), verification_queue.stats().in_progress)])
+metrics.gauge("aegis_journal_pending_records", "Journal records not yet fsynced.",
+              lambda: [] if get_journal() is None else [((), get_journal().pending)])
+metrics.gauge("aegis_auctions_pending", "Auctions waiting for their bidding deadline.",
+              lambda: [((), auction_scheduler.pending())])
+metrics.gauge("aegis_event_waiters", "Event pollers and streams waiting for a change.",
+              lambda: [((), event_bus.waiting)])
 
 @router.post("/tasks/", response_model=Task, status_code=201)
 def create_task(task_in: Task):
     """
-    Create a new task on the Task Board.
+    Create a new task on the Task Board. With a `bidding_deadline`, the
+    lowest bid wins automatically once the deadline passes. A `task_id`
+    that is already taken is a 409.
+    """
+    try:
+        task = task_board.post_task(task_in)
+    except AlreadyExists as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    _schedule_auctions([task])
+    return task
+
+@router.post("/tasks/batch", response_model=List[BatchItemResult])
+async def create_tasks_batch(request: Request):
+    """
+    Create many tasks from a JSON array or an NDJSON stream.
+
+    Valid tasks are posted together; the response has one result per item,
+    a 409 for a `task_id` already taken (or repeated within the batch).
     """
-    return task_board.post_task(task_in)
+    tasks, errors = await _read_batch(request, Task)
+    posted = await run_in_threadpool(task_board.post_tasks, [task for task in tasks if task is not None])
+    _schedule_auctions(posted)
+    unclaimed = {task.task_id for task in posted}
+    results = []
+    for index, task in enumerate(tasks):
+        if task is None:
+            results.append(_invalid_result(index, errors[index]))
+        elif task.task_id in unclaimed:
+            unclaimed.discard(task.task_id)
+            results.append(BatchItemResult(index=index, status_code=201, id=task.task_id))
+        else:
+            results.append(BatchItemResult(index=index, status_code=409, id=task.task_id, error="Task already exists"))
+    return results
+
+def _board_etag(version: int) -> str:
+    return f'W/"{event_bus.epoch}-{version}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
 
 @router.get("/tasks/", response_model=List[Task])
-def list_tasks():
+def list_tasks(
+    if_none_match: Optional[str] = Header(None),
+    status: Optional[TaskStatus] = None,
+    capability: Optional[str] = None,
+    min_reward: Optional[float] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
     """
-    Get all tasks from the Task Board.
+    Get a page of tasks from the Task Board.
+
+    Tasks are returned in posting order, or by ascending reward when
+    `min_reward` is given. When more tasks match, the cursor for the next
+    page is returned in the `X-Next-Cursor` header.
+
+    The `ETag` tracks the board version (also sent as `X-Board-Version`
+    and `X-Board-Epoch`), so a client re-polling with `If-None-Match` gets
+    an empty 304 until some task changes. Follow up with
+    `GET /tasks/changes` to fetch only those.
     """
-    return task_board.get_all_tasks()
+    # Read the version first: a change racing with the listing then
+    # yields a stale tag, which only costs the client one extra fetch. With
+    # sharding the bus is fed by the event relay, which only relays changes
+    # the shards have made, so the same holds.
+    version = event_bus.last_id
+    etag = _board_etag(version)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    headers = {"ETag": etag, "X-Board-Version": str(version), "X-Board-Epoch": event_bus.epoch}
+    try:
+        tasks, next_cursor = task_board.list_tasks(status, capability, min_reward, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    # The tasks come from our own store, so skip response-model validation
+    # and serve their cached encodings.
+    return json_response(task_payloads.encode_list(tasks), headers=headers)
+
+@router.get("/tasks/changes")
+def list_task_changes(
+    since: int = Query(0, ge=0),
+    epoch: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """
+    Get the tasks created or changed after board version `since`, each in
+    its latest state, with the version they bring the board up to.
+
+    At most `limit` changes are read per call; `has_more` says whether to
+    call again from the returned `version`. Answers 410 when the bounded
+    change log no longer reaches back to `since`, or when `epoch` (from an
+    earlier response) shows the versions came from a previous server run;
+    the client then resynchronises from `GET /tasks/`.
+    """
+    events, version, truncated = event_bus.events_after(since, limit=limit)
+    if truncated or since > version or epoch not in (None, event_bus.epoch):
+        raise HTTPException(status_code=410, detail="Version is no longer in the change log")
+    latest = {}
+    for event in events:
+        # Keep each task once, at the position of its latest change.
+        latest.pop(event["task"]["task_id"], None)
+        latest[event["task"]["task_id"]] = event["task"]
+    return json_response({
+        "epoch": event_bus.epoch,
+        "version": version,
+        "tasks": list(latest.values()),
+        "has_more": version < event_bus.last_id,
+    })
 
 
 @router.post("/agents/", response_model=Agent, status_code=201)
@@ -40,27 +334,127 @@ def register_agent(agent_in: Agent):
     """
     Register a new agent in the marketplace.
     """
-    db["agents"][agent_in.agent_id] = agent_in
-    return agent_in
+    return agent_registry.register_agent(agent_in)
+
+@router.post("/agents/batch", response_model=List[BatchItemResult])
+async def register_agents_batch(request: Request):
+    """
+    Register many agents from a JSON array or an NDJSON stream.
+    """
+    agents, errors = await _read_batch(request, Agent)
+    await run_in_threadpool(agent_registry.register_agents, [agent for agent in agents if agent is not None])
+    return [
+        _invalid_result(index, errors[index]) if agent is None
+        else BatchItemResult(index=index, status_code=201, id=agent.agent_id)
+        for index, agent in enumerate(agents)
+    ]
 
 @router.post("/bids/", response_model=Bid, status_code=201)
-def submit_bid(bid_in: Bid):
+async def submit_bid(bid_in: Bid):
     """
-    Submit a bid for a task.
+    Submit a bid for a task. Agents bidding faster than their rate limit,
+    or on a task receiving bids faster than its own, get a 429 with a
+    `Retry-After`; a task with too many bids already turns new bidders
+    away with a 409.
     """
-    agent = db["agents"].get(bid_in.agent_id)
-    task = db["tasks"].get(bid_in.task_id)
+    return await run_in_threadpool(_submit_bid, bid_in)
+
+def _submit_bid(bid_in: Bid) -> Bid:
+    agent = agent_registry.get_agent(bid_in.agent_id)
+    task = task_board.get_task(bid_in.task_id)
 
     if not agent or not task:
         raise HTTPException(status_code=404, detail="Agent or Task not found")
 
+    wait = _bid_admission_wait(bid_in)
+    if wait:
+        raise HTTPException(status_code=429, detail="Too many bids", headers={"Retry-After": retry_after(wait)})
+
     if not qualification_engine.is_agent_qualified(agent, task):
         raise HTTPException(status_code=403, detail="Agent not qualified for this task")
     
     try:
         return bidding_system.submit_bid(bid_in)
+    except ValueError as e:
+        raise HTTPException(status_code=BID_ERROR_STATUS.get(type(e), 400), detail=str(e))
+
+@router.get("/tasks/{task_id}/bids", response_model=List[Bid])
+def list_top_bids(task_id: UUID, top: int = Query(10, ge=1, le=1000)):
+    """
+    Get the `top` lowest live bids for a task, best first.
+    """
+    if not task_board.get_task(task_id):
+        archived = task_board.get_archived_task(task_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return archived.bids[:top]
+    return bidding_system.get_top_bids(task_id, top)
+
+@router.delete("/tasks/{task_id}/bids/{bid_id}", response_model=Bid)
+def withdraw_bid(task_id: UUID, bid_id: UUID):
+    """
+    Withdraw a live bid from a task that is still open for bidding.
+    """
+    if not task_board.get_task(task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    try:
+        bid = bidding_system.withdraw_bid(task_id, bid_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if not bid:
+        raise HTTPException(status_code=404, detail="Bid not found")
+    return bid
+
+@router.post("/bids/batch", response_model=List[BatchItemResult])
+async def submit_bids_batch(request: Request, response: Response):
+    """
+    Submit many bids from a JSON array or an NDJSON stream.
+
+    Each bid is accepted or rejected on its own; rejected bids carry the
+    same status code the single-bid endpoint would have returned. Every
+    bid from an existing agent on an existing task counts against the rate
+    limits; when some are over them, the response has a `Retry-After` for
+    the longest wait.
+    """
+    bids, errors = await _read_batch(request, Bid)
+    waits = await run_in_threadpool(_batch_admission_waits, bids)
+    admitted = [bid for index, bid in enumerate(bids) if bid is not None and not waits[index]]
+    outcomes = iter(await run_in_threadpool(bidding_system.submit_bids, admitted))
+    results = []
+    for index, bid in enumerate(bids):
+        if bid is None:
+            results.append(_invalid_result(index, errors[index]))
+            continue
+        if waits[index]:
+            results.append(BatchItemResult(index=index, status_code=429, error="Too many bids"))
+            continue
+        error = next(outcomes)
+        if error is None:
+            results.append(BatchItemResult(index=index, status_code=201, id=bid.bid_id))
+        else:
+            results.append(BatchItemResult(index=index, status_code=BID_ERROR_STATUS.get(type(error), 400), error=str(error)))
+    if any(waits.values()):
+        response.headers["Retry-After"] = retry_after(max(waits.values()))
+    return results
+
+def _batch_admission_waits(bids: List[Optional[Bid]]) -> Dict[int, float]:
+    """
+    The rate limit wait of each valid bid in a batch; bids naming an agent
+    or task that does not exist are not charged, and fail with a 404 when
+    submitted.
+    """
+    agents: Dict[UUID, bool] = {}
+    tasks: Dict[UUID, bool] = {}
+    waits = {}
+    for index, bid in enumerate(bids):
+        if bid is None:
+            continue
+        if bid.agent_id not in agents:
+            agents[bid.agent_id] = agent_registry.get_agent(bid.agent_id) is not None
+        if bid.task_id not in tasks:
+            tasks[bid.task_id] = task_board.get_task(bid.task_id) is not None
+        waits[index] = _bid_admission_wait(bid) if agents[bid.agent_id] and tasks[bid.task_id] else 0.0
+    return waits
 
 @router.post("/tasks/{task_id}/select_winner/", response_model=Bid)
 def select_winner_for_task(task_id: UUID):
@@ -70,14 +464,114 @@ def select_winner_for_task(task_id: UUID):
     winning_bid = bidding_system.select_winner(task_id)
     if not winning_bid:
         raise HTTPException(status_code=404, detail="No bids found or task not in bidding state")
+    auction_scheduler.cancel(task_id)
     return winning_bid
 
-@router.post("/work_products/", response_model=WorkProduct, status_code=201)
-def submit_work_for_task(work_in: WorkProduct):
+@router.post("/market/clear", response_model=MarketClearing)
+def clear_market(
+    capacity: int = Query(1, ge=1, le=1000),
+    reputation_weight: float = Query(1.0, ge=0),
+    dry_run: bool = False,
+):
+    """
+    Clear all open auctions at once: assign tasks to bidders so that the
+    total cost is lowest with each agent holding at most `capacity` tasks
+    (counting those assigned to it earlier and not yet submitted), where a
+    bid's cost is its amount marked up by up to `reputation_weight` times
+    for an agent of no proven quality. Tasks that get no agent stay open
+    for the next clearing.
+    """
+    clearing = market_clearer.clear(capacity, reputation_weight, dry_run)
+    if not dry_run:
+        for bid in clearing.assignments:
+            auction_scheduler.cancel(bid.task_id)
+    return clearing
+
+@router.get("/market/stats", response_model=List[MarketStats])
+def get_market_stats(capabilities: Optional[List[str]] = Query(None)):
+    """
+    Recent market prices per set of required capabilities: bid counts, and
+    quantiles of bids and winning bids as a fraction of the reward and of
+    the time from posting to assignment. With `capabilities`, only the
+    tasks requiring exactly those. Kept up to date as bids come in, so
+    this never reads the bids themselves.
+    """
+    return market_statistics.summaries(capabilities)
+
+@router.post("/work_products/", response_model=WorkProduct, status_code=202)
+def submit_work_for_task(work_in: WorkProduct, response: Response):
+    """
+    Submit a work product for a task and queue it for verification; its
+    progress is at the `Location` returned.
+
+    Large deliverables are moved to the blob store, leaving a reference in
+    the work product; a deliverable uploaded to `POST /blobs/` beforehand
+    can be referenced through `deliverable_blob` instead. Only the agent
+    the task was awarded to may submit work for it.
+    """
+    if (work_in.deliverable is None) == (work_in.deliverable_blob is None):
+        raise HTTPException(status_code=422, detail="Exactly one of deliverable and deliverable_blob is required")
+    if work_in.deliverable_blob is not None:
+        stat = get_blob_store().stat(work_in.deliverable_blob.digest)
+        if stat is None or stat[0] != work_in.deliverable_blob.size:
+            raise HTTPException(status_code=404, detail="Blob not found")
+    else:
+        encoded = orjson.dumps(work_in.deliverable)
+        if len(encoded) > INLINE_DELIVERABLE_LIMIT:
+            # Turn away submissions that would fail before storing their
+            # deliverable, which nothing would reference otherwise.
+            task = task_board.get_task(work_in.task_id)
+            if task is None:
+                raise HTTPException(status_code=404, detail="Task not found")
+            if TaskStatus.SUBMITTED not in TASK_STATUS_TRANSITIONS[task.status]:
+                raise HTTPException(
+                    status_code=409, detail=f"Cannot move task from {task.status.value} to {TaskStatus.SUBMITTED.value}"
+                )
+            if task.winning_bid is None or task.winning_bid.agent_id != work_in.agent_id:
+                raise HTTPException(status_code=403, detail="Task is not assigned to this agent")
+            work_in.deliverable_blob = get_blob_store().put(encoded, "application/json")
+            work_in.deliverable = None
+    try:
+        work_product = work_verification_service.submit_work(work_in)
+    except InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except NotAssigned as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    verification_queue.submit(work_product, task_board.get_task(work_product.task_id))
+    response.headers["Location"] = f"/work_products/{work_product.work_id}/verification"
+    return work_product
+
+@router.get("/work_products/{work_id}/verification", response_model=VerificationJob)
+def get_verification_status(work_id: UUID):
+    """
+    Where a submitted work product is in the verification pipeline.
+    """
+    job = verification_queue.status(work_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No verification job for this work product")
+    return job
+
+@router.get("/verification/queue", response_model=VerificationQueueStats)
+def get_verification_queue():
     """
-    Submit a work product for a task.
+    Depth and throughput counters of the verification pipeline.
     """
-    return work_verification_service.submit_work(work_in)
+    return verification_queue.stats()
+
+@router.get("/work_products/{work_id}/deliverable")
+def get_deliverable(work_id: UUID, range_header: Optional[str] = Header(None, alias="Range")):
+    """
+    Download a work product's deliverable; blob-backed deliverables are
+    streamed and honour single `Range` requests.
+    """
+    work_product = work_verification_service.get_work_product(work_id)
+    if not work_product:
+        raise HTTPException(status_code=404, detail="WorkProduct not found")
+    if work_product.deliverable_blob is None:
+        return json_response(work_product.deliverable)
+    return _blob_response(work_product.deliverable_blob.digest, work_product.deliverable_blob.media_type, range_header)
 
 @router.post("/work_products/{work_id}/verify/")
 def verify_submitted_work(work_id: UUID, score: float):
@@ -85,29 +579,199 @@ def verify_submitted_work(work_id: UUID, score: float):
     Verify a submitted work product and update reputation.
     """
     try:
-        work_product = work_verification_service.verify_work(work_id, score)
-        if work_product.verification_status == VerificationStatus.PASSED:
-            reputation_ledger.record_success(work_product.agent_id, score)
-        return work_product
+        return _apply_verification(work_id, score)
+    except InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+@router.post("/blobs/", response_model=BlobRef, status_code=201)
+async def upload_blob(request: Request):
+    """
+    Stream the request body into the content-addressed blob store.
+    Uploading content that is already stored returns the same reference.
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_BLOB_BYTES:
+        raise HTTPException(status_code=413, detail=f"Blobs are limited to {MAX_BLOB_BYTES} bytes")
+    writer = await run_in_threadpool(
+        get_blob_store().writer, request.headers.get("content-type", "application/octet-stream")
+    )
+    try:
+        # ASGI servers deliver bodies in small chunks; write them in batches.
+        buffered = bytearray()
+        async for chunk in request.stream():
+            if writer.size + len(buffered) + len(chunk) > MAX_BLOB_BYTES:
+                raise HTTPException(status_code=413, detail=f"Blobs are limited to {MAX_BLOB_BYTES} bytes")
+            buffered += chunk
+            if len(buffered) >= BLOB_WRITE_BYTES:
+                await run_in_threadpool(writer.write, bytes(buffered))
+                buffered.clear()
+        if buffered:
+            await run_in_threadpool(writer.write, bytes(buffered))
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
+    return await run_in_threadpool(writer.close)
+
+def _byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The ``[start, end)`` span of a single-range ``Range`` header, or ``None``
+    to send the whole blob (no header, or one this server ignores, such as
+    several ranges).
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) + 1 if last else size
+            if last and end <= start:
+                return None
+        else:
+            # A suffix range: the last ``last`` bytes.
+            suffix = int(last)
+            start, end = (max(size - suffix, 0) if suffix > 0 else size), size
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size)
+
+def _blob_response(digest: str, media_type: str, range_header: Optional[str]) -> Response:
+    store = get_blob_store()
+    stat = store.stat(digest)
+    if stat is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    size = stat[0]
+    byte_range = _byte_range(range_header, size)
+    start, end = byte_range or (0, size)
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{digest}"', "Content-Length": str(end - start)}
+    if byte_range is None:
+        return StreamingResponse(store.read(digest, start, end), headers=headers, media_type=media_type)
+    headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    return StreamingResponse(store.read(digest, start, end), status_code=206, headers=headers, media_type=media_type)
+
+@router.get("/blobs/{digest}")
+def download_blob(digest: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """
+    Download a blob by its SHA-256 digest, or a single byte range of it.
+    """
+    return _blob_response(digest, "application/octet-stream", range_header)
+
+@router.get("/events/poll")
+async def poll_events(
+    after: int = 0,
+    capabilities: Optional[List[str]] = Query(None),
+    timeout: float = Query(25.0, ge=0, le=60),
+):
+    """
+    Long-poll for task lifecycle events newer than `after`.
+
+    Returns as soon as a matching event exists, or with an empty list once
+    `timeout` seconds have passed. When `capabilities` is given, only events
+    for tasks an agent with those capabilities could bid on are returned.
+    Resume from `last_event_id` on the next call.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        events, last_event_id, truncated = event_bus.events_after(after, capabilities)
+        remaining = deadline - loop.time()
+        if events or truncated or remaining <= 0:
+            return {"events": events, "last_event_id": last_event_id, "truncated": truncated}
+        after = last_event_id
+        await event_bus.wait(after, remaining)
+
+@router.get("/events/stream")
+async def stream_events(
+    request: Request,
+    after: Optional[int] = None,
+    capabilities: Optional[List[str]] = Query(None),
+    last_event_id: Optional[int] = Header(None),
+):
+    """
+    Stream task lifecycle events as Server-Sent Events.
+
+    Reconnecting clients resume from the standard `Last-Event-ID` header (or
+    `after`); new clients only receive events published after they connect.
+    """
+    resume_id = last_event_id if last_event_id is not None else after
+    if resume_id is None:
+        resume_id = event_bus.last_id
+
+    async def event_source():
+        position = resume_id
+        while not await request.is_disconnected():
+            events, position, truncated = event_bus.events_after(position, capabilities)
+            if truncated:
+                yield "event: truncated\ndata: {}\n\n"
+            for event in events:
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['task'])}\n\n"
+            if not events and not await event_bus.wait(position, SSE_KEEPALIVE_SECONDS):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(event_source(), media_type="text/event-stream")
+
+@router.get("/agents/leaderboard", response_model=List[Agent])
+def get_leaderboard(capability: Optional[str] = None, top: int = Query(10, ge=1, le=1000)):
+    """
+    Get the `top` agents by reputation, best first, optionally only those
+    with `capability`.
+    """
+    return reputation_ledger.leaderboard(capability, top)
+
 @router.get("/agents/{agent_id}", response_model=Agent)
 def get_agent(agent_id: UUID):
     """
     Get agent details.
     """
-    agent = db["agents"].get(agent_id)
+    agent = agent_registry.get_agent(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     return agent
 
+@router.get("/agents/{agent_id}/rank", response_model=AgentRank)
+def get_agent_rank(agent_id: UUID, capability: Optional[str] = None):
+    """
+    Get an agent's leaderboard position, overall or among agents with `capability`.
+    """
+    rank = reputation_ledger.rank(agent_id, capability)
+    if rank is None:
+        raise HTTPException(status_code=404, detail="Agent not found or not ranked for this capability")
+    return AgentRank(agent_id=agent_id, capability=capability, rank=rank)
+
+@router.get("/agents/{agent_id}/eligible_tasks", response_model=List[Task])
+def list_eligible_tasks(agent_id: UUID):
+    """
+    Get the open tasks an agent is qualified to bid on.
+    """
+    agent = agent_registry.get_agent(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    return qualification_engine.get_eligible_tasks(agent)
+
 @router.get("/tasks/{task_id}", response_model=Task)
 def get_task(task_id: UUID):
     """
-    Get task details.
+    Get task details, from the archive for tasks finished long enough ago.
     """
-    task = db["tasks"].get(task_id)
+    task = task_board.get_task(task_id)
     if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    return task
+        # Archived tasks are not cached, which would bring them back into memory.
+        task_payloads.invalidate(task_id)
+        archived = task_board.get_archived_task(task_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        task = archived.task
+        return json_response(task.__pydantic_serializer__.to_json(task))
+    return json_response(task_payloads.encode(task))
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Request latencies, component timings, bids per task, queue depths and
+    entity counts in the Prometheus text format.
+    """
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
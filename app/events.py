@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import uuid
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.models import Task
+
+
+class EventBus:
+    """
+    Bounded, in-process log of task lifecycle events.
+
+    Components publish from whichever thread runs the request; SSE and
+    long-poll handlers wait on the event loop and are woken through
+    ``call_soon_threadsafe`` rather than polling. Events carry consecutive
+    IDs, so a subscriber only needs to remember the last ID it has seen.
+
+    Every task change is published, so the last event ID doubles as the
+    task board's version and the buffer as its bounded change log. IDs
+    restart with the process; ``epoch`` tells versions of different runs
+    apart.
+    """
+
+    def __init__(self, max_events: int = 10000):
+        self.epoch = uuid.uuid4().hex[:12]
+        self._events = deque(maxlen=max_events)
+        self._last_id = 0
+        self._lock = threading.Lock()
+        # Wakes threads blocked in ``wait_blocking``; event loops go through ``_waiters``.
+        self._published = threading.Condition(self._lock)
+        self._waiters = set()
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    @property
+    def waiting(self) -> int:
+        """Pollers and streams currently waiting for a new event."""
+        return len(self._waiters)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+    def publish(self, task: Task) -> Dict[str, Any]:
+        """Record the task's current status as an event and wake waiting subscribers."""
+        return self._append(task.status.value.lower(), task.model_dump(mode="json"))
+
+    def relay(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Publish an event taken from another process's bus, under this bus's next ID."""
+        return self._append(event["type"], event["task"])
+
+    def _append(self, event_type: str, task: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._last_id += 1
+            event = {"id": self._last_id, "type": event_type, "task": task}
+            self._events.append((event, frozenset(task["required_capabilities"])))
+            waiters = list(self._waiters)
+            self._published.notify_all()
+        for loop, ready in waiters:
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                # The subscriber's loop has already shut down.
+                pass
+        return event
+
+    def events_after(
+        self, after_id: int, capabilities: Optional[Iterable[str]] = None, limit: int = 1000
+    ) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """
+        Events newer than ``after_id``, restricted to tasks an agent with
+        ``capabilities`` could bid on.
+
+        Returns the matching events, the ID to resume from and whether older
+        events were already dropped from the buffer (the caller missed some
+        and should resynchronise from ``GET /tasks/``).
+        """
+        allowed = None if capabilities is None else frozenset(capabilities)
+        with self._lock:
+            first_id = self._last_id - len(self._events) + 1
+            truncated = after_id < first_id - 1
+            start = max(after_id - first_id + 1, 0)
+            window = [self._events[i] for i in range(start, len(self._events))]
+            resume_id = self._last_id
+        matched = []
+        for event, required in window:
+            if allowed is None or required <= allowed:
+                matched.append(event)
+                if len(matched) == limit:
+                    resume_id = event["id"]
+                    break
+        return matched, resume_id, truncated
+
+    def wait_blocking(self, after_id: int, timeout: float) -> bool:
+        """``wait`` for threads outside an event loop."""
+        with self._published:
+            return self._published.wait_for(lambda: self._last_id > after_id, timeout)
+
+    async def wait(self, after_id: int, timeout: float) -> bool:
+        """Wait until an event newer than ``after_id`` exists; ``False`` on timeout."""
+        ready = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), ready)
+        with self._lock:
+            if self._last_id > after_id:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(ready.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+event_bus = EventBus()
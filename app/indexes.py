@@ -0,0 +1,437 @@
+import threading
+from itertools import islice
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sortedcontainers import SortedList
+
+from app.models import Task, Agent, Bid, TaskStatus, HELD_TASK_STATUSES
+
+
+class CapabilityIndex:
+    """
+    Inverted index from capability to open tasks and registered agents.
+
+    Capability strings are interned into small integer IDs so that each task
+    and agent can be described by a bitset (a Python int). "Agent can do task"
+    then becomes a subset test on two ints instead of a scan over string lists.
+    """
+
+    def __init__(self):
+        self._capability_ids: Dict[str, int] = {}
+        self._task_masks: Dict[UUID, int] = {}
+        self._agent_masks: Dict[UUID, int] = {}
+        self._tasks_by_capability: Dict[int, Set[UUID]] = {}
+        self._agents_by_capability: Dict[int, Set[UUID]] = {}
+        # Tasks without requirements match every agent and never show up in
+        # the per-capability postings, so they are tracked separately.
+        self._unrestricted_tasks: Set[UUID] = set()
+
+    def clear(self):
+        self._capability_ids.clear()
+        self._task_masks.clear()
+        self._agent_masks.clear()
+        self._tasks_by_capability.clear()
+        self._agents_by_capability.clear()
+        self._unrestricted_tasks.clear()
+
+    def intern(self, capability: str) -> int:
+        capability_id = self._capability_ids.get(capability)
+        if capability_id is None:
+            capability_id = len(self._capability_ids)
+            self._capability_ids[capability] = capability_id
+        return capability_id
+
+    def mask(self, capabilities: Iterable[str]) -> int:
+        """Bitset of the given capabilities, interning unseen ones."""
+        mask = 0
+        for capability in capabilities:
+            mask |= 1 << self.intern(capability)
+        return mask
+
+    def _known_mask(self, capabilities: Iterable[str]) -> int:
+        # Capabilities nobody has interned yet cannot be required by any
+        # indexed task, so they are simply left out of the lookup mask.
+        mask = 0
+        for capability in capabilities:
+            capability_id = self._capability_ids.get(capability)
+            if capability_id is not None:
+                mask |= 1 << capability_id
+        return mask
+
+    @staticmethod
+    def _bits(mask: int) -> Iterable[int]:
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def add_task(self, task: Task):
+        if task.task_id in self._task_masks:
+            return
+        mask = self.mask(task.required_capabilities)
+        self._task_masks[task.task_id] = mask
+        if not mask:
+            self._unrestricted_tasks.add(task.task_id)
+        for capability_id in self._bits(mask):
+            self._tasks_by_capability.setdefault(capability_id, set()).add(task.task_id)
+
+    def remove_task(self, task_id: UUID):
+        mask = self._task_masks.pop(task_id, None)
+        if mask is None:
+            return
+        self._unrestricted_tasks.discard(task_id)
+        for capability_id in self._bits(mask):
+            self._tasks_by_capability[capability_id].discard(task_id)
+
+    def add_agent(self, agent: Agent):
+        self.remove_agent(agent.agent_id)
+        mask = self.mask(agent.capabilities)
+        self._agent_masks[agent.agent_id] = mask
+        for capability_id in self._bits(mask):
+            self._agents_by_capability.setdefault(capability_id, set()).add(agent.agent_id)
+
+    def remove_agent(self, agent_id: UUID):
+        mask = self._agent_masks.pop(agent_id, None)
+        if mask is None:
+            return
+        for capability_id in self._bits(mask):
+            self._agents_by_capability[capability_id].discard(agent_id)
+
+    def eligible_task_ids(self, capabilities: Iterable[str]) -> List[UUID]:
+        """Open tasks whose required capabilities are a subset of ``capabilities``."""
+        agent_mask = self._known_mask(capabilities)
+        candidates = set(self._unrestricted_tasks)
+        for capability_id in self._bits(agent_mask):
+            candidates.update(self._tasks_by_capability.get(capability_id, ()))
+        task_masks = self._task_masks
+        return [task_id for task_id in candidates if not task_masks[task_id] & ~agent_mask]
+
+    def qualified_agent_ids(self, required_capabilities: Iterable[str]) -> List[UUID]:
+        """Registered agents holding every one of ``required_capabilities``."""
+        required = list(required_capabilities)
+        if not required:
+            return list(self._agent_masks)
+        task_mask = self._known_mask(required)
+        if len(set(required)) != bin(task_mask).count("1"):
+            # Some requirement was never interned, so no agent can have it.
+            return []
+        # Start from the rarest capability to keep the candidate set small.
+        postings = min(
+            (self._agents_by_capability.get(capability_id, set()) for capability_id in self._bits(task_mask)),
+            key=len,
+        )
+        agent_masks = self._agent_masks
+        return [agent_id for agent_id in postings if agent_masks[agent_id] & task_mask == task_mask]
+
+
+class TaskIndex:
+    """
+    Ordered secondary indexes used to page through the task board.
+
+    Every task gets a sequence number when it is posted. Listings are ordered
+    by that number (or by reward, then sequence number, when a minimum reward
+    is given), and the sequence number of the last task on a page doubles as
+    the cursor for the next one, so pages stay stable while tasks are added.
+
+    It also counts, per agent, the tasks awarded to it that it has yet to
+    submit, which market clearing takes off the agent's capacity.
+    """
+
+    def __init__(self):
+        self._next_seq = 0
+        self._seq_of: Dict[UUID, int] = {}
+        self._task_at: Dict[int, UUID] = {}
+        self._reward_at: Dict[int, float] = {}
+        self._status_at: Dict[int, TaskStatus] = {}
+        self._capabilities_at: Dict[int, FrozenSet[str]] = {}
+        self._holder_at: Dict[int, UUID] = {}
+        self._held: Dict[UUID, int] = {}
+        # ``None`` is the scope holding every task regardless of status.
+        self._by_seq: Dict[Optional[TaskStatus], SortedList] = {}
+        self._by_reward: Dict[Optional[TaskStatus], SortedList] = {}
+        self._by_capability: Dict[str, SortedList] = {}
+        # Capability postings per status, so that a status plus capability
+        # listing only walks tasks matching both.
+        self._by_status_capability: Dict[Tuple[TaskStatus, str], SortedList] = {}
+        self._reset_scopes()
+
+    def _reset_scopes(self):
+        for scope in [None, *TaskStatus]:
+            self._by_seq[scope] = SortedList()
+            self._by_reward[scope] = SortedList()
+
+    def clear(self):
+        self._next_seq = 0
+        self._seq_of.clear()
+        self._task_at.clear()
+        self._reward_at.clear()
+        self._status_at.clear()
+        self._capabilities_at.clear()
+        self._holder_at.clear()
+        self._held.clear()
+        self._by_capability.clear()
+        self._by_status_capability.clear()
+        self._reset_scopes()
+
+    def add_task(self, task: Task):
+        if task.task_id in self._seq_of:
+            self.update_status(task)
+            return
+        seq = self._next_seq
+        self._next_seq += 1
+        self._seq_of[task.task_id] = seq
+        self._task_at[seq] = task.task_id
+        self._reward_at[seq] = task.reward_amount
+        self._status_at[seq] = task.status
+        self._capabilities_at[seq] = frozenset(task.required_capabilities)
+        for scope in (None, task.status):
+            self._by_seq[scope].add(seq)
+            self._by_reward[scope].add((task.reward_amount, seq))
+        for capability in self._capabilities_at[seq]:
+            self._by_capability.setdefault(capability, SortedList()).add(seq)
+            self._by_status_capability.setdefault((task.status, capability), SortedList()).add(seq)
+        self._set_holder(seq, task)
+
+    def update_status(self, task: Task):
+        seq = self._seq_of.get(task.task_id)
+        if seq is None:
+            return
+        old_status = self._status_at[seq]
+        if old_status == task.status:
+            return
+        reward = self._reward_at[seq]
+        self._by_seq[old_status].remove(seq)
+        self._by_reward[old_status].remove((reward, seq))
+        self._by_seq[task.status].add(seq)
+        self._by_reward[task.status].add((reward, seq))
+        for capability in self._capabilities_at[seq]:
+            self._by_status_capability[(old_status, capability)].remove(seq)
+            self._by_status_capability.setdefault((task.status, capability), SortedList()).add(seq)
+        self._status_at[seq] = task.status
+        self._set_holder(seq, task)
+
+    def remove_task(self, task_id: UUID):
+        seq = self._seq_of.pop(task_id, None)
+        if seq is None:
+            return
+        del self._task_at[seq]
+        reward = self._reward_at.pop(seq)
+        status = self._status_at.pop(seq)
+        for scope in (None, status):
+            self._by_seq[scope].remove(seq)
+            self._by_reward[scope].remove((reward, seq))
+        for capability in self._capabilities_at.pop(seq):
+            self._by_capability[capability].remove(seq)
+            self._by_status_capability[(status, capability)].remove(seq)
+        self._set_holder(seq, None)
+
+    def _set_holder(self, seq: int, task: Optional[Task]):
+        """Count the task against the agent it was awarded to while that agent holds it."""
+        holder = self._holder_at.pop(seq, None)
+        if holder is not None:
+            self._held[holder] -= 1
+            if not self._held[holder]:
+                del self._held[holder]
+        if task is not None and task.status in HELD_TASK_STATUSES and task.winning_bid is not None:
+            holder = task.winning_bid.agent_id
+            self._holder_at[seq] = holder
+            self._held[holder] = self._held.get(holder, 0) + 1
+
+    def held_counts(self, agent_ids: Iterable[UUID]) -> Dict[UUID, int]:
+        """How many tasks each agent holds (assigned or in progress), leaving out agents holding none."""
+        return {agent_id: self._held[agent_id] for agent_id in agent_ids if agent_id in self._held}
+
+    def page(
+        self,
+        status: Optional[TaskStatus] = None,
+        capability: Optional[str] = None,
+        min_reward: Optional[float] = None,
+        cursor: Optional[int] = None,
+        limit: int = 100,
+    ) -> Tuple[List[UUID], Optional[int]]:
+        """
+        Return up to ``limit`` task IDs matching the filters, plus the cursor
+        for the next page (``None`` when there are no more matches).
+
+        Without ``min_reward``, the ordered index for the status and
+        capability given (either, both or neither) drives the scan, so the
+        work done is proportional to the page size rather than to the number
+        of tasks on the board. With ``min_reward``, the reward index for the
+        status drives it and a capability is checked per entry, so a rare
+        capability costs up to one step per task above the minimum reward.
+        """
+        if min_reward is not None:
+            start = (min_reward, -1)
+            if cursor is not None:
+                if cursor not in self._reward_at:
+                    raise ValueError("Invalid cursor")
+                start = max(start, (self._reward_at[cursor], cursor))
+            entries = self._by_reward[status].irange(minimum=start, inclusive=(False, True))
+            seqs = (seq for _, seq in entries)
+            if capability is not None:
+                seqs = (seq for seq in seqs if capability in self._capabilities_at[seq])
+        elif capability is not None:
+            if status is None:
+                postings = self._by_capability.get(capability)
+            else:
+                postings = self._by_status_capability.get((status, capability))
+            seqs = postings.irange(minimum=cursor, inclusive=(False, True)) if postings else iter(())
+        else:
+            seqs = self._by_seq[status].irange(minimum=cursor, inclusive=(False, True))
+
+        page = list(islice(seqs, limit + 1))
+        next_cursor = page[limit - 1] if len(page) > limit else None
+        return [self._task_at[seq] for seq in page[:limit]], next_cursor
+
+
+class ReputationIndex:
+    """
+    Order-statistics index of agents by reputation, overall and per
+    capability, serving leaderboards and rank queries.
+
+    Agents are ordered by mean score, then by number of completed tasks,
+    then by ID. The sorted lists answer top-k in O(log n + k) and an
+    agent's rank in O(log n), so nothing is sorted per request.
+    """
+
+    def __init__(self):
+        self._keys: Dict[UUID, Tuple[float, int, UUID]] = {}
+        self._capabilities: Dict[UUID, Tuple[str, ...]] = {}
+        self._overall = SortedList()
+        self._by_capability: Dict[str, SortedList] = {}
+
+    def clear(self):
+        self._keys.clear()
+        self._capabilities.clear()
+        self._overall.clear()
+        self._by_capability.clear()
+
+    @staticmethod
+    def _key(agent: Agent) -> Tuple[float, int, UUID]:
+        return -agent.reputation_score, -agent.completed_tasks, agent.agent_id
+
+    def add_agent(self, agent: Agent):
+        """Index an agent, or re-index it after its reputation changed."""
+        self.remove_agent(agent.agent_id)
+        key = self._key(agent)
+        self._keys[agent.agent_id] = key
+        self._capabilities[agent.agent_id] = tuple(set(agent.capabilities))
+        self._overall.add(key)
+        for capability in self._capabilities[agent.agent_id]:
+            if capability not in self._by_capability:
+                self._by_capability[capability] = SortedList()
+            self._by_capability[capability].add(key)
+
+    def remove_agent(self, agent_id: UUID):
+        key = self._keys.pop(agent_id, None)
+        if key is None:
+            return
+        self._overall.remove(key)
+        for capability in self._capabilities.pop(agent_id):
+            postings = self._by_capability[capability]
+            postings.remove(key)
+            if not postings:
+                del self._by_capability[capability]
+
+    def _ranking(self, capability: Optional[str]) -> SortedList:
+        if capability is None:
+            return self._overall
+        return self._by_capability.get(capability, SortedList())
+
+    def top(self, capability: Optional[str] = None, k: int = 10) -> List[UUID]:
+        """The IDs of the ``k`` best-ranked agents, optionally among those with ``capability``."""
+        return [agent_id for _, _, agent_id in islice(self._ranking(capability), k)]
+
+    def rank(self, agent_id: UUID, capability: Optional[str] = None) -> Optional[int]:
+        """The agent's 1-based rank, or ``None`` if it is not ranked for ``capability``."""
+        key = self._keys.get(agent_id)
+        if key is None or (capability is not None and capability not in self._capabilities[agent_id]):
+            return None
+        return self._ranking(capability).index(key) + 1
+
+
+class BidBook:
+    """
+    Order book of the live bids on a single task, cheapest first.
+
+    Each agent holds at most one live bid per task: bidding again replaces
+    the previous bid, so the book is bounded by the number of bidders rather
+    than by the number of bids ever made. Ties on amount go to the earlier
+    bid. Insertions, replacements and withdrawals are O(log n), the best bid
+    is read in O(1) and the top ``k`` bids in O(k). Writers to one task are
+    serialised by the caller; the book's own lock only keeps readers from
+    observing a half-applied update.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_seq = 0
+        self._book = SortedList()
+        self._keys: Dict[UUID, Tuple[float, int, UUID]] = {}
+        self._bids: Dict[UUID, Bid] = {}
+        self._bid_by_agent: Dict[UUID, UUID] = {}
+
+    def __len__(self) -> int:
+        return len(self._bids)
+
+    def __iter__(self) -> Iterator[Bid]:
+        with self._lock:
+            return iter([self._bids[bid_id] for _, _, bid_id in self._book])
+
+    def __contains__(self, bid: Bid) -> bool:
+        return self._bids.get(bid.bid_id) == bid
+
+    def get(self, bid_id: UUID) -> Optional[Bid]:
+        return self._bids.get(bid_id)
+
+    def has_agent(self, agent_id: UUID) -> bool:
+        """Whether the agent has a live bid in the book."""
+        return agent_id in self._bid_by_agent
+
+    def add(self, bid: Bid) -> Optional[Bid]:
+        """
+        Add a bid, returning the bid it replaced (if any). Raises
+        ``ValueError`` if another agent's bid in the book has the same id.
+        """
+        with self._lock:
+            return self._add(bid)
+
+    def _add(self, bid: Bid) -> Optional[Bid]:
+        same_id = self._bids.get(bid.bid_id)
+        if same_id is not None and same_id.agent_id != bid.agent_id:
+            raise ValueError("Bid already exists")
+        replaced = None
+        previous_id = self._bid_by_agent.get(bid.agent_id)
+        if previous_id is not None:
+            replaced = self._withdraw(previous_id)
+        key = (bid.bid_amount, self._next_seq, bid.bid_id)
+        self._next_seq += 1
+        self._book.add(key)
+        self._keys[bid.bid_id] = key
+        self._bids[bid.bid_id] = bid
+        self._bid_by_agent[bid.agent_id] = bid.bid_id
+        return replaced
+
+    def withdraw(self, bid_id: UUID) -> Optional[Bid]:
+        with self._lock:
+            return self._withdraw(bid_id)
+
+    def _withdraw(self, bid_id: UUID) -> Optional[Bid]:
+        bid = self._bids.pop(bid_id, None)
+        if bid is None:
+            return None
+        self._book.remove(self._keys.pop(bid_id))
+        if self._bid_by_agent.get(bid.agent_id) == bid_id:
+            del self._bid_by_agent[bid.agent_id]
+        return bid
+
+    def best(self) -> Optional[Bid]:
+        with self._lock:
+            if not self._book:
+                return None
+            return self._bids[self._book[0][2]]
+
+    def top(self, k: int) -> List[Bid]:
+        with self._lock:
+            return [self._bids[bid_id] for _, _, bid_id in islice(self._book, k)]
@@ -0,0 +1,285 @@
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.models import Task, Agent, Bid, WorkProduct
+from app.repository import Repository
+
+SEGMENT_PATTERN = "journal-{:020d}.log"
+SNAPSHOT_PATTERN = "snapshot-{:020d}.json"
+
+# Returns the last journal sequence number covered by a snapshot, and the
+# marketplace state as of that sequence number.
+Snapshotter = Callable[[], Tuple[int, Dict[str, List[dict]]]]
+
+
+def _dump(entity) -> dict:
+    return entity.model_dump(mode="json")
+
+
+class Journal:
+    """
+    Append-only, fsync-batched log of marketplace state changes.
+
+    Records are JSON lines carrying the post-change state of every entity the
+    change touched, so replay is a sequence of idempotent upserts. Writers
+    only append to an in-memory buffer; a background thread writes and
+    fsyncs whatever accumulated, so concurrent writers share one fsync
+    (group commit). With ``durable=True`` each writer waits, outside of any
+    marketplace lock, until its records are on disk.
+
+    Snapshots compact the log: the journal rolls over to a new segment at
+    the snapshot point and older segments are deleted once the snapshot is
+    safely written. Recovery loads the newest snapshot and replays the
+    segments after it.
+    """
+
+    def __init__(self, directory: str, durable: bool = True, commit_interval: float = 0.002):
+        self.directory = directory
+        self.durable = durable
+        self.commit_interval = commit_interval
+        self.fsync_count = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._committed = threading.Condition(self._lock)
+        self._io_lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._last_seq = self._scan_last_seq()
+        self._durable_seq = self._last_seq
+        self._local = threading.local()
+        self._segment = open(os.path.join(directory, SEGMENT_PATTERN.format(self._last_seq + 1)), "a", encoding="utf-8")
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    @property
+    def pending(self) -> int:
+        """Records appended but not yet written and fsynced."""
+        return self._last_seq - self._durable_seq
+
+    # Writing
+
+    def append(self, event_type: str, **entities) -> int:
+        """
+        Buffer a record for ``event_type``. Keyword arguments are lists of
+        ``tasks``, ``agents``, ``bids`` and ``work_products`` (pydantic
+        models), ``withdrawn_bids`` as ``(task_id, bid_id)`` pairs, or the
+        IDs of ``removed_tasks`` and ``removed_work_products``.
+        """
+        record: Dict[str, Any] = {"type": event_type}
+        for kind, items in entities.items():
+            if kind == "withdrawn_bids":
+                record[kind] = [[str(task_id), str(bid_id)] for task_id, bid_id in items]
+            elif kind in ("removed_tasks", "removed_work_products"):
+                record[kind] = [str(entity_id) for entity_id in items]
+            else:
+                record[kind] = [_dump(item) for item in items]
+        with self._lock:
+            self._last_seq += 1
+            record["seq"] = self._last_seq
+            self._buffer.append(json.dumps(record, separators=(",", ":")))
+            self._local.pending = self._last_seq
+            return self._last_seq
+
+    def wait_durable(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything this thread appended is fsynced (``durable`` mode only)."""
+        seq = getattr(self._local, "pending", 0)
+        if not self.durable or not seq:
+            return True
+        if not self._threads:
+            # No group-commit thread running; commit inline.
+            self.flush()
+        with self._lock:
+            return self._committed.wait_for(lambda: self._durable_seq >= seq or self._stopping.is_set(), timeout)
+
+    def flush(self):
+        """Write and fsync all buffered records now."""
+        with self._io_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+                seq = self._last_seq
+            if lines:
+                self._segment.write("\n".join(lines) + "\n")
+                self._segment.flush()
+                os.fsync(self._segment.fileno())
+                self.fsync_count += 1
+            with self._lock:
+                self._durable_seq = max(self._durable_seq, seq)
+                self._committed.notify_all()
+
+    def _commit_loop(self):
+        while not self._stopping.is_set():
+            if self._buffer:
+                self.flush()
+            time.sleep(self.commit_interval)
+        self.flush()
+
+    # Snapshots
+
+    def rotate(self) -> int:
+        """
+        Close the current segment and start a new one. Must be called while
+        writers are excluded, so that every change covered by the returned
+        sequence number is already applied when the state to go with it is
+        captured afterwards.
+        """
+        self.flush()
+        with self._io_lock:
+            self._segment.close()
+            seq = self._last_seq
+            self._segment = open(os.path.join(self.directory, SEGMENT_PATTERN.format(seq + 1)), "a", encoding="utf-8")
+        return seq
+
+    def write_snapshot(self, seq: int, state: Dict[str, List[dict]]):
+        """Persist a snapshot taken at ``seq`` and drop what it supersedes."""
+        path = os.path.join(self.directory, SNAPSHOT_PATTERN.format(seq))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": seq, "state": state}, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        for old in self._snapshots()[:-1]:
+            os.remove(old)
+        for segment in self._segments():
+            if self._segment_start(segment) <= seq and segment != self._segment.name:
+                os.remove(segment)
+
+    def _snapshot_loop(self, snapshotter: Snapshotter, interval: float):
+        while not self._stopping.wait(interval):
+            seq, state = snapshotter()
+            self.write_snapshot(seq, state)
+
+    # Recovery
+
+    def restore(self, repository: Repository) -> int:
+        """Load the latest snapshot and replay later records into ``repository``."""
+        snapshot_seq = 0
+        snapshots = self._snapshots()
+        if snapshots:
+            with open(snapshots[-1], encoding="utf-8") as f:
+                snapshot = json.load(f)
+            snapshot_seq = snapshot["seq"]
+            with repository.transaction():
+                self._apply(repository, snapshot["state"])
+        replayed = 0
+        for segment in self._segments():
+            with open(segment, encoding="utf-8") as f, repository.transaction():
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn write at the tail of the last segment.
+                        break
+                    if record["seq"] > snapshot_seq:
+                        self._apply(repository, record)
+                        replayed += 1
+        return replayed
+
+    @staticmethod
+    def _apply(repository: Repository, record: Dict[str, Any]):
+        for data in record.get("agents", ()):
+            agent = Agent(**data)
+            if repository.get_agent(agent.agent_id):
+                repository.update_agent(agent)
+            else:
+                repository.add_agent(agent)
+        for data in record.get("tasks", ()):
+            task = Task(**data)
+            existing = repository.get_task(task.task_id)
+            if existing:
+                existing.winning_bid = task.winning_bid
+                repository.update_task_status(existing, task.status)
+            else:
+                repository.add_task(task)
+        for data in record.get("bids", ()):
+            repository.add_bid(Bid(**data))
+        for task_id, bid_id in record.get("withdrawn_bids", ()):
+            repository.withdraw_bid(UUID(task_id), UUID(bid_id))
+        for data in record.get("work_products", ()):
+            repository.add_work_product(WorkProduct(**data))
+        for task_id in record.get("removed_tasks", ()):
+            repository.remove_task(UUID(task_id))
+        for work_id in record.get("removed_work_products", ()):
+            repository.remove_work_product(UUID(work_id))
+
+    # Lifecycle
+
+    def start(self, snapshotter: Optional[Snapshotter] = None, snapshot_interval: float = 300.0):
+        """Start the group-commit thread and, given a snapshotter, periodic snapshots."""
+        self._threads.append(threading.Thread(target=self._commit_loop, name="journal-commit", daemon=True))
+        if snapshotter is not None:
+            self._threads.append(threading.Thread(
+                target=self._snapshot_loop, args=(snapshotter, snapshot_interval), name="journal-snapshot", daemon=True
+            ))
+        for thread in self._threads:
+            thread.start()
+
+    def close(self):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join()
+        self.flush()
+        self._segment.close()
+        with self._lock:
+            self._committed.notify_all()
+
+    # Files
+
+    def _segments(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "journal-*.log")))
+
+    def _snapshots(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "snapshot-*.json")))
+
+    @staticmethod
+    def _segment_start(path: str) -> int:
+        return int(os.path.basename(path)[len("journal-"):-len(".log")])
+
+    def _scan_last_seq(self) -> int:
+        last_seq = 0
+        snapshots = self._snapshots()
+        if snapshots:
+            last_seq = int(os.path.basename(snapshots[-1])[len("snapshot-"):-len(".json")])
+        segments = self._segments()
+        if segments:
+            with open(segments[-1], encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        last_seq = max(last_seq, json.loads(line)["seq"])
+                    except ValueError:
+                        break
+            last_seq = max(last_seq, self._segment_start(segments[-1]) - 1)
+        return last_seq
+
+
+_journal: Optional[Journal] = None
+
+
+def get_journal() -> Optional[Journal]:
+    """The active journal, or ``None`` when journaling is disabled."""
+    return _journal
+
+
+def set_journal(journal: Optional[Journal]):
+    global _journal
+    _journal = journal
+
+
+def open_journal_from_env() -> Optional[Journal]:
+    """
+    Open the journal configured by ``AEGIS_JOURNAL_DIR`` (unset disables
+    journaling). ``AEGIS_JOURNAL_DURABLE=0`` acknowledges writes before
+    their group commit has been fsynced.
+    """
+    directory = os.environ.get("AEGIS_JOURNAL_DIR")
+    if not directory:
+        return None
+    return Journal(directory, durable=os.environ.get("AEGIS_JOURNAL_DURABLE", "1") != "0")
@@ -1,11 +1,72 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from app.endpoints import router
+from app.admission import MAX_IN_FLIGHT, LoadShedMiddleware
+from app.archive import ARCHIVE_INTERVAL, ARCHIVE_RETENTION, TaskArchiver, open_cold_store_from_env, set_cold_store
+from app.endpoints import auction_scheduler, router, shards, task_board, verification_queue, work_verification_service
+from app.components import snapshot_state
+from app.events import event_bus
+from app.journal import open_journal_from_env, set_journal
+from app.metrics import MetricsMiddleware
+from app.repository import get_repository
+from app.sharding import EventRelay, sharding_enabled
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Recover from the latest snapshot plus the journal tail, then keep
+    # journaling (and periodically snapshotting) while the app runs. Shard
+    # processes keep their own journals, so a sharded front end has none.
+    journal = None if sharding_enabled() else open_journal_from_env()
+    if journal is not None:
+        journal.restore(get_repository())
+        set_journal(journal)
+        journal.start(snapshot_state, float(os.environ.get("AEGIS_SNAPSHOT_INTERVAL", "300")))
+    # Verification jobs are not persisted; queue pending work products again.
+    # Sharded, every front end queues them all: a work product verified
+    # twice is rejected the second time, so it still counts once.
+    for work_product, task in work_verification_service.pending_work():
+        verification_queue.submit(work_product, task)
+    if not sharding_enabled():
+        # Likewise auction deadlines (shards reschedule their own); those
+        # that passed while down close right away.
+        auction_scheduler.schedule_tasks(get_repository().all_tasks())
+    # Archive finished tasks to the cold store; shards run their own archivers.
+    cold_store = None if sharding_enabled() else open_cold_store_from_env()
+    if cold_store is not None:
+        set_cold_store(cold_store)
+        archiver = TaskArchiver(task_board, cold_store, ARCHIVE_RETENTION)
+        archiver.start(ARCHIVE_INTERVAL)
+    # Events are published where tasks change, in the shards; follow them.
+    relay = None if shards is None else EventRelay(shards, event_bus)
+    if relay is not None:
+        relay.start()
+    verification_queue.start()
+    auction_scheduler.start()
+    yield
+    await auction_scheduler.stop()
+    if relay is not None:
+        relay.close()
+    verification_queue.close()
+    if cold_store is not None:
+        archiver.close()
+        set_cold_store(None)
+        cold_store.close()
+    if journal is not None:
+        set_journal(None)
+        journal.close()
+
 
 app = FastAPI(
     title="Aegis Agent Marketplace POC",
     description="A proof-of-concept for a decentralized agent marketplace.",
+    lifespan=lifespan,
 )
 
+app.add_middleware(MetricsMiddleware)
+# Outermost, so shed requests cost next to nothing.
+app.add_middleware(LoadShedMiddleware, max_in_flight=MAX_IN_FLIGHT)
 app.include_router(router)
 
 @app.get("/")
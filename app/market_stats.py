@@ -0,0 +1,246 @@
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from app.models import Bid, MarketStats, Quantiles, Task
+
+# Sketch accuracy: reported quantiles are within 1% of a true value.
+RELATIVE_ACCURACY = 0.01
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+CapabilitySet = Tuple[str, ...]
+
+
+def capability_set(capabilities: Iterable[str]) -> CapabilitySet:
+    """The key statistics are kept under: the capabilities, sorted and without repeats."""
+    return tuple(sorted(set(capabilities)))
+
+
+class QuantileSketch:
+    """
+    Streaming quantiles with a bounded relative error (the DDSketch scheme).
+
+    A positive value ``v`` is counted in bucket ``ceil(log(v) / log(gamma))``
+    with ``gamma = (1 + a) / (1 - a)``, and a quantile is read back from its
+    bucket to within a relative error ``a``. Only the counts of the buckets
+    in use are stored, a few hundred for values spanning several orders of
+    magnitude, however many values are added; sketches of the same accuracy
+    merge by adding counts.
+    """
+
+    __slots__ = ("relative_accuracy", "_gamma", "_log_gamma", "_buckets", "_zeros", "count")
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        # Values of zero or less, which have no logarithm; reported as 0.
+        self._zeros = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= 0:
+            self._zeros += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def merge(self, other: "QuantileSketch"):
+        if other._gamma != self._gamma:
+            raise ValueError("Cannot merge sketches of different accuracy")
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+        self._zeros += other._zeros
+        self.count += other.count
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """The values at the ascending quantiles ``qs``, in one pass over the buckets."""
+        if not self.count:
+            return []
+        results = []
+        buckets = iter(sorted(self._buckets.items()))
+        seen, value = self._zeros, 0.0
+        for q in qs:
+            rank = q * (self.count - 1)
+            while seen <= rank:
+                index, count = next(buckets)
+                seen += count
+                value = 2 * self._gamma ** index / (self._gamma + 1)
+            results.append(value)
+        return results
+
+
+class MarketWindow:
+    """Market activity for one capability set over one window."""
+
+    __slots__ = ("bids", "bid_ratios", "awarded", "awarded_bids", "winning_ratios", "assignment_seconds")
+
+    def __init__(self):
+        self.bids = 0
+        # Bid amounts as a fraction of the task's reward.
+        self.bid_ratios = QuantileSketch()
+        # Auctions won, the live bids they had between them, the winning
+        # ratios and the seconds from posting to assignment.
+        self.awarded = 0
+        self.awarded_bids = 0
+        self.winning_ratios = QuantileSketch()
+        self.assignment_seconds = QuantileSketch()
+
+    def merge(self, other: "MarketWindow"):
+        self.bids += other.bids
+        self.bid_ratios.merge(other.bid_ratios)
+        self.awarded += other.awarded
+        self.awarded_bids += other.awarded_bids
+        self.winning_ratios.merge(other.winning_ratios)
+        self.assignment_seconds.merge(other.assignment_seconds)
+
+    def summarize(self, capabilities: CapabilitySet, window_seconds: float) -> MarketStats:
+        return MarketStats(
+            capabilities=list(capabilities),
+            window_seconds=window_seconds,
+            bids=self.bids,
+            awarded=self.awarded,
+            mean_bids_per_award=self.awarded_bids / self.awarded if self.awarded else None,
+            bid_ratio=_quantiles(self.bid_ratios),
+            winning_ratio=_quantiles(self.winning_ratios),
+            assignment_seconds=_quantiles(self.assignment_seconds),
+        )
+
+
+def _quantiles(sketch: QuantileSketch) -> Optional[Quantiles]:
+    values = sketch.quantiles(QUANTILES)
+    if not values:
+        return None
+    return Quantiles(**{f"p{round(q * 100)}": value for q, value in zip(QUANTILES, values)})
+
+
+class MarketStatistics:
+    """
+    Rolling market prices per capability set, kept up to date as bids come
+    in and auctions are won, so reading them never touches the bids.
+
+    Activity is counted into the current window; every ``window_seconds``
+    it becomes the previous window and a new one starts, and statistics
+    cover both, so they reflect the last one to two windows. Summaries are
+    cached per capability set until its next update.
+
+    Post times are only remembered for auctions posted since the process
+    started, and are forgotten at a window roll once older than
+    ``post_time_retention`` seconds, so auctions recovered from storage or
+    open for longer than that report no time to assignment.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+        post_time_retention: float = 86400.0,
+    ):
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self.post_time_retention = post_time_retention
+        self._lock = threading.Lock()
+        self._current: Dict[CapabilitySet, MarketWindow] = {}
+        self._previous: Dict[CapabilitySet, MarketWindow] = {}
+        self._window_started = clock()
+        self._posted_at: Dict[UUID, float] = {}
+        self._summaries: Dict[CapabilitySet, MarketStats] = {}
+
+    def _roll(self):
+        now = self.clock()
+        elapsed = now - self._window_started
+        if elapsed < self.window_seconds:
+            return
+        # After a quiet spell longer than a window, the last one is stale too.
+        self._previous = self._current if elapsed < 2 * self.window_seconds else {}
+        self._current = {}
+        self._window_started = now
+        self._summaries.clear()
+        # Auctions that are never awarded would otherwise be remembered forever.
+        cutoff = now - self.post_time_retention
+        self._posted_at = {task_id: posted_at for task_id, posted_at in self._posted_at.items() if posted_at >= cutoff}
+
+    def _window(self, task: Task) -> MarketWindow:
+        key = capability_set(task.required_capabilities)
+        self._roll()
+        self._summaries.pop(key, None)
+        window = self._current.get(key)
+        if window is None:
+            window = self._current[key] = MarketWindow()
+        return window
+
+    # Updates, called by the components under the task's lock.
+
+    def task_posted(self, task: Task):
+        with self._lock:
+            self._posted_at[task.task_id] = self.clock()
+
+    def bid_submitted(self, task: Task, bid: Bid):
+        with self._lock:
+            window = self._window(task)
+            window.bids += 1
+            if task.reward_amount > 0:
+                window.bid_ratios.add(bid.bid_amount / task.reward_amount)
+
+    def task_awarded(self, task: Task, bid: Bid, live_bids: int):
+        with self._lock:
+            posted_at = self._posted_at.pop(task.task_id, None)
+            window = self._window(task)
+            window.awarded += 1
+            window.awarded_bids += live_bids
+            if task.reward_amount > 0:
+                window.winning_ratios.add(bid.bid_amount / task.reward_amount)
+            if posted_at is not None:
+                window.assignment_seconds.add(self.clock() - posted_at)
+
+    # Reads
+
+    def _keys(self, capabilities: Optional[Iterable[str]]):
+        self._roll()
+        if capabilities is not None:
+            key = capability_set(capabilities)
+            return [key] if key in self._current or key in self._previous else []
+        return sorted(self._current.keys() | self._previous.keys())
+
+    def _merged(self, key: CapabilitySet) -> MarketWindow:
+        window = MarketWindow()
+        for source in (self._previous, self._current):
+            if key in source:
+                window.merge(source[key])
+        return window
+
+    def windows(self, capabilities: Optional[Iterable[str]] = None) -> Dict[CapabilitySet, MarketWindow]:
+        """The current and previous windows merged, per capability set (or only ``capabilities``)."""
+        with self._lock:
+            return {key: self._merged(key) for key in self._keys(capabilities)}
+
+    def summaries(self, capabilities: Optional[Iterable[str]] = None) -> List[MarketStats]:
+        """Statistics for every capability set seen lately, or only for exactly ``capabilities``."""
+        with self._lock:
+            summaries = []
+            for key in self._keys(capabilities):
+                summary = self._summaries.get(key)
+                if summary is None:
+                    summary = self._summaries[key] = self._merged(key).summarize(key, self.window_seconds)
+                summaries.append(summary)
+            return summaries
+
+
+def summarize_windows(
+    windows: Iterable[Dict[CapabilitySet, MarketWindow]], window_seconds: float
+) -> List[MarketStats]:
+    """Statistics from the windows of several processes (shards), merged."""
+    merged: Dict[CapabilitySet, MarketWindow] = {}
+    for process_windows in windows:
+        for key, window in process_windows.items():
+            merged.setdefault(key, MarketWindow()).merge(window)
+    return [merged[key].summarize(key, window_seconds) for key in sorted(merged)]
+
+
+# AEGIS_MARKET_STATS_WINDOW sets the window length in seconds.
+market_stats = MarketStatistics(float(os.environ.get("AEGIS_MARKET_STATS_WINDOW", "3600")))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from uuid import UUID, uuid4
 import enum
 
@@ -12,6 +12,27 @@ class TaskStatus(str, enum.Enum):
     VERIFIED = "VERIFIED"
     PAID = "PAID"
     REJECTED = "REJECTED"
+    # Bidding closed without a bid. Last, so compact status codes stay stable.
+    EXPIRED = "EXPIRED"
+
+# Statuses in which a task still accepts bids.
+OPEN_TASK_STATUSES = frozenset({TaskStatus.POSTED, TaskStatus.BIDDING_OPEN})
+
+# Statuses in which an assigned agent holds a task it has yet to submit.
+HELD_TASK_STATUSES = frozenset({TaskStatus.ASSIGNED, TaskStatus.IN_PROGRESS})
+
+# The task lifecycle: the statuses each status may move to.
+TASK_STATUS_TRANSITIONS = {
+    TaskStatus.POSTED: frozenset({TaskStatus.BIDDING_OPEN, TaskStatus.EXPIRED}),
+    TaskStatus.BIDDING_OPEN: frozenset({TaskStatus.ASSIGNED, TaskStatus.EXPIRED}),
+    TaskStatus.ASSIGNED: frozenset({TaskStatus.IN_PROGRESS, TaskStatus.SUBMITTED}),
+    TaskStatus.IN_PROGRESS: frozenset({TaskStatus.SUBMITTED}),
+    TaskStatus.SUBMITTED: frozenset({TaskStatus.VERIFIED, TaskStatus.REJECTED}),
+    TaskStatus.VERIFIED: frozenset({TaskStatus.PAID}),
+    TaskStatus.PAID: frozenset(),
+    TaskStatus.REJECTED: frozenset(),
+    TaskStatus.EXPIRED: frozenset(),
+}
 
 class QualificationLevel(str, enum.Enum):
     NOVICE = "NOVICE"
@@ -24,6 +45,12 @@ class VerificationStatus(str, enum.Enum):
     PASSED = "PASSED"
     FAILED = "FAILED"
 
+class Bid(BaseModel):
+    bid_id: UUID = Field(default_factory=uuid4)
+    task_id: UUID
+    agent_id: UUID
+    bid_amount: float
+
 class Task(BaseModel):
     task_id: UUID = Field(default_factory=uuid4)
     title: str
@@ -31,23 +58,114 @@ class Task(BaseModel):
     required_capabilities: List[str]
     reward_amount: float
     status: TaskStatus = TaskStatus.POSTED
+    # Unix time at which bidding closes and the best bid wins automatically;
+    # without one, the winner is only selected on request.
+    bidding_deadline: Optional[float] = None
+    # The bid the task was awarded to, set when it is assigned.
+    winning_bid: Optional[Bid] = None
 
 class Agent(BaseModel):
     agent_id: UUID = Field(default_factory=uuid4)
     capabilities: List[str]
+    # Mean verification score, the number of passed and failed tasks, and
+    # the passed fraction of all verified tasks.
     reputation_score: float = 0.0
     completed_tasks: int = 0
+    failed_tasks: int = 0
     success_rate: float = 0.0
+    # Variance of verification scores, and their time-decayed average (with
+    # its total weight and the Unix time it was last updated).
+    score_variance: float = 0.0
+    recent_score: float = 0.0
+    recent_score_weight: float = 0.0
+    last_scored_at: Optional[float] = None
 
-class Bid(BaseModel):
-    bid_id: UUID = Field(default_factory=uuid4)
-    task_id: UUID
-    agent_id: UUID
-    bid_amount: float
+class BlobRef(BaseModel):
+    # SHA-256 of the content, as lowercase hex.
+    digest: str
+    size: int
+    media_type: str = "application/octet-stream"
 
 class WorkProduct(BaseModel):
     work_id: UUID = Field(default_factory=uuid4)
     task_id: UUID
     agent_id: UUID
-    deliverable: Dict[str, Any]
+    # The deliverable itself, or (for large ones) a reference to it in the
+    # blob store; exactly one of the two is set.
+    deliverable: Optional[Dict[str, Any]] = None
+    deliverable_blob: Optional[BlobRef] = None
     verification_status: VerificationStatus = VerificationStatus.PENDING
+
+class ArchivedTask(BaseModel):
+    """A finished task as moved to the cold store, with its bids (best first) and work products."""
+    task: Task
+    bids: List[Bid] = Field(default_factory=list)
+    work_products: List[WorkProduct] = Field(default_factory=list)
+    archived_at: float
+
+class VerificationState(str, enum.Enum):
+    QUEUED = "QUEUED"
+    VERIFYING = "VERIFYING"
+    VERIFIED = "VERIFIED"
+    ERROR = "ERROR"
+    # No verifier handles the task; it waits for a score from a caller.
+    MANUAL = "MANUAL"
+
+class VerificationJob(BaseModel):
+    work_id: UUID
+    state: VerificationState
+    score: Optional[float] = None
+    error: Optional[str] = None
+
+class VerificationQueueStats(BaseModel):
+    depth: int
+    in_progress: int
+    verified: int
+    errors: int
+    workers: int
+
+class MarketClearing(BaseModel):
+    # Auctions (open tasks with bids) and bidding agents considered.
+    tasks: int
+    agents: int
+    dry_run: bool = False
+    # The winning bids, and the auctions left open for the next tick.
+    assignments: List[Bid] = Field(default_factory=list)
+    unassigned: List[UUID] = Field(default_factory=list)
+    # Sum of the winning bids' reputation-weighted costs.
+    total_cost: float = 0.0
+    elapsed_seconds: float = 0.0
+
+class Quantiles(BaseModel):
+    p10: float
+    p25: float
+    p50: float
+    p75: float
+    p90: float
+
+class MarketStats(BaseModel):
+    # The exact set of capabilities the tasks required.
+    capabilities: List[str]
+    # The statistics cover the last one to two windows of this length.
+    window_seconds: float
+    bids: int
+    # Auctions won, and how many live bids they had on average.
+    awarded: int
+    mean_bids_per_award: Optional[float] = None
+    # Bid amounts as a fraction of the task's reward, for all bids and for
+    # winning ones, and the seconds from posting to assignment; ``None``
+    # until there is any.
+    bid_ratio: Optional[Quantiles] = None
+    winning_ratio: Optional[Quantiles] = None
+    assignment_seconds: Optional[Quantiles] = None
+
+class AgentRank(BaseModel):
+    agent_id: UUID
+    capability: Optional[str] = None
+    rank: int
+
+class BatchItemResult(BaseModel):
+    index: int
+    status_code: int
+    id: Optional[UUID] = None
+    error: Optional[str] = None
@@ -0,0 +1,367 @@
+import abc
+import os
+import threading
+from contextlib import nullcontext
+from typing import ContextManager, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from app.database import db, indexes
+from app.indexes import BidBook
+from app.models import Task, Agent, Bid, WorkProduct, TaskStatus, OPEN_TASK_STATUSES
+
+
+class AlreadyExists(ValueError):
+    """Raised when adding a task whose id is already stored."""
+
+
+class Repository(abc.ABC):
+    """
+    Storage interface used by the marketplace components.
+
+    Entities returned by a repository may or may not be shared with the
+    store, so callers always write changes back through the ``update_*``
+    methods instead of relying on in-place mutation.
+    """
+
+    def transaction(self) -> ContextManager:
+        """Group several writes so they are applied as one unit."""
+        return nullcontext()
+
+    @abc.abstractmethod
+    def clear(self):
+        ...
+
+    def dump(self) -> Dict[str, List[dict]]:
+        """
+        Every stored entity as JSON-compatible dicts, e.g. for a snapshot.
+        Safe to call alongside writers, though the result then mixes states
+        from before and after their changes.
+        """
+        return {
+            "agents": [agent.model_dump(mode="json") for agent in self.all_agents()],
+            "tasks": [task.model_dump(mode="json") for task in self.all_tasks()],
+            "bids": [bid.model_dump(mode="json") for bid in self.all_bids()],
+            "work_products": [work_product.model_dump(mode="json") for work_product in self.all_work_products()],
+        }
+
+    def count_entities(self) -> Dict[str, int]:
+        """How many tasks, agents, live bids and work products are stored."""
+        return {
+            "tasks": len(self.all_tasks()),
+            "agents": len(self.all_agents()),
+            "bids": len(self.all_bids()),
+            "work_products": len(self.all_work_products()),
+        }
+
+    # Tasks
+
+    @abc.abstractmethod
+    def add_task(self, task: Task):
+        """Store a new task; raises ``AlreadyExists`` if its id is taken."""
+
+    @abc.abstractmethod
+    def get_task(self, task_id: UUID) -> Optional[Task]:
+        ...
+
+    @abc.abstractmethod
+    def update_task_status(self, task: Task, status: TaskStatus):
+        """Set ``task.status`` and persist it, along with ``task.winning_bid`` (set on assignment)."""
+
+    @abc.abstractmethod
+    def all_tasks(self) -> List[Task]:
+        ...
+
+    @abc.abstractmethod
+    def page_tasks(
+        self,
+        status: Optional[TaskStatus],
+        capability: Optional[str],
+        min_reward: Optional[float],
+        cursor: Optional[int],
+        limit: int,
+    ) -> Tuple[List[Task], Optional[int]]:
+        """A page of tasks in posting order (reward order with ``min_reward``) and the next cursor."""
+
+    @abc.abstractmethod
+    def eligible_tasks(self, capabilities: Iterable[str]) -> List[Task]:
+        """Open tasks whose required capabilities are all in ``capabilities``."""
+
+    @abc.abstractmethod
+    def remove_task(self, task_id: UUID) -> Optional[Task]:
+        """Delete a task and its bids, e.g. once it is archived; returns the task."""
+
+    @abc.abstractmethod
+    def count_held_tasks(self, agent_ids: Iterable[UUID]) -> Dict[UUID, int]:
+        """
+        How many tasks each agent holds, i.e. was awarded and has yet to
+        submit; agents holding none are left out.
+        """
+
+    # Agents
+
+    @abc.abstractmethod
+    def add_agent(self, agent: Agent):
+        ...
+
+    @abc.abstractmethod
+    def get_agent(self, agent_id: UUID) -> Optional[Agent]:
+        ...
+
+    @abc.abstractmethod
+    def update_agent(self, agent: Agent):
+        ...
+
+    @abc.abstractmethod
+    def all_agents(self) -> List[Agent]:
+        ...
+
+    @abc.abstractmethod
+    def qualified_agents(self, required_capabilities: Iterable[str]) -> List[Agent]:
+        ...
+
+    @abc.abstractmethod
+    def top_agents(self, capability: Optional[str], k: int) -> List[Agent]:
+        """The ``k`` agents with the best reputation, optionally among those with ``capability``."""
+
+    @abc.abstractmethod
+    def agent_rank(self, agent_id: UUID, capability: Optional[str]) -> Optional[int]:
+        """The agent's 1-based leaderboard rank, or ``None`` if it is not ranked for ``capability``."""
+
+    # Bids
+
+    @abc.abstractmethod
+    def add_bid(self, bid: Bid) -> Optional[Bid]:
+        """
+        Store a bid, replacing (and returning) the agent's previous bid on the
+        task; raises ``AlreadyExists`` if its id is taken by another bid.
+        """
+
+    @abc.abstractmethod
+    def withdraw_bid(self, task_id: UUID, bid_id: UUID) -> Optional[Bid]:
+        ...
+
+    @abc.abstractmethod
+    def count_bids(self, task_id: UUID) -> int:
+        ...
+
+    @abc.abstractmethod
+    def has_bid(self, task_id: UUID, agent_id: UUID) -> bool:
+        """Whether the agent has a live bid on the task."""
+
+    @abc.abstractmethod
+    def all_bids(self) -> List[Bid]:
+        """Every live bid, grouped by task and in order of preference within a task."""
+
+    @abc.abstractmethod
+    def top_bids(self, task_id: UUID, k: int) -> List[Bid]:
+        """The ``k`` lowest live bids on a task, best first."""
+
+    # Work products
+
+    @abc.abstractmethod
+    def add_work_product(self, work_product: WorkProduct):
+        ...
+
+    @abc.abstractmethod
+    def get_work_product(self, work_id: UUID) -> Optional[WorkProduct]:
+        ...
+
+    @abc.abstractmethod
+    def update_work_product(self, work_product: WorkProduct):
+        ...
+
+    @abc.abstractmethod
+    def all_work_products(self) -> List[WorkProduct]:
+        ...
+
+    @abc.abstractmethod
+    def remove_work_product(self, work_id: UUID) -> Optional[WorkProduct]:
+        ...
+
+
+class InMemoryRepository(Repository):
+    """
+    Repository over the process-local ``db`` dicts and their secondary indexes.
+
+    Callers serialise writes per task or agent; the indexes are shared by
+    all tasks, so their updates and reads take a short internal lock.
+    """
+
+    def __init__(self, tables: dict = db, task_indexes: dict = indexes):
+        self.db = tables
+        self.indexes = task_indexes
+        self._index_lock = threading.Lock()
+
+    def clear(self):
+        with self._index_lock:
+            for table in self.db.values():
+                table.clear()
+            for index in self.indexes.values():
+                index.clear()
+
+    def count_entities(self) -> Dict[str, int]:
+        return {
+            "tasks": len(self.db["tasks"]),
+            "agents": len(self.db["agents"]),
+            "bids": sum(len(book) for book in list(self.db["bids"].values())),
+            "work_products": len(self.db["work_products"]),
+        }
+
+    def add_task(self, task: Task):
+        # Callers hold the task's lock stripe, so nothing can slip in between.
+        if task.task_id in self.db["tasks"]:
+            raise AlreadyExists("Task already exists")
+        self.db["tasks"][task.task_id] = task
+        with self._index_lock:
+            self.indexes["tasks"].add_task(task)
+            self._index_status(task)
+
+    def get_task(self, task_id: UUID) -> Optional[Task]:
+        return self.db["tasks"].get(task_id)
+
+    def update_task_status(self, task: Task, status: TaskStatus):
+        task.status = status
+        with self._index_lock:
+            self.indexes["tasks"].update_status(task)
+            self._index_status(task)
+
+    def _index_status(self, task: Task):
+        if task.status in OPEN_TASK_STATUSES:
+            self.indexes["capabilities"].add_task(task)
+        else:
+            self.indexes["capabilities"].remove_task(task.task_id)
+
+    def all_tasks(self) -> List[Task]:
+        return list(self.db["tasks"].values())
+
+    def page_tasks(self, status, capability, min_reward, cursor, limit):
+        with self._index_lock:
+            task_ids, next_cursor = self.indexes["tasks"].page(status, capability, min_reward, cursor, limit)
+        return [self.db["tasks"][task_id] for task_id in task_ids], next_cursor
+
+    def eligible_tasks(self, capabilities: Iterable[str]) -> List[Task]:
+        with self._index_lock:
+            task_ids = self.indexes["capabilities"].eligible_task_ids(capabilities)
+        return [self.db["tasks"][task_id] for task_id in task_ids]
+
+    def remove_task(self, task_id: UUID) -> Optional[Task]:
+        task = self.db["tasks"].pop(task_id, None)
+        if task is None:
+            return None
+        self.db["bids"].pop(task_id, None)
+        with self._index_lock:
+            self.indexes["tasks"].remove_task(task_id)
+            self.indexes["capabilities"].remove_task(task_id)
+        return task
+
+    def count_held_tasks(self, agent_ids: Iterable[UUID]) -> Dict[UUID, int]:
+        with self._index_lock:
+            return self.indexes["tasks"].held_counts(agent_ids)
+
+    def add_agent(self, agent: Agent):
+        self.db["agents"][agent.agent_id] = agent
+        with self._index_lock:
+            self.indexes["capabilities"].add_agent(agent)
+            self.indexes["reputation"].add_agent(agent)
+
+    def get_agent(self, agent_id: UUID) -> Optional[Agent]:
+        return self.db["agents"].get(agent_id)
+
+    def update_agent(self, agent: Agent):
+        self.db["agents"][agent.agent_id] = agent
+        with self._index_lock:
+            self.indexes["reputation"].add_agent(agent)
+
+    def all_agents(self) -> List[Agent]:
+        return list(self.db["agents"].values())
+
+    def qualified_agents(self, required_capabilities: Iterable[str]) -> List[Agent]:
+        with self._index_lock:
+            agent_ids = self.indexes["capabilities"].qualified_agent_ids(required_capabilities)
+        return [self.db["agents"][agent_id] for agent_id in agent_ids]
+
+    def top_agents(self, capability: Optional[str], k: int) -> List[Agent]:
+        with self._index_lock:
+            agent_ids = self.indexes["reputation"].top(capability, k)
+        return [self.db["agents"][agent_id] for agent_id in agent_ids]
+
+    def agent_rank(self, agent_id: UUID, capability: Optional[str]) -> Optional[int]:
+        with self._index_lock:
+            return self.indexes["reputation"].rank(agent_id, capability)
+
+    def add_bid(self, bid: Bid) -> Optional[Bid]:
+        if bid.task_id not in self.db["bids"]:
+            self.db["bids"][bid.task_id] = BidBook()
+        try:
+            return self.db["bids"][bid.task_id].add(bid)
+        except ValueError as e:
+            raise AlreadyExists(str(e)) from None
+
+    def withdraw_bid(self, task_id: UUID, bid_id: UUID) -> Optional[Bid]:
+        if task_id not in self.db["bids"]:
+            return None
+        return self.db["bids"][task_id].withdraw(bid_id)
+
+    def count_bids(self, task_id: UUID) -> int:
+        return len(self.db["bids"].get(task_id, ()))
+
+    def has_bid(self, task_id: UUID, agent_id: UUID) -> bool:
+        book = self.db["bids"].get(task_id)
+        return book is not None and book.has_agent(agent_id)
+
+    def top_bids(self, task_id: UUID, k: int) -> List[Bid]:
+        if task_id not in self.db["bids"]:
+            return []
+        return self.db["bids"][task_id].top(k)
+
+    def all_bids(self) -> List[Bid]:
+        # Copied first, as books may be added while they are read.
+        return [bid for book in list(self.db["bids"].values()) for bid in book]
+
+    def add_work_product(self, work_product: WorkProduct):
+        self.db["work_products"][work_product.work_id] = work_product
+
+    def get_work_product(self, work_id: UUID) -> Optional[WorkProduct]:
+        return self.db["work_products"].get(work_id)
+
+    def update_work_product(self, work_product: WorkProduct):
+        self.db["work_products"][work_product.work_id] = work_product
+
+    def all_work_products(self) -> List[WorkProduct]:
+        return list(self.db["work_products"].values())
+
+    def remove_work_product(self, work_id: UUID) -> Optional[WorkProduct]:
+        return self.db["work_products"].pop(work_id, None)
+
+
+def create_repository(url: str) -> Repository:
+    """
+    Build a repository from a storage URL: ``memory://`` for the in-process
+    store, ``compact://`` for the in-process store in column arrays, or
+    ``sqlite:///path/to/marketplace.db`` for the SQLite backend.
+    """
+    if url in ("memory://", ""):
+        return InMemoryRepository()
+    if url == "compact://":
+        from app.compact_repository import CompactRepository
+        return CompactRepository()
+    if url.startswith("sqlite:///"):
+        from app.sqlite_repository import SQLiteRepository
+        return SQLiteRepository(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported storage URL: {url}")
+
+
+_repository: Optional[Repository] = None
+
+
+def get_repository() -> Repository:
+    """The process-wide repository, configured by ``AEGIS_DATABASE_URL``."""
+    global _repository
+    if _repository is None:
+        _repository = create_repository(os.environ.get("AEGIS_DATABASE_URL", "memory://"))
+    return _repository
+
+
+def set_repository(repository: Repository):
+    global _repository
+    _repository = repository
@@ -0,0 +1,589 @@
+"""
+Hash-partitioned marketplace state across shard processes.
+
+Each shard is a separate process that owns an ordinary repository and set
+of components. Task-scoped state (tasks, their bids and work products)
+lives on the shard picked by ``task_id``; agents are replicated to every
+shard so bids can be qualified locally, and each agent's reputation is
+owned by the shard picked by ``agent_id``, which pushes updates to the
+other replicas. Shards also close the auctions of their own tasks when
+the bidding deadline passes.
+
+Front-end processes (e.g. ``uvicorn --workers N``) route requests with a
+``ShardRouter`` over ``multiprocessing.connection``; Unix socket paths or
+``host:port`` addresses both work. Start the shards with
+
+    python -m app.sharding --shards 4 --socket-dir /tmp/aegis
+
+and point the front ends at them with the ``AEGIS_SHARDS`` and
+``AEGIS_SHARD_AUTHKEY`` values it prints. Messages are pickled, so the
+key is all that stands between a connecting process and running code in
+a shard: it is generated per run unless ``AEGIS_SHARD_AUTHKEY`` is set,
+and never defaulted.
+With ``AEGIS_JOURNAL_DIR`` set, every shard journals to its own
+subdirectory, and likewise archives finished tasks with
+``AEGIS_ARCHIVE_DIR``. Each front end's ``EventRelay`` follows the event
+buses of all shards, so ``/events`` and ``/tasks/changes`` see changes
+made through any front end, a moment after they are made. Front ends
+number events independently, so a client switching between them is told
+to resynchronise, as after a restart.
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from collections import defaultdict
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from uuid import UUID
+
+from app.auctions import AuctionScheduler
+from app.archive import ARCHIVE_INTERVAL, ARCHIVE_RETENTION, TaskArchiver, open_cold_store_from_env, set_cold_store
+from app.components import (
+    TaskBoard,
+    AgentRegistry,
+    QualificationEngine,
+    BiddingSystem,
+    WorkVerificationService,
+    ReputationLedger,
+    snapshot_state,
+)
+from app.events import EventBus, event_bus
+from app.journal import Journal, set_journal
+from app.market_stats import market_stats, summarize_windows
+from app.models import ArchivedTask, Task, Agent, Bid, WorkProduct, TaskStatus, MarketStats
+from app.repository import Repository, get_repository
+
+Address = Union[str, Tuple[str, int]]
+
+# Cursors handed out by a router encode the shard in the high bits and that
+# shard's own cursor (plus one, so zero means "start of shard") below.
+SHARD_CURSOR_SPAN = 1 << 40
+
+
+def shard_index(entity_id: UUID, shards: int) -> int:
+    """The shard owning ``entity_id``."""
+    # Lock stripes inside a shard use the low bits, so partition on the high ones.
+    return (entity_id.int >> 64) % shards
+
+
+def parse_address(value: str) -> Address:
+    """``host:port`` for TCP, anything else is a Unix socket path."""
+    host, _, port = value.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return value
+
+
+def format_address(address: Address) -> str:
+    return address if isinstance(address, str) else f"{address[0]}:{address[1]}"
+
+
+class ShardServer:
+    """Serves one shard's components to routers, one thread per connection."""
+
+    def __init__(self, repository: Optional[Repository] = None):
+        self.repository = repository or get_repository()
+        self.task_board = TaskBoard(self.repository)
+        agent_registry = AgentRegistry(self.repository)
+        qualification_engine = QualificationEngine(self.repository)
+        self.bidding_system = BiddingSystem(self.repository)
+        work_verification_service = WorkVerificationService(self.repository)
+        self.reputation_ledger = ReputationLedger(self.repository)
+        # Each shard closes the auctions of the tasks it owns at their deadline.
+        self.auction_scheduler = AuctionScheduler(self.bidding_system.close_auction)
+        self.operations: Dict[str, Callable] = {
+            "post_task": self._post_task,
+            "post_tasks": self._post_tasks,
+            "get_task": self.task_board.get_task,
+            "get_archived_task": self.task_board.get_archived_task,
+            "get_all_tasks": self.task_board.get_all_tasks,
+            "list_tasks": self.task_board.list_tasks,
+            "held_task_counts": self.task_board.held_task_counts,
+            "register_agent": agent_registry.register_agent,
+            "register_agents": agent_registry.register_agents,
+            "replicate_agent": agent_registry.replicate_agent,
+            "get_agent": agent_registry.get_agent,
+            "eligible_tasks": qualification_engine.get_eligible_tasks,
+            "qualified_agents": qualification_engine.get_qualified_agents,
+            "submit_bid": self.bidding_system.submit_bid,
+            "submit_bids": self.bidding_system.submit_bids,
+            "withdraw_bid": self.bidding_system.withdraw_bid,
+            "top_bids": self.bidding_system.get_top_bids,
+            "select_winner": self._select_winner,
+            "award_bid": self._award_bid,
+            "submit_work": work_verification_service.submit_work,
+            "get_work_product": self.repository.get_work_product,
+            "pending_work": work_verification_service.pending_work,
+            "verify_work": work_verification_service.verify_work,
+            "record_outcome": self._record_outcome,
+            "leaderboard": self.reputation_ledger.leaderboard,
+            "rank": self.reputation_ledger.rank,
+            "market_windows": market_stats.windows,
+            "events_since": self._events_since,
+        }
+
+    def _post_task(self, task: Task) -> Task:
+        task = self.task_board.post_task(task)
+        self.auction_scheduler.schedule_tasks([task])
+        return task
+
+    def _post_tasks(self, tasks: List[Task]) -> List[Task]:
+        tasks = self.task_board.post_tasks(tasks)
+        self.auction_scheduler.schedule_tasks(tasks)
+        return tasks
+
+    def _select_winner(self, task_id: UUID) -> Optional[Bid]:
+        winner = self.bidding_system.select_winner(task_id)
+        if winner is not None:
+            self.auction_scheduler.cancel(task_id)
+        return winner
+
+    def _award_bid(self, task_id: UUID, bid_id: UUID) -> Optional[Bid]:
+        winner = self.bidding_system.award_bid(task_id, bid_id)
+        if winner is not None:
+            self.auction_scheduler.cancel(task_id)
+        return winner
+
+    def _record_outcome(self, agent_id: UUID, score: float, passed: bool) -> Optional[Agent]:
+        self.reputation_ledger.record_outcome(agent_id, score, passed)
+        return self.repository.get_agent(agent_id)
+
+    @staticmethod
+    def _events_since(
+        epoch: Optional[str], after_id: int, timeout: float
+    ) -> Tuple[List[Dict[str, Any]], int, bool, str]:
+        """
+        This shard's events newer than ``after_id``, waiting up to
+        ``timeout`` seconds for one, with the ID to resume from, whether
+        some were missed and the shard's epoch. ``after_id`` from another
+        epoch (the shard restarted since) counts from the start; without an
+        epoch, the caller starts from the latest event.
+        """
+        if epoch is None:
+            return [], event_bus.last_id, False, event_bus.epoch
+        if epoch != event_bus.epoch:
+            after_id = 0
+        event_bus.wait_blocking(after_id, timeout)
+        events, resume_id, truncated = event_bus.events_after(after_id)
+        return events, resume_id, truncated or epoch != event_bus.epoch, event_bus.epoch
+
+    def handle(self, connection: Connection):
+        with connection:
+            while True:
+                try:
+                    operation, args = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self.operations[operation](*args))
+                except Exception as e:
+                    reply = ("error", e)
+                connection.send(reply)
+
+    def serve(self, address: Address, authkey: bytes):
+        # Deadlines that passed while the shard was down close right away.
+        self.auction_scheduler.schedule_tasks(self.repository.all_tasks())
+        self.auction_scheduler.start_thread()
+        with Listener(address, authkey=authkey) as listener:
+            while True:
+                try:
+                    connection = listener.accept()
+                except (multiprocessing.AuthenticationError, OSError):
+                    continue
+                threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+
+def serve_shard(index: int, address: Address, authkey: bytes):
+    """Entry point of a shard process."""
+    if isinstance(address, str) and os.path.exists(address):
+        # A stale socket left behind by a previous run.
+        os.unlink(address)
+    journal_directory = os.environ.get("AEGIS_JOURNAL_DIR")
+    if journal_directory:
+        journal = Journal(
+            os.path.join(journal_directory, f"shard-{index}"),
+            durable=os.environ.get("AEGIS_JOURNAL_DURABLE", "1") != "0",
+        )
+        journal.restore(get_repository())
+        set_journal(journal)
+        journal.start(snapshot_state, float(os.environ.get("AEGIS_SNAPSHOT_INTERVAL", "300")))
+    cold_store = open_cold_store_from_env(f"shard-{index}")
+    if cold_store is not None:
+        set_cold_store(cold_store)
+        TaskArchiver(TaskBoard(), cold_store, ARCHIVE_RETENTION).start(ARCHIVE_INTERVAL)
+    ShardServer().serve(address, authkey)
+
+
+def start_shards(
+    addresses: Sequence[Address], authkey: bytes, timeout: float = 30.0
+) -> List[multiprocessing.Process]:
+    """Start one shard process per address and wait until they all accept connections."""
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=serve_shard, args=(index, address, authkey), name=f"aegis-shard-{index}", daemon=True)
+        for index, address in enumerate(addresses)
+    ]
+    for process in processes:
+        process.start()
+    deadline = time.monotonic() + timeout
+    for process, address in zip(processes, addresses):
+        while True:
+            try:
+                Client(address, authkey=authkey).close()
+                break
+            except OSError:
+                if not process.is_alive() or time.monotonic() > deadline:
+                    raise RuntimeError(f"Shard {format_address(address)} did not start")
+                time.sleep(0.05)
+    return processes
+
+
+class ShardRouter:
+    """
+    Client side of the shards, exposing the same component interfaces the
+    endpoints use (``router.task_board``, ``router.bidding_system`` ...).
+
+    Every thread keeps its own connection to each shard, so concurrent
+    requests to different shards proceed in parallel.
+    """
+
+    def __init__(self, addresses: Sequence[Address], authkey: bytes):
+        self.addresses = list(addresses)
+        self.authkey = authkey
+        self._local = threading.local()
+        self.task_board = ShardedTaskBoard(self)
+        self.agent_registry = ShardedAgentRegistry(self)
+        self.qualification_engine = ShardedQualificationEngine(self)
+        self.bidding_system = ShardedBiddingSystem(self)
+        self.work_verification_service = ShardedWorkVerificationService(self)
+        self.reputation_ledger = ShardedReputationLedger(self)
+        self.market_stats = ShardedMarketStatistics(self)
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def shard_for(self, entity_id: UUID) -> int:
+        return shard_index(entity_id, len(self.addresses))
+
+    def call(self, shard: int, operation: str, *args) -> Any:
+        connections = self._connections()
+        if shard not in connections:
+            connections[shard] = Client(self.addresses[shard], authkey=self.authkey)
+        connection = connections[shard]
+        try:
+            connection.send((operation, args))
+            status, result = connection.recv()
+        except (EOFError, OSError):
+            # Reconnect on the next call, e.g. after the shard restarted.
+            del connections[shard]
+            connection.close()
+            raise
+        if status == "error":
+            raise result
+        return result
+
+    def broadcast(self, operation: str, *args) -> List[Any]:
+        return [self.call(shard, operation, *args) for shard in range(len(self.addresses))]
+
+    def partition(self, items: List[Any], key: Callable[[Any], UUID]) -> Dict[int, List[int]]:
+        """Positions of ``items`` grouped by the shard owning ``key(item)``."""
+        positions = defaultdict(list)
+        for position, item in enumerate(items):
+            positions[self.shard_for(key(item))].append(position)
+        return positions
+
+    def scatter(self, operation: str, items: List[Any], key: Callable[[Any], UUID]) -> List[Any]:
+        """Send each shard its share of a batch and return the results in input order."""
+        results: List[Any] = [None] * len(items)
+        for shard, positions in self.partition(items, key).items():
+            outcomes = self.call(shard, operation, [items[position] for position in positions])
+            for position, outcome in zip(positions, outcomes):
+                results[position] = outcome
+        return results
+
+    def close(self):
+        for connection in self._connections().values():
+            connection.close()
+        self._local.connections = {}
+
+    def _connections(self) -> Dict[int, Connection]:
+        if not hasattr(self._local, "connections"):
+            self._local.connections = {}
+        return self._local.connections
+
+
+class ShardedTaskBoard:
+    def __init__(self, shards: ShardRouter):
+        self.shards = shards
+
+    def post_task(self, task: Task) -> Task:
+        return self.shards.call(self.shards.shard_for(task.task_id), "post_task", task)
+
+    def post_tasks(self, tasks: List[Task]) -> List[Task]:
+        return self.shards.scatter("post_tasks", tasks, lambda task: task.task_id)
+
+    def get_task(self, task_id: UUID) -> Optional[Task]:
+        return self.shards.call(self.shards.shard_for(task_id), "get_task", task_id)
+
+    def get_archived_task(self, task_id: UUID) -> Optional[ArchivedTask]:
+        return self.shards.call(self.shards.shard_for(task_id), "get_archived_task", task_id)
+
+    def get_all_tasks(self) -> List[Task]:
+        return [task for tasks in self.shards.broadcast("get_all_tasks") for task in tasks]
+
+    def list_tasks(
+        self,
+        status: Optional[TaskStatus] = None,
+        capability: Optional[str] = None,
+        min_reward: Optional[float] = None,
+        cursor: Optional[int] = None,
+        limit: int = 100,
+    ) -> Tuple[List[Task], Optional[int]]:
+        """
+        Pages walk the shards one after another, each in its own order, so
+        ordering by posting time or reward holds within a shard only.
+        """
+        shard, shard_cursor = divmod(cursor, SHARD_CURSOR_SPAN) if cursor is not None else (0, 0)
+        if not 0 <= shard < len(self.shards):
+            raise ValueError("Invalid cursor")
+        shard_cursor = shard_cursor - 1 if shard_cursor else None
+        tasks: List[Task] = []
+        while True:
+            page, next_cursor = self.shards.call(
+                shard, "list_tasks", status, capability, min_reward, shard_cursor, limit - len(tasks)
+            )
+            tasks.extend(page)
+            if next_cursor is not None:
+                return tasks, shard * SHARD_CURSOR_SPAN + next_cursor + 1
+            shard, shard_cursor = shard + 1, None
+            if shard == len(self.shards):
+                return tasks, None
+            if len(tasks) == limit:
+                return tasks, shard * SHARD_CURSOR_SPAN
+
+    def held_task_counts(self, agent_ids: List[UUID]) -> Dict[UUID, int]:
+        held: Dict[UUID, int] = {}
+        for counts in self.shards.broadcast("held_task_counts", agent_ids):
+            for agent_id, count in counts.items():
+                held[agent_id] = held.get(agent_id, 0) + count
+        return held
+
+
+class ShardedAgentRegistry:
+    def __init__(self, shards: ShardRouter):
+        self.shards = shards
+
+    def register_agent(self, agent: Agent) -> Agent:
+        self.shards.broadcast("register_agent", agent)
+        return agent
+
+    def register_agents(self, agents: List[Agent]) -> List[Agent]:
+        self.shards.broadcast("register_agents", agents)
+        return agents
+
+    def get_agent(self, agent_id: UUID) -> Optional[Agent]:
+        return self.shards.call(self.shards.shard_for(agent_id), "get_agent", agent_id)
+
+
+class ShardedQualificationEngine(QualificationEngine):
+    def __init__(self, shards: ShardRouter):
+        self.shards = shards
+
+    def get_eligible_tasks(self, agent: Agent) -> List[Task]:
+        return [task for tasks in self.shards.broadcast("eligible_tasks", agent) for task in tasks]
+
+    def get_qualified_agents(self, task: Task) -> List[Agent]:
+        # Every shard holds every agent.
+        return self.shards.call(self.shards.shard_for(task.task_id), "qualified_agents", task)
+
+
+class ShardedBiddingSystem:
+    def __init__(self, shards: ShardRouter):
+        self.shards = shards
+
+    def submit_bid(self, bid: Bid) -> Bid:
+        return self.shards.call(self.shards.shard_for(bid.task_id), "submit_bid", bid)
+
+    def submit_bids(self, bids: List[Bid]) -> List[Optional[ValueError]]:
+        return self.shards.scatter("submit_bids", bids, lambda bid: bid.task_id)
+
+    def withdraw_bid(self, task_id: UUID, bid_id: UUID) -> Optional[Bid]:
+        return self.shards.call(self.shards.shard_for(task_id), "withdraw_bid", task_id, bid_id)
+
+    def get_top_bids(self, task_id: UUID, k: int) -> List[Bid]:
+        return self.shards.call(self.shards.shard_for(task_id), "top_bids", task_id, k)
+
+    def select_winner(self, task_id: UUID) -> Optional[Bid]:
+        return self.shards.call(self.shards.shard_for(task_id), "select_winner", task_id)
+
+    def award_bid(self, task_id: UUID, bid_id: UUID) -> Optional[Bid]:
+        return self.shards.call(self.shards.shard_for(task_id), "award_bid", task_id, bid_id)
+
+
+class ShardedWorkVerificationService:
+    def __init__(self, shards: ShardRouter):
+        self.shards = shards
+
+    def submit_work(self, work_product: WorkProduct) -> WorkProduct:
+        return self.shards.call(self.shards.shard_for(work_product.task_id), "submit_work", work_product)
+
+    def _owner(self, work_id: UUID) -> Tuple[Optional[int], Optional[WorkProduct]]:
+        # Work products are stored with their task; find the shard holding it.
+        for shard in range(len(self.shards)):
+            work_product = self.shards.call(shard, "get_work_product", work_id)
+            if work_product:
+                return shard, work_product
+        return None, None
+
+    def get_work_product(self, work_id: UUID) -> Optional[WorkProduct]:
+        return self._owner(work_id)[1]
+
+    def pending_work(self) -> List[Tuple[WorkProduct, Task]]:
+        return [item for items in self.shards.broadcast("pending_work") for item in items]
+
+    def verify_work(self, work_id: UUID, score: float) -> WorkProduct:
+        shard, _ = self._owner(work_id)
+        if shard is None:
+            raise ValueError("WorkProduct not found")
+        return self.shards.call(shard, "verify_work", work_id, score)
+
+
+class ShardedReputationLedger:
+    def __init__(self, shards: ShardRouter):
+        self.shards = shards
+
+    def record_success(self, agent_id: UUID, score: float):
+        self.record_outcome(agent_id, score, passed=True)
+
+    def record_failure(self, agent_id: UUID, score: float):
+        self.record_outcome(agent_id, score, passed=False)
+
+    def record_outcome(self, agent_id: UUID, score: float, passed: bool):
+        owner = self.shards.shard_for(agent_id)
+        agent = self.shards.call(owner, "record_outcome", agent_id, score, passed)
+        if agent:
+            for shard in range(len(self.shards)):
+                if shard != owner:
+                    self.shards.call(shard, "replicate_agent", agent)
+
+    # Every shard holds a replica of every agent, so any one of them can answer.
+
+    def leaderboard(self, capability: Optional[str] = None, k: int = 10) -> List[Agent]:
+        return self.shards.call(0, "leaderboard", capability, k)
+
+    def rank(self, agent_id: UUID, capability: Optional[str] = None) -> Optional[int]:
+        return self.shards.call(self.shards.shard_for(agent_id), "rank", agent_id, capability)
+
+
+class ShardedMarketStatistics:
+    def __init__(self, shards: ShardRouter):
+        self.shards = shards
+
+    def summaries(self, capabilities: Optional[List[str]] = None) -> List[MarketStats]:
+        """Every shard's windows, merged; shards share the front end's window length."""
+        return summarize_windows(self.shards.broadcast("market_windows", capabilities), market_stats.window_seconds)
+
+
+class EventRelay:
+    """
+    Feeds a front end's event bus from the shards, with one thread per
+    shard long-polling its bus. Relayed events are numbered by the front
+    end's bus. When a shard restarted or the relay fell further behind
+    than the shard's buffer, the bus is cleared, which tells subscribers
+    to resynchronise instead of leaving them to miss changes.
+    """
+
+    def __init__(self, shards: ShardRouter, bus: EventBus, poll_seconds: float = 1.0, retry_seconds: float = 1.0):
+        self.shards = shards
+        self.bus = bus
+        self.poll_seconds = poll_seconds
+        self.retry_seconds = retry_seconds
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def _follow(self, shard: int, epoch: Optional[str], position: int):
+        while not self._stopping.is_set():
+            try:
+                events, position, missed, shard_epoch = self.shards.call(
+                    shard, "events_since", epoch, position, self.poll_seconds
+                )
+            except Exception:
+                # The shard is down or restarting; its epoch tells once it is back.
+                self._stopping.wait(self.retry_seconds)
+                continue
+            if missed:
+                self.bus.clear()
+            epoch = shard_epoch
+            for event in events:
+                self.bus.relay(event)
+        self.shards.close()
+
+    def start(self):
+        """Relay every event the shards publish from now on."""
+        for shard in range(len(self.shards)):
+            try:
+                _, position, _, epoch = self.shards.call(shard, "events_since", None, 0, 0.0)
+            except Exception:
+                # Down for now; followed from its first event once it is up.
+                epoch, position = "", 0
+            thread = threading.Thread(
+                target=self._follow, args=(shard, epoch, position), name=f"event-relay-{shard}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+def sharding_enabled() -> bool:
+    return bool(os.environ.get("AEGIS_SHARDS"))
+
+
+def router_from_env() -> Optional[ShardRouter]:
+    """
+    A router over the comma-separated shard addresses in ``AEGIS_SHARDS``
+    (unset disables sharding), authenticated with ``AEGIS_SHARD_AUTHKEY``,
+    which is required.
+    """
+    if not sharding_enabled():
+        return None
+    authkey = os.environ.get("AEGIS_SHARD_AUTHKEY")
+    if not authkey:
+        raise RuntimeError("AEGIS_SHARD_AUTHKEY must be set along with AEGIS_SHARDS")
+    addresses = [parse_address(value.strip()) for value in os.environ["AEGIS_SHARDS"].split(",") if value.strip()]
+    return ShardRouter(addresses, authkey.encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run marketplace shard processes.")
+    parser.add_argument("--shards", type=int, default=os.cpu_count())
+    parser.add_argument("--socket-dir", help="serve on Unix sockets in this directory")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7600, help="first TCP port, when not using --socket-dir")
+    args = parser.parse_args()
+
+    if args.socket_dir:
+        os.makedirs(args.socket_dir, exist_ok=True)
+        addresses: List[Address] = [os.path.join(args.socket_dir, f"shard-{index}.sock") for index in range(args.shards)]
+    else:
+        addresses = [(args.host, args.port + index) for index in range(args.shards)]
+    authkey = os.environ.get("AEGIS_SHARD_AUTHKEY") or secrets.token_hex(32)
+    processes = start_shards(addresses, authkey.encode())
+    print("AEGIS_SHARDS=" + ",".join(format_address(address) for address in addresses))
+    print("AEGIS_SHARD_AUTHKEY=" + authkey, flush=True)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,540 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from app.models import Task, Agent, Bid, WorkProduct, BlobRef, TaskStatus, VerificationStatus, HELD_TASK_STATUSES, OPEN_TASK_STATUSES
+from app.repository import AlreadyExists, Repository
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    required_capabilities TEXT NOT NULL,
+    reward_amount REAL NOT NULL,
+    status TEXT NOT NULL,
+    bidding_deadline REAL,
+    winning_bid_id TEXT,
+    winning_agent_id TEXT,
+    winning_amount REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (status, seq);
+CREATE INDEX IF NOT EXISTS tasks_by_reward ON tasks (reward_amount, seq);
+CREATE INDEX IF NOT EXISTS tasks_by_status_reward ON tasks (status, reward_amount, seq);
+CREATE TABLE IF NOT EXISTS task_capabilities (
+    capability TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (capability, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS task_capabilities_by_task ON task_capabilities (seq);
+
+CREATE TABLE IF NOT EXISTS agents (
+    agent_id TEXT PRIMARY KEY,
+    capabilities TEXT NOT NULL,
+    reputation_score REAL NOT NULL,
+    completed_tasks INTEGER NOT NULL,
+    success_rate REAL NOT NULL,
+    failed_tasks INTEGER NOT NULL DEFAULT 0,
+    score_variance REAL NOT NULL DEFAULT 0,
+    recent_score REAL NOT NULL DEFAULT 0,
+    recent_score_weight REAL NOT NULL DEFAULT 0,
+    last_scored_at REAL
+);
+CREATE INDEX IF NOT EXISTS agents_by_reputation ON agents (reputation_score DESC, completed_tasks DESC, agent_id);
+CREATE TABLE IF NOT EXISTS agent_capabilities (
+    capability TEXT NOT NULL,
+    agent_id TEXT NOT NULL,
+    PRIMARY KEY (capability, agent_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS bids (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    bid_id TEXT NOT NULL UNIQUE,
+    task_id TEXT NOT NULL,
+    agent_id TEXT NOT NULL,
+    bid_amount REAL NOT NULL,
+    UNIQUE (task_id, agent_id)
+);
+CREATE INDEX IF NOT EXISTS bids_by_task_amount ON bids (task_id, bid_amount, seq);
+CREATE INDEX IF NOT EXISTS bids_by_agent ON bids (agent_id);
+
+CREATE TABLE IF NOT EXISTS work_products (
+    work_id TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    agent_id TEXT NOT NULL,
+    deliverable TEXT NOT NULL,
+    verification_status TEXT NOT NULL,
+    deliverable_blob TEXT
+);
+CREATE INDEX IF NOT EXISTS work_products_by_task ON work_products (task_id);
+"""
+
+TASK_COLUMNS = (
+    "seq, task_id, title, description, required_capabilities, reward_amount, status, bidding_deadline, "
+    "winning_bid_id, winning_agent_id, winning_amount"
+)
+# Task columns added after the first schema.
+TASK_DEADLINE_COLUMNS = {"bidding_deadline": "REAL"}
+TASK_WINNER_COLUMNS = {"winning_bid_id": "TEXT", "winning_agent_id": "TEXT", "winning_amount": "REAL"}
+BID_COLUMNS = "bid_id, task_id, agent_id, bid_amount"
+AGENT_COLUMNS = (
+    "agent_id, capabilities, reputation_score, completed_tasks, success_rate, "
+    "failed_tasks, score_variance, recent_score, recent_score_weight, last_scored_at"
+)
+# Agent columns added after the first schema, with their definitions, for
+# upgrading existing databases.
+AGENT_STATISTICS_COLUMNS = {
+    "failed_tasks": "INTEGER NOT NULL DEFAULT 0",
+    "score_variance": "REAL NOT NULL DEFAULT 0",
+    "recent_score": "REAL NOT NULL DEFAULT 0",
+    "recent_score_weight": "REAL NOT NULL DEFAULT 0",
+    "last_scored_at": "REAL",
+}
+AGENT_COLUMNS_OF_A = ", ".join("a." + column.strip() for column in AGENT_COLUMNS.split(","))
+# Leaderboard order, served by the agents_by_reputation index.
+AGENT_RANKING = "a.reputation_score DESC, a.completed_tasks DESC, a.agent_id"
+WORK_PRODUCT_COLUMNS = "work_id, task_id, agent_id, deliverable, verification_status, deliverable_blob"
+# Work product columns added after the first schema.
+WORK_PRODUCT_BLOB_COLUMNS = {"deliverable_blob": "TEXT"}
+OPEN_STATUS_VALUES = tuple(status.value for status in OPEN_TASK_STATUSES)
+HELD_STATUS_VALUES = tuple(status.value for status in HELD_TASK_STATUSES)
+
+
+def _task_from_row(row) -> Task:
+    return Task(
+        task_id=UUID(row[1]),
+        title=row[2],
+        description=row[3],
+        required_capabilities=json.loads(row[4]),
+        reward_amount=row[5],
+        status=TaskStatus(row[6]),
+        bidding_deadline=row[7],
+        winning_bid=Bid(bid_id=UUID(row[8]), task_id=UUID(row[1]), agent_id=UUID(row[9]), bid_amount=row[10])
+        if row[8] else None,
+    )
+
+
+def _winner_values(task: Task) -> tuple:
+    bid = task.winning_bid
+    if bid is None:
+        return None, None, None
+    return str(bid.bid_id), str(bid.agent_id), bid.bid_amount
+
+
+def _agent_from_row(row) -> Agent:
+    return Agent(
+        agent_id=UUID(row[0]),
+        capabilities=json.loads(row[1]),
+        reputation_score=row[2],
+        completed_tasks=row[3],
+        success_rate=row[4],
+        failed_tasks=row[5],
+        score_variance=row[6],
+        recent_score=row[7],
+        recent_score_weight=row[8],
+        last_scored_at=row[9],
+    )
+
+
+def _agent_statistics(agent: Agent) -> tuple:
+    return (
+        agent.reputation_score,
+        agent.completed_tasks,
+        agent.success_rate,
+        agent.failed_tasks,
+        agent.score_variance,
+        agent.recent_score,
+        agent.recent_score_weight,
+        agent.last_scored_at,
+    )
+
+
+def _work_product_from_row(row) -> WorkProduct:
+    return WorkProduct(
+        work_id=UUID(row[0]),
+        task_id=UUID(row[1]),
+        agent_id=UUID(row[2]),
+        deliverable=json.loads(row[3]),
+        verification_status=VerificationStatus(row[4]),
+        deliverable_blob=BlobRef.model_validate_json(row[5]) if row[5] else None,
+    )
+
+
+def _bid_from_row(row) -> Bid:
+    return Bid(bid_id=UUID(row[0]), task_id=UUID(row[1]), agent_id=UUID(row[2]), bid_amount=row[3])
+
+
+class SQLiteRepository(Repository):
+    """
+    Repository backed by a single SQLite database in WAL mode.
+
+    Each thread reuses its own connection (FastAPI runs sync endpoints on a
+    threadpool), and all statements are constant strings so that sqlite3's
+    per-connection statement cache keeps them prepared. Writes outside an
+    explicit ``transaction()`` commit one statement group at a time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        for table, columns in (
+            ("tasks", TASK_DEADLINE_COLUMNS),
+            ("tasks", TASK_WINNER_COLUMNS),
+            ("agents", AGENT_STATISTICS_COLUMNS),
+            ("work_products", WORK_PRODUCT_BLOB_COLUMNS),
+        ):
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column, definition in columns.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=OFF")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self._connection()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    def dump(self):
+        # One read transaction: in WAL mode a consistent view that writers
+        # on other connections are not held up by.
+        conn = self._connection()
+        if self._local.depth:
+            return super().dump()
+        conn.execute("BEGIN")
+        try:
+            return super().dump()
+        finally:
+            conn.execute("COMMIT")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def clear(self):
+        with self.transaction() as conn:
+            for table in ("tasks", "task_capabilities", "agents", "agent_capabilities", "bids", "work_products"):
+                conn.execute(f"DELETE FROM {table}")
+
+    def count_entities(self) -> Dict[str, int]:
+        conn = self._connection()
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("tasks", "agents", "bids", "work_products")
+        }
+
+    # Tasks
+
+    def add_task(self, task: Task):
+        with self.transaction() as conn:
+            try:
+                cursor = conn.execute(
+                    "INSERT INTO tasks (task_id, title, description, required_capabilities, reward_amount, status, "
+                    "bidding_deadline, winning_bid_id, winning_agent_id, winning_amount) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        str(task.task_id),
+                        task.title,
+                        task.description,
+                        json.dumps(task.required_capabilities),
+                        task.reward_amount,
+                        task.status.value,
+                        task.bidding_deadline,
+                        *_winner_values(task),
+                    ),
+                )
+            except sqlite3.IntegrityError:
+                raise AlreadyExists("Task already exists")
+            conn.executemany(
+                "INSERT OR IGNORE INTO task_capabilities (capability, seq) VALUES (?, ?)",
+                [(capability, cursor.lastrowid) for capability in task.required_capabilities],
+            )
+
+    def get_task(self, task_id: UUID) -> Optional[Task]:
+        row = self._connection().execute(
+            f"SELECT {TASK_COLUMNS} FROM tasks WHERE task_id = ?", (str(task_id),)
+        ).fetchone()
+        return _task_from_row(row) if row else None
+
+    def update_task_status(self, task: Task, status: TaskStatus):
+        task.status = status
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = ?, winning_bid_id = ?, winning_agent_id = ?, winning_amount = ? "
+                "WHERE task_id = ?",
+                (status.value, *_winner_values(task), str(task.task_id)),
+            )
+
+    def all_tasks(self) -> List[Task]:
+        rows = self._connection().execute(f"SELECT {TASK_COLUMNS} FROM tasks ORDER BY seq")
+        return [_task_from_row(row) for row in rows]
+
+    def page_tasks(self, status, capability, min_reward, cursor, limit):
+        conn = self._connection()
+        where, params = [], []
+        if status is not None:
+            where.append("t.status = ?")
+            params.append(status.value)
+        if capability is not None:
+            where.append("t.seq IN (SELECT seq FROM task_capabilities WHERE capability = ?)")
+            params.append(capability)
+        if min_reward is not None:
+            order = "t.reward_amount, t.seq"
+            if cursor is None:
+                where.append("t.reward_amount >= ?")
+                params.append(min_reward)
+            else:
+                row = conn.execute("SELECT reward_amount FROM tasks WHERE seq = ?", (cursor,)).fetchone()
+                if row is None:
+                    raise ValueError("Invalid cursor")
+                where.append("t.reward_amount >= ? AND (t.reward_amount, t.seq) > (?, ?)")
+                params.extend([min_reward, row[0], cursor])
+        else:
+            order = "t.seq"
+            if cursor is not None:
+                where.append("t.seq > ?")
+                params.append(cursor)
+        sql = f"SELECT {TASK_COLUMNS} FROM tasks t"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ?"
+        rows = conn.execute(sql, params + [limit + 1]).fetchall()
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [_task_from_row(row) for row in rows[:limit]], next_cursor
+
+    def eligible_tasks(self, capabilities: Iterable[str]) -> List[Task]:
+        capabilities = list(set(capabilities))
+        placeholders = ", ".join("?" * len(capabilities))
+        rows = self._connection().execute(
+            f"SELECT {TASK_COLUMNS} FROM tasks t WHERE t.status IN (?, ?) AND NOT EXISTS ("
+            f"SELECT 1 FROM task_capabilities c WHERE c.seq = t.seq AND c.capability NOT IN ({placeholders}))",
+            [*OPEN_STATUS_VALUES, *capabilities],
+        )
+        return [_task_from_row(row) for row in rows]
+
+    def remove_task(self, task_id: UUID) -> Optional[Task]:
+        with self.transaction() as conn:
+            row = conn.execute(f"SELECT {TASK_COLUMNS} FROM tasks WHERE task_id = ?", (str(task_id),)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM task_capabilities WHERE seq = ?", (row[0],))
+            conn.execute("DELETE FROM bids WHERE task_id = ?", (row[1],))
+            conn.execute("DELETE FROM tasks WHERE seq = ?", (row[0],))
+        return _task_from_row(row)
+
+    def count_held_tasks(self, agent_ids: Iterable[UUID]) -> Dict[UUID, int]:
+        # Held tasks are few next to all tasks, so count them all (through
+        # the status index) and pick out the agents asked for.
+        rows = self._connection().execute(
+            "SELECT winning_agent_id, COUNT(*) FROM tasks WHERE status IN (?, ?) AND winning_agent_id IS NOT NULL "
+            "GROUP BY winning_agent_id",
+            HELD_STATUS_VALUES,
+        )
+        held = {UUID(agent_id): count for agent_id, count in rows}
+        return {agent_id: held[agent_id] for agent_id in agent_ids if agent_id in held}
+
+    # Agents
+
+    def add_agent(self, agent: Agent):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM agent_capabilities WHERE agent_id = ?", (str(agent.agent_id),))
+            conn.execute(
+                f"INSERT OR REPLACE INTO agents ({AGENT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(agent.agent_id), json.dumps(agent.capabilities), *_agent_statistics(agent)),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO agent_capabilities (capability, agent_id) VALUES (?, ?)",
+                [(capability, str(agent.agent_id)) for capability in agent.capabilities],
+            )
+
+    def get_agent(self, agent_id: UUID) -> Optional[Agent]:
+        row = self._connection().execute(
+            f"SELECT {AGENT_COLUMNS} FROM agents WHERE agent_id = ?", (str(agent_id),)
+        ).fetchone()
+        return _agent_from_row(row) if row else None
+
+    def update_agent(self, agent: Agent):
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE agents SET reputation_score = ?, completed_tasks = ?, success_rate = ?, failed_tasks = ?, "
+                "score_variance = ?, recent_score = ?, recent_score_weight = ?, last_scored_at = ? WHERE agent_id = ?",
+                (*_agent_statistics(agent), str(agent.agent_id)),
+            )
+
+    def all_agents(self) -> List[Agent]:
+        return [_agent_from_row(row) for row in self._connection().execute(f"SELECT {AGENT_COLUMNS} FROM agents")]
+
+    def qualified_agents(self, required_capabilities: Iterable[str]) -> List[Agent]:
+        required = list(set(required_capabilities))
+        conn = self._connection()
+        columns = AGENT_COLUMNS_OF_A
+        if not required:
+            return [_agent_from_row(row) for row in conn.execute(f"SELECT {columns} FROM agents a")]
+        placeholders = ", ".join("?" * len(required))
+        rows = conn.execute(
+            f"SELECT {columns} FROM agents a WHERE a.agent_id IN ("
+            f"SELECT agent_id FROM agent_capabilities WHERE capability IN ({placeholders}) "
+            f"GROUP BY agent_id HAVING COUNT(*) = ?)",
+            [*required, len(required)],
+        )
+        return [_agent_from_row(row) for row in rows]
+
+    def top_agents(self, capability: Optional[str], k: int) -> List[Agent]:
+        columns = AGENT_COLUMNS_OF_A
+        if capability is None:
+            rows = self._connection().execute(f"SELECT {columns} FROM agents a ORDER BY {AGENT_RANKING} LIMIT ?", (k,))
+        else:
+            rows = self._connection().execute(
+                f"SELECT {columns} FROM agents a JOIN agent_capabilities c ON c.agent_id = a.agent_id "
+                f"WHERE c.capability = ? ORDER BY {AGENT_RANKING} LIMIT ?",
+                (capability, k),
+            )
+        return [_agent_from_row(row) for row in rows]
+
+    def agent_rank(self, agent_id: UUID, capability: Optional[str]) -> Optional[int]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT reputation_score, completed_tasks FROM agents WHERE agent_id = ?", (str(agent_id),)
+        ).fetchone()
+        if row is None:
+            return None
+        # Agents ranked ahead: a higher score, or the same score and more
+        # completed tasks, or a full tie and a smaller ID.
+        ahead = (
+            "(a.reputation_score > ? OR (a.reputation_score = ? AND (a.completed_tasks > ? "
+            "OR (a.completed_tasks = ? AND a.agent_id < ?))))"
+        )
+        params = [row[0], row[0], row[1], row[1], str(agent_id)]
+        if capability is None:
+            return conn.execute(f"SELECT COUNT(*) FROM agents a WHERE {ahead}", params).fetchone()[0] + 1
+        if not conn.execute(
+            "SELECT 1 FROM agent_capabilities WHERE capability = ? AND agent_id = ?", (capability, str(agent_id))
+        ).fetchone():
+            return None
+        return conn.execute(
+            f"SELECT COUNT(*) FROM agents a JOIN agent_capabilities c ON c.agent_id = a.agent_id "
+            f"WHERE c.capability = ? AND {ahead}",
+            [capability, *params],
+        ).fetchone()[0] + 1
+
+    # Bids
+
+    def add_bid(self, bid: Bid) -> Optional[Bid]:
+        with self.transaction() as conn:
+            taken = conn.execute("SELECT task_id, agent_id FROM bids WHERE bid_id = ?", (str(bid.bid_id),)).fetchone()
+            if taken and tuple(taken) != (str(bid.task_id), str(bid.agent_id)):
+                raise AlreadyExists("Bid already exists")
+            row = conn.execute(
+                f"SELECT {BID_COLUMNS} FROM bids WHERE task_id = ? AND agent_id = ?",
+                (str(bid.task_id), str(bid.agent_id)),
+            ).fetchone()
+            if row:
+                conn.execute("DELETE FROM bids WHERE bid_id = ?", (row[0],))
+            conn.execute(
+                "INSERT INTO bids (bid_id, task_id, agent_id, bid_amount) VALUES (?, ?, ?, ?)",
+                (str(bid.bid_id), str(bid.task_id), str(bid.agent_id), bid.bid_amount),
+            )
+        return _bid_from_row(row) if row else None
+
+    def withdraw_bid(self, task_id: UUID, bid_id: UUID) -> Optional[Bid]:
+        with self.transaction() as conn:
+            row = conn.execute(
+                f"SELECT {BID_COLUMNS} FROM bids WHERE bid_id = ? AND task_id = ?", (str(bid_id), str(task_id))
+            ).fetchone()
+            if row:
+                conn.execute("DELETE FROM bids WHERE bid_id = ?", (row[0],))
+        return _bid_from_row(row) if row else None
+
+    def count_bids(self, task_id: UUID) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM bids WHERE task_id = ?", (str(task_id),)).fetchone()[0]
+
+    def has_bid(self, task_id: UUID, agent_id: UUID) -> bool:
+        return self._connection().execute(
+            "SELECT 1 FROM bids WHERE task_id = ? AND agent_id = ?", (str(task_id), str(agent_id))
+        ).fetchone() is not None
+
+    def top_bids(self, task_id: UUID, k: int) -> List[Bid]:
+        rows = self._connection().execute(
+            f"SELECT {BID_COLUMNS} FROM bids WHERE task_id = ? ORDER BY bid_amount, seq LIMIT ?", (str(task_id), k)
+        )
+        return [_bid_from_row(row) for row in rows]
+
+    def all_bids(self) -> List[Bid]:
+        rows = self._connection().execute(f"SELECT {BID_COLUMNS} FROM bids ORDER BY task_id, bid_amount, seq")
+        return [_bid_from_row(row) for row in rows]
+
+    # Work products
+
+    def add_work_product(self, work_product: WorkProduct):
+        with self.transaction() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO work_products ({WORK_PRODUCT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    str(work_product.work_id),
+                    str(work_product.task_id),
+                    str(work_product.agent_id),
+                    json.dumps(work_product.deliverable),
+                    work_product.verification_status.value,
+                    work_product.deliverable_blob.model_dump_json() if work_product.deliverable_blob else None,
+                ),
+            )
+
+    def get_work_product(self, work_id: UUID) -> Optional[WorkProduct]:
+        row = self._connection().execute(
+            f"SELECT {WORK_PRODUCT_COLUMNS} FROM work_products WHERE work_id = ?", (str(work_id),)
+        ).fetchone()
+        return _work_product_from_row(row) if row else None
+
+    def update_work_product(self, work_product: WorkProduct):
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE work_products SET verification_status = ? WHERE work_id = ?",
+                (work_product.verification_status.value, str(work_product.work_id)),
+            )
+
+    def all_work_products(self) -> List[WorkProduct]:
+        rows = self._connection().execute(f"SELECT {WORK_PRODUCT_COLUMNS} FROM work_products")
+        return [_work_product_from_row(row) for row in rows]
+
+    def remove_work_product(self, work_id: UUID) -> Optional[WorkProduct]:
+        with self.transaction() as conn:
+            row = conn.execute(
+                f"SELECT {WORK_PRODUCT_COLUMNS} FROM work_products WHERE work_id = ?", (str(work_id),)
+            ).fetchone()
+            if row:
+                conn.execute("DELETE FROM work_products WHERE work_id = ?", (row[0],))
+        return _work_product_from_row(row) if row else None
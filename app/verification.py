@@ -0,0 +1,210 @@
+import heapq
+import importlib
+import itertools
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.models import Task, WorkProduct, VerificationJob, VerificationQueueStats, VerificationState
+
+_loaded_verifiers: Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], float]] = {}
+
+
+def run_verifier(reference: str, task: Dict[str, Any], deliverable: Dict[str, Any]) -> float:
+    """Run a ``module:function`` verifier, importing it on first use (also in worker processes)."""
+    verifier = _loaded_verifiers.get(reference)
+    if verifier is None:
+        module, _, name = reference.partition(":")
+        verifier = _loaded_verifiers[reference] = getattr(importlib.import_module(module), name)
+    return float(verifier(task, deliverable))
+
+
+class VerificationQueue:
+    """
+    Verifies submitted work products in the background.
+
+    Work products whose task has a capability with a registered verifier
+    are queued, highest reward first; worker threads take them in batches
+    of up to ``batch_size``, load their deliverables, score them (on a
+    process pool when ``processes`` is set) and hand each score to
+    ``apply``, which records the verification and the reputation change.
+    Other work products are left for a caller to score by hand.
+
+    The state of recent jobs is kept for status queries, up to
+    ``max_tracked`` of them. Queued jobs live only in memory; after a
+    restart, pending work products are queued again by the caller.
+    """
+
+    def __init__(
+        self,
+        apply: Callable[[UUID, float], Any],
+        load_deliverable: Callable[[WorkProduct], Dict[str, Any]],
+        verifiers: Optional[Dict[str, str]] = None,
+        workers: int = 2,
+        batch_size: int = 32,
+        processes: int = 0,
+        max_tracked: int = 100000,
+    ):
+        self.apply = apply
+        self.load_deliverable = load_deliverable
+        self.verifiers = dict(verifiers or {})
+        self.workers = workers
+        self.batch_size = batch_size
+        self.processes = processes
+        self.max_tracked = max_tracked
+        self._condition = threading.Condition()
+        self._heap: List[Tuple[float, int, UUID]] = []
+        self._pending: Dict[UUID, Tuple[WorkProduct, Dict[str, Any], str]] = {}
+        self._jobs: "OrderedDict[UUID, VerificationJob]" = OrderedDict()
+        self._seq = itertools.count()
+        self._in_progress = 0
+        self._verified = 0
+        self._errors = 0
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def register(self, capability: str, reference: str):
+        """Verify tasks requiring ``capability`` with the ``module:function`` verifier."""
+        self.verifiers[capability] = reference
+
+    def verifier_for(self, task: Task) -> Optional[str]:
+        for capability in task.required_capabilities:
+            reference = self.verifiers.get(capability)
+            if reference is not None:
+                return reference
+        return None
+
+    # Submission and status
+
+    def submit(self, work_product: WorkProduct, task: Task) -> VerificationJob:
+        """Queue a work product for verification, or mark it for manual scoring."""
+        reference = self.verifier_for(task)
+        with self._condition:
+            if reference is None:
+                return self._track(VerificationJob(work_id=work_product.work_id, state=VerificationState.MANUAL))
+            self._pending[work_product.work_id] = (work_product, task.model_dump(mode="json"), reference)
+            heapq.heappush(self._heap, (-task.reward_amount, next(self._seq), work_product.work_id))
+            job = self._track(VerificationJob(work_id=work_product.work_id, state=VerificationState.QUEUED))
+            self._condition.notify()
+            return job
+
+    def _track(self, job: VerificationJob) -> VerificationJob:
+        self._jobs[job.work_id] = job
+        self._jobs.move_to_end(job.work_id)
+        while len(self._jobs) > self.max_tracked:
+            self._jobs.popitem(last=False)
+        return job
+
+    def status(self, work_id: UUID) -> Optional[VerificationJob]:
+        with self._condition:
+            job = self._jobs.get(work_id)
+            return None if job is None else job.model_copy()
+
+    def depth(self) -> int:
+        return len(self._heap)
+
+    def stats(self) -> VerificationQueueStats:
+        with self._condition:
+            return VerificationQueueStats(
+                depth=len(self._heap),
+                in_progress=self._in_progress,
+                verified=self._verified,
+                errors=self._errors,
+                workers=len(self._threads),
+            )
+
+    # Workers
+
+    def take_batch(self, block: bool = True) -> List[Tuple[WorkProduct, Dict[str, Any], str]]:
+        """Up to ``batch_size`` queued jobs, highest reward first; empty once stopping."""
+        with self._condition:
+            while block and not self._heap and not self._stopping:
+                self._condition.wait()
+            if self._stopping:
+                return []
+            batch = []
+            while self._heap and len(batch) < self.batch_size:
+                _, _, work_id = heapq.heappop(self._heap)
+                batch.append(self._pending.pop(work_id))
+                self._track(VerificationJob(work_id=work_id, state=VerificationState.VERIFYING))
+            self._in_progress += len(batch)
+            return batch
+
+    def process(self, batch: List[Tuple[WorkProduct, Dict[str, Any], str]]):
+        """Score a batch and apply the results; failures are recorded per job."""
+        outcomes = []
+        for work_product, task, reference in batch:
+            try:
+                deliverable = self.load_deliverable(work_product)
+                if self._pool is not None:
+                    outcomes.append(self._pool.submit(run_verifier, reference, task, deliverable))
+                else:
+                    outcomes.append(run_verifier(reference, task, deliverable))
+            except Exception as e:
+                outcomes.append(e)
+        for (work_product, _, _), outcome in zip(batch, outcomes):
+            job = VerificationJob(work_id=work_product.work_id, state=VerificationState.VERIFIED)
+            try:
+                if isinstance(outcome, Exception):
+                    raise outcome
+                job.score = outcome if isinstance(outcome, float) else outcome.result()
+                self.apply(work_product.work_id, job.score)
+            except Exception as e:
+                job.state = VerificationState.ERROR
+                job.error = str(e) or type(e).__name__
+            with self._condition:
+                self._track(job)
+                self._in_progress -= 1
+                if job.state == VerificationState.VERIFIED:
+                    self._verified += 1
+                else:
+                    self._errors += 1
+
+    def _run(self):
+        while True:
+            batch = self.take_batch()
+            if not batch:
+                return
+            self.process(batch)
+
+    # Lifecycle
+
+    def start(self):
+        self._stopping = False
+        if self.processes:
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+        self._threads = [
+            threading.Thread(target=self._run, name=f"verification-{i}", daemon=True) for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self):
+        """Stop the workers once their current batches are done; queued jobs stay queued."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def verifiers_from_env() -> Dict[str, str]:
+    """
+    Verifiers configured by ``AEGIS_VERIFIERS``, a comma-separated list of
+    ``capability=module:function`` entries.
+    """
+    verifiers = {}
+    for entry in os.environ.get("AEGIS_VERIFIERS", "").split(","):
+        capability, _, reference = entry.strip().partition("=")
+        if capability and reference:
+            verifiers[capability] = reference
+    return verifiers
@@ -0,0 +1,15 @@
+"""
+Verifiers for the verification queue.
+
+A verifier is a function ``(task, deliverable) -> score`` taking the task
+and the deliverable as JSON-compatible dicts and returning a score from 0
+to 100; 75 or more passes. They are registered by capability as
+``module:function`` references (see ``AEGIS_VERIFIERS``), so that they can
+also run in worker processes.
+"""
+from typing import Any, Dict
+
+
+def deliverable_succeeded(task: Dict[str, Any], deliverable: Dict[str, Any]) -> float:
+    """Full marks for a deliverable reporting ``"status": "success"``, as the example agent's skills do."""
+    return 100.0 if deliverable.get("status") == "success" else 0.0
@@ -0,0 +1,138 @@
+"""
+Latency of well-behaved agents during a bid storm, with and without admission control.
+
+    python -m benchmarks.bench_admission --seconds 5 --flood-rate 4000 --max-in-flight 32
+
+One flooding agent sends ``--flood-rate`` bids per second into the ASGI
+app for ``--seconds``, whether or not earlier ones were answered (as a
+fleet of clients would, and more than the app can take), while
+``--agents`` well-behaved agents each bid and read tasks one request at
+a time. Runs three ways: without protection, with the per-agent and
+per-task rate limits, and with the rate limits plus load shedding at
+``--max-in-flight`` requests. Reports the well-behaved agents' p50/p99
+latency over their answered requests, their throughput and how many of
+them were shed, and what happened to the flood.
+"""
+import os
+
+# Shedding is switched on per run below, around the app.
+os.environ["AEGIS_MAX_IN_FLIGHT"] = "0"
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+import orjson
+
+from app import endpoints
+from app.admission import LoadShedMiddleware, RateLimiter
+from app.endpoints import agent_registry, task_board
+from app.main import app
+from app.models import Agent, Task
+
+
+async def call(asgi, method: str, path: str, body: bytes = b"") -> int:
+    """Call the app directly and return the response status."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    await asgi(scope, receive, send)
+    return statuses[0]
+
+
+def bid_body(task_id: str, agent_id: str, rng: random.Random) -> bytes:
+    return orjson.dumps({"task_id": task_id, "agent_id": agent_id, "bid_amount": round(rng.uniform(1, 99), 2)})
+
+
+async def run(asgi, args, flooder: str, agent_ids, task_ids):
+    rng = random.Random(0)
+    deadline = time.perf_counter() + args.seconds
+    latencies, honest_shed, flood = [], Counter(), Counter()
+
+    async def honest(agent_id):
+        while time.perf_counter() < deadline:
+            task_id = rng.choice(task_ids)
+            for method, path, body in (("POST", "/bids/", bid_body(task_id, agent_id, rng)), ("GET", f"/tasks/{task_id}", b"")):
+                start = time.perf_counter()
+                status = await call(asgi, method, path, body)
+                if status == 503:
+                    honest_shed[status] += 1
+                    await asyncio.sleep(0.001)
+                else:
+                    latencies.append(time.perf_counter() - start)
+
+    async def flood_one():
+        flood[await call(asgi, "POST", "/bids/", bid_body(rng.choice(task_ids), flooder, rng))] += 1
+
+    async def flooding():
+        # Open loop: launch a tick's worth of bids every 10 ms.
+        pending, sent, start = set(), 0, time.perf_counter()
+        while (now := time.perf_counter()) < deadline:
+            while sent < (now - start) * args.flood_rate:
+                task = asyncio.create_task(flood_one())
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                sent += 1
+            await asyncio.sleep(0.01)
+        flood["unanswered"] = len(pending)
+        for task in list(pending):
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    await asyncio.gather(*(honest(agent_id) for agent_id in agent_ids), flooding())
+    latencies.sort()
+    return latencies, sum(honest_shed.values()), flood
+
+
+async def main_async(args):
+    agents = agent_registry.register_agents([Agent(capabilities=["storm"]) for _ in range(args.agents + 1)])
+    flooder, agent_ids = str(agents[0].agent_id), [str(agent.agent_id) for agent in agents[1:]]
+    tasks = task_board.post_tasks([
+        Task(title=f"Storm {i}", description="", required_capabilities=["storm"], reward_amount=100.0)
+        for i in range(args.tasks)
+    ])
+    task_ids = [str(task.task_id) for task in tasks]
+    unlimited = RateLimiter(0, 0)
+    runs = (
+        ("no protection", unlimited, unlimited, 0),
+        ("rate limits", RateLimiter(args.agent_rate, 2 * args.agent_rate), RateLimiter(args.task_rate, 2 * args.task_rate), 0),
+        ("rate limits + shedding", RateLimiter(args.agent_rate, 2 * args.agent_rate),
+         RateLimiter(args.task_rate, 2 * args.task_rate), args.max_in_flight),
+    )
+    for name, agent_limiter, task_limiter, max_in_flight in runs:
+        endpoints.agent_bid_limiter, endpoints.task_bid_limiter = agent_limiter, task_limiter
+        latencies, shed, flood = await run(LoadShedMiddleware(app, max_in_flight), args, flooder, agent_ids, task_ids)
+        p50, p99 = latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+        print(f"{name:<24} well-behaved p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  {len(latencies) / args.seconds:5.0f} req/s  "
+              f"{shed} shed   flood " + "  ".join(f"{status}: {count}" for status, count in sorted(flood.items(), key=str)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--flood-rate", type=float, default=4000.0, help="bids per second from the flooding agent")
+    parser.add_argument("--agent-rate", type=float, default=100.0, help="bids per second per agent when limited")
+    parser.add_argument("--task-rate", type=float, default=50.0, help="bids per second per task when limited")
+    parser.add_argument("--max-in-flight", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
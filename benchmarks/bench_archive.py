@@ -0,0 +1,118 @@
+"""
+Hot memory and scans with finished tasks archived, and reads from the archive.
+
+    python -m benchmarks.bench_archive --finished 50000 --active 5000 --bids-per-task 5
+
+Runs ``--finished`` tasks through to verification (with bids and a work
+product each) next to ``--active`` tasks still open for bidding, then
+archives the finished ones. Reports the repository's memory and the time
+to scan and list tasks before and after, how long archiving took, the
+archive's size against the records' JSON, and the latency of reading a
+task through ``GET /tasks/{task_id}`` from memory and from the archive.
+"""
+import argparse
+import gc
+import random
+import tempfile
+import time
+import tracemalloc
+
+from app.archive import ColdStore, TaskArchiver, set_cold_store
+from app.components import AgentRegistry, BiddingSystem, TaskBoard, WorkVerificationService
+from app.endpoints import get_task
+from app.models import Agent, Bid, Task, TaskStatus, WorkProduct
+
+
+def scan_seconds(task_board: TaskBoard, runs: int = 5) -> float:
+    """Best time to read every task and page through the open ones, which leaves out collector pauses."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        task_board.get_all_tasks()
+        cursor = None
+        while True:
+            _, cursor = task_board.list_tasks(TaskStatus.BIDDING_OPEN, None, None, cursor, 1000)
+            if cursor is None:
+                break
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def read_latencies(task_ids, reads: int, rng: random.Random):
+    latencies = []
+    for _ in range(reads):
+        task_id = rng.choice(task_ids)
+        start = time.perf_counter()
+        get_task(task_id)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1e6, latencies[int(len(latencies) * 0.99)] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--finished", type=int, default=50_000)
+    parser.add_argument("--active", type=int, default=5_000)
+    parser.add_argument("--bids-per-task", type=int, default=5)
+    parser.add_argument("--reads", type=int, default=5_000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    tracemalloc.start()
+    task_board, bidding_system, verification = TaskBoard(), BiddingSystem(), WorkVerificationService()
+    agents = AgentRegistry().register_agents([Agent(capabilities=["archive"]) for _ in range(100)])
+    tasks = task_board.post_tasks([
+        Task(title=f"Task {i}", description="Summarize the quarterly report " * 4,
+             required_capabilities=["archive"], reward_amount=100.0)
+        for i in range(args.finished + args.active)
+    ])
+    bidding_system.submit_bids([
+        Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=round(rng.uniform(30, 100), 2))
+        for task in tasks
+        for agent in rng.sample(agents, args.bids_per_task)
+    ])
+    # Only the ids are kept, so memory is the repository's.
+    finished = [task.task_id for task in tasks[:args.finished]]
+    active = [task.task_id for task in tasks[args.finished:]]
+    del tasks
+    for task_id in finished:
+        winner = bidding_system.select_winner(task_id)
+        work = verification.submit_work(WorkProduct(
+            task_id=task_id, agent_id=winner.agent_id, deliverable={"summary": "Revenue grew. " * 20},
+        ))
+        verification.verify_work(work.work_id, rng.uniform(0, 100))
+
+    gc.collect()
+    hot_before = tracemalloc.get_traced_memory()[0]
+    scan_before = scan_seconds(task_board)
+    hot_reads = read_latencies(active, args.reads, rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ColdStore(directory)
+        set_cold_store(store)
+        start = time.perf_counter()
+        archived = TaskArchiver(task_board, store, retention_seconds=0.0).run()
+        archive_seconds = time.perf_counter() - start
+        gc.collect()
+        hot_after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        scan_after = scan_seconds(task_board)
+        cold_reads = read_latencies(finished, args.reads, rng)
+        sample = [store.get(task_id) for task_id in rng.sample(finished, 1000)]
+        raw_bytes = sum(len(record.model_dump_json()) for record in sample) / len(sample) * archived
+        stored_bytes = store.size_bytes()
+        set_cold_store(None)
+        store.close()
+
+    print(f"{args.finished} finished and {args.active} active tasks, {args.bids_per_task} bids each")
+    print(f"archived {archived} tasks in {archive_seconds:.2f}s ({archive_seconds / archived * 1e6:.0f} us per task)")
+    print(f"hot memory         before {hot_before / 2**20:8.1f} MiB   after {hot_after / 2**20:8.1f} MiB")
+    print(f"scan and list      before {scan_before * 1000:8.1f} ms    after {scan_after * 1000:8.1f} ms")
+    print(f"archive on disk    {stored_bytes / 2**20:.1f} MiB for {raw_bytes / 2**20:.1f} MiB of JSON "
+          f"({raw_bytes / stored_bytes:.1f}x, {stored_bytes / archived:.0f} bytes per task)")
+    print(f"GET /tasks/{{id}}    hot p50 {hot_reads[0]:6.1f} us  p99 {hot_reads[1]:6.1f} us   "
+          f"archived p50 {cold_reads[0]:6.1f} us  p99 {cold_reads[1]:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
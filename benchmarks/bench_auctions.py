@@ -0,0 +1,80 @@
+"""
+Auction scheduler with hundreds of thousands of pending deadlines.
+
+    python -m benchmarks.bench_auctions --deadlines 500000 --window 20
+
+Times scheduling and popping deadlines on their own, then runs the
+scheduler on an event loop while a worker thread schedules ``--deadlines``
+auctions, each due up to ``--window`` seconds after it is scheduled, with a
+close callback that only records when it ran; reports how late auctions
+were closed. Everything is served by one heap and one task on the loop.
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+import uuid
+
+from app.auctions import AuctionScheduler
+
+
+def bench_heap(task_ids, rng):
+    scheduler = AuctionScheduler(lambda task_id: None)
+    deadlines = [rng.uniform(0, 3600) for _ in task_ids]
+    tracemalloc.start()
+    start = time.perf_counter()
+    for task_id, deadline in zip(task_ids, deadlines):
+        scheduler.schedule(task_id, deadline)
+    scheduled = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    scheduler.batch_size = len(task_ids)
+    start = time.perf_counter()
+    due = scheduler.take_due(3600)
+    popped = time.perf_counter() - start
+    assert len(due) == len(task_ids)
+    n = len(task_ids)
+    print(f"schedule {scheduled / n * 1e6:6.2f} us each   pop {popped / n * 1e6:6.2f} us each   "
+          f"{memory / n:5.0f} bytes per pending deadline")
+
+
+async def bench_loop(task_ids, rng, window):
+    closed_at = {}
+
+    def close(task_id):
+        closed_at[task_id] = time.time()
+
+    def schedule_all():
+        # As the endpoints do: from a worker thread, while the loop runs.
+        for task_id in task_ids:
+            deadlines[task_id] = time.time() + rng.uniform(0.1, window)
+            scheduler.schedule(task_id, deadlines[task_id])
+
+    deadlines = {}
+    scheduler = AuctionScheduler(close)
+    scheduler.start()
+    await asyncio.get_running_loop().run_in_executor(None, schedule_all)
+    while len(closed_at) < len(task_ids):
+        await asyncio.sleep(0.1)
+    await scheduler.stop()
+    lags = sorted(closed_at[task_id] - deadline for task_id, deadline in deadlines.items())
+    print(f"closed {len(lags)} auctions on one loop task: "
+          f"lag p50 {lags[len(lags) // 2] * 1000:.1f} ms   p99 {lags[int(len(lags) * 0.99)] * 1000:.1f} ms   "
+          f"max {lags[-1] * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--deadlines", type=int, default=500_000)
+    parser.add_argument("--window", type=float, default=20.0, help="seconds over which the live run's deadlines fall")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    task_ids = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(args.deadlines)]
+    bench_heap(task_ids, rng)
+    asyncio.run(bench_loop(task_ids, rng, args.window))
+
+
+if __name__ == "__main__":
+    main()
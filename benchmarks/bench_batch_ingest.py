@@ -0,0 +1,57 @@
+"""
+Compare single-item and batch ingest throughput, in-process via TestClient.
+
+    python -m benchmarks.bench_batch_ingest --items 10000 --batch-size 1000
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def make_tasks(count):
+    return [
+        {
+            "title": f"Task {i}",
+            "description": "Benchmark task",
+            "required_capabilities": ["python", "csv"],
+            "reward_amount": 10.0 + i % 100,
+        }
+        for i in range(count)
+    ]
+
+
+def bench_single(client, tasks):
+    start = time.perf_counter()
+    for task in tasks:
+        client.post("/tasks/", json=task).raise_for_status()
+    return time.perf_counter() - start
+
+
+def bench_batch(client, tasks, batch_size):
+    start = time.perf_counter()
+    for offset in range(0, len(tasks), batch_size):
+        client.post("/tasks/batch", json=tasks[offset:offset + batch_size]).raise_for_status()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.items)
+    with TestClient(app) as client:
+        single = bench_single(client, tasks)
+        batch = bench_batch(client, tasks, args.batch_size)
+
+    print(f"single: {args.items / single:10.0f} items/s ({single:.2f}s)")
+    print(f"batch:  {args.items / batch:10.0f} items/s ({batch:.2f}s, batch size {args.batch_size})")
+    print(f"speedup: {single / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
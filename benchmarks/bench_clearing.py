@@ -0,0 +1,80 @@
+"""
+Batch market clearing at 10k open tasks x 5k agents.
+
+    python -m benchmarks.bench_clearing --tasks 10000 --agents 5000 --bids-per-task 10 --capacity 2
+
+Every task gets bids from ``--bids-per-task`` random agents, and agents have
+a random verification history. Compares taking each task's lowest bid on
+its own (what ``select_winner`` does) with the min-cost assignment under
+``--capacity``: how many tasks the busiest agent wins, and the total
+reputation-weighted cost. Then times a full clearing tick through the
+components (reading the auctions, solving, and awarding every task).
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+from app.clearing import MarketClearer, bid_cost, solve_assignment
+from app.components import AgentRegistry, BiddingSystem, ReputationLedger, TaskBoard
+from app.models import Agent, Bid, Task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--agents", type=int, default=5_000)
+    parser.add_argument("--bids-per-task", type=int, default=10)
+    parser.add_argument("--capacity", type=int, default=2)
+    parser.add_argument("--reputation-weight", type=float, default=1.0)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    task_board, agent_registry, bidding_system, ledger = TaskBoard(), AgentRegistry(), BiddingSystem(), ReputationLedger()
+    agents = agent_registry.register_agents([Agent(capabilities=[]) for _ in range(args.agents)])
+    for agent in agents:
+        for _ in range(rng.randint(0, 5)):
+            ledger.record_outcome(agent.agent_id, rng.uniform(40, 100), passed=rng.random() < 0.8)
+    agents = {agent.agent_id: agent_registry.get_agent(agent.agent_id) for agent in agents}
+    agent_ids = list(agents)
+    tasks = task_board.post_tasks([
+        Task(title=f"t{i}", description="", required_capabilities=[], reward_amount=100.0) for i in range(args.tasks)
+    ])
+    bids = [
+        Bid(task_id=task.task_id, agent_id=agent_id, bid_amount=round(rng.uniform(10, 100), 2))
+        for task in tasks
+        for agent_id in rng.sample(agent_ids, args.bids_per_task)
+    ]
+    bidding_system.submit_bids(bids)
+    print(f"{args.tasks} tasks, {args.agents} agents, {len(bids)} bids, capacity {args.capacity}")
+
+    options = [[] for _ in tasks]
+    lowest = {}
+    index = {task.task_id: i for i, task in enumerate(tasks)}
+    for bid in bids:
+        cost = bid_cost(bid, agents[bid.agent_id], args.reputation_weight)
+        options[index[bid.task_id]].append((bid.agent_id, cost))
+        if bid.task_id not in lowest or bid.bid_amount < lowest[bid.task_id][0]:
+            lowest[bid.task_id] = (bid.bid_amount, bid.agent_id, cost)
+    greedy_load = Counter(agent_id for _, agent_id, _ in lowest.values())
+    print(f"lowest bid per task    busiest agent wins {max(greedy_load.values()):3} tasks   "
+          f"weighted cost {sum(cost for _, _, cost in lowest.values()):12,.0f}")
+
+    highest = max(cost for task_options in options for _, cost in task_options)
+    start = time.perf_counter()
+    solution = solve_assignment(options, dict.fromkeys(agent_ids, args.capacity), 2 * highest + 1)
+    solved = time.perf_counter() - start
+    total = sum(dict(options[t])[agent_id] for t, agent_id in enumerate(solution) if agent_id is not None)
+    assigned = sum(agent_id is not None for agent_id in solution)
+    load = Counter(agent_id for agent_id in solution if agent_id is not None)
+    print(f"min-cost assignment    busiest agent wins {max(load.values()):3} tasks   "
+          f"weighted cost {total:12,.0f}   {assigned} assigned   solved in {solved:.2f}s")
+
+    start = time.perf_counter()
+    result = MarketClearer(task_board, agent_registry, bidding_system).clear(args.capacity, args.reputation_weight)
+    print(f"clearing tick          {len(result.assignments)} awarded, {len(result.unassigned)} left open "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Bid submission through the example agent's client against a local uvicorn.
+
+    python -m benchmarks.bench_client --bids 2000 --concurrency 32
+
+Compares the original module-level functions (one ``requests.post`` and
+one fresh TCP connection per call, strictly sequential) with the pooled
+clients: the synchronous facade issuing the same sequential calls over
+keep-alive connections, and the async client keeping ``--concurrency``
+bids in flight. Reports requests/sec and p50/p99 latency per request.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import requests
+
+from example_agent.marketplace_client import AsyncMarketplaceClient, MarketplaceClient
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("uvicorn did not start")
+
+
+def report(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{name:<34} {len(latencies) / elapsed:9,.0f} req/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+
+
+def bench_original(url, agent_id, task_ids):
+    latencies = []
+    start = time.perf_counter()
+    for i, task_id in enumerate(task_ids):
+        sent = time.perf_counter()
+        response = requests.post(f"{url}/bids/", json={"task_id": task_id, "agent_id": agent_id, "bid_amount": float(i)})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - sent)
+    report("original functions (sequential)", latencies, time.perf_counter() - start)
+
+
+def bench_facade(url, agent_id, task_ids):
+    client = MarketplaceClient(base_url=url)
+    latencies = []
+    try:
+        start = time.perf_counter()
+        for i, task_id in enumerate(task_ids):
+            sent = time.perf_counter()
+            client.submit_bid(task_id, agent_id, float(i))
+            latencies.append(time.perf_counter() - sent)
+        report("pooled sync facade (sequential)", latencies, time.perf_counter() - start)
+    finally:
+        client.close()
+
+
+async def bench_async(url, agent_id, task_ids, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    async with AsyncMarketplaceClient(base_url=url, max_connections=concurrency) as client:
+
+        async def submit(i, task_id):
+            async with semaphore:
+                sent = time.perf_counter()
+                await client.submit_bid(task_id, agent_id, float(i))
+                latencies.append(time.perf_counter() - sent)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(submit(i, task_id) for i, task_id in enumerate(task_ids)))
+        report(f"async client ({concurrency} in flight)", latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bids", type=int, default=2000, help="bids per client")
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    # One agent sends every bid; measure the clients, not the per-agent rate limit.
+    os.environ.setdefault("AEGIS_AGENT_BID_RATE", "0")
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = start_server(port)
+    try:
+        agent_id = requests.post(f"{url}/agents/", json={"capabilities": []}).json()["agent_id"]
+        tasks = [
+            {"task_id": str(uuid.uuid4()), "title": f"t{i}", "description": "", "required_capabilities": [], "reward_amount": 100.0}
+            for i in range(args.bids)
+        ]
+        requests.post(f"{url}/tasks/batch", json=tasks).raise_for_status()
+        task_ids = [task["task_id"] for task in tasks]
+
+        bench_original(url, agent_id, task_ids)
+        bench_facade(url, agent_id, task_ids)
+        asyncio.run(bench_async(url, agent_id, task_ids, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
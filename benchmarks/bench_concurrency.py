@@ -0,0 +1,85 @@
+"""
+Bid throughput by thread count, with striped per-task locks versus a
+single marketplace-wide lock.
+
+    python -m benchmarks.bench_concurrency --threads 1 2 4 8 --backend sqlite
+
+Each thread bids on its own tasks, so with striping threads only contend on
+the shared index lock and the storage engine. Under CPython's GIL the
+in-memory backend is CPU bound and cannot scale much; the SQLite backend
+releases the GIL inside sqlite calls and shows the effect of the locking
+scheme more clearly.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from app import components
+from app.components import AgentRegistry, BiddingSystem, TaskBoard
+from app.indexes import CapabilityIndex, TaskIndex, ReputationIndex
+from app.models import Agent, Bid, Task
+from app.repository import InMemoryRepository
+from app.sqlite_repository import SQLiteRepository
+
+
+def make_repository(backend, directory):
+    if backend == "sqlite":
+        return SQLiteRepository(os.path.join(directory, f"bench-{time.monotonic_ns()}.db"))
+    return InMemoryRepository(
+        {"tasks": {}, "agents": {}, "bids": {}, "work_products": {}},
+        {"capabilities": CapabilityIndex(), "tasks": TaskIndex(), "reputation": ReputationIndex()},
+    )
+
+
+def run(backend, threads, bids_per_thread, striped, directory):
+    original = components._task_locks
+    if not striped:
+        single = components.threading.RLock()
+        components._task_locks = [single] * components.LOCK_STRIPES
+    try:
+        repository = make_repository(backend, directory)
+        agents = AgentRegistry(repository).register_agents([Agent(capabilities=[]) for _ in range(threads)])
+        tasks = TaskBoard(repository).post_tasks([
+            Task(title=f"t{i}", description="", required_capabilities=[], reward_amount=100.0)
+            for i in range(threads * 10)
+        ])
+        bidding_system = BiddingSystem(repository)
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(index):
+            own_tasks = tasks[index * 10:(index + 1) * 10]
+            barrier.wait()
+            for i in range(bids_per_thread):
+                task = own_tasks[i % len(own_tasks)]
+                bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=agents[index].agent_id, bid_amount=float(i)))
+
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        for thread in workers:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        return threads * bids_per_thread / (time.perf_counter() - start)
+    finally:
+        components._task_locks = original
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--bids", type=int, default=2000, help="bids per thread")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for threads in args.threads:
+            striped = run(args.backend, threads, args.bids, True, directory)
+            global_lock = run(args.backend, threads, args.bids, False, directory)
+            print(f"{threads:3d} threads: striped {striped:10,.0f} bids/s   global lock {global_lock:10,.0f} bids/s")
+
+
+if __name__ == "__main__":
+    main()
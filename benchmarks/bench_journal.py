@@ -0,0 +1,67 @@
+"""
+Measure write throughput with the journal disabled, buffered and durable.
+
+    python -m benchmarks.bench_journal --ops 5000 --threads 1 4 16
+
+In durable mode every write waits for its fsync; group commit lets
+concurrent writers share one, so throughput should grow with threads
+instead of being capped at one write per fsync.
+"""
+import argparse
+import tempfile
+import threading
+import time
+
+from app.components import TaskBoard
+from app.indexes import CapabilityIndex, TaskIndex, ReputationIndex
+from app.journal import Journal, set_journal
+from app.models import Task
+from app.repository import InMemoryRepository
+
+
+def run(threads, ops, journal):
+    repository = InMemoryRepository(
+        {"tasks": {}, "agents": {}, "bids": {}, "work_products": {}},
+        {"capabilities": CapabilityIndex(), "tasks": TaskIndex(), "reputation": ReputationIndex()},
+    )
+    task_board = TaskBoard(repository)
+    per_thread = ops // threads
+
+    def writer():
+        for i in range(per_thread):
+            task_board.post_task(Task(title=f"t{i}", description="", required_capabilities=["x"], reward_amount=1.0))
+
+    set_journal(journal)
+    workers = [threading.Thread(target=writer) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    set_journal(None)
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        results = {"no journal": run(threads, args.ops, None)}
+        for mode, durable in (("buffered", False), ("durable", True)):
+            with tempfile.TemporaryDirectory() as directory:
+                journal = Journal(directory, durable=durable)
+                journal.start()
+                results[mode] = run(threads, args.ops, journal)
+                journal.close()
+                results[mode + " fsyncs"] = journal.fsync_count
+        print(f"{threads:3d} threads: " + "  ".join(
+            f"{name} {value:,.0f}" + ("" if "fsyncs" in name else " ops/s") for name, value in results.items()
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+End-to-end load test: concurrent requesters and agents driving the full
+post -> bid -> select_winner -> submit -> verify flow.
+
+    python -m benchmarks.bench_load --tasks 2000 --agents 50 --requesters 16 --output run.json
+    python -m benchmarks.bench_load --tasks 2000 --compare run.json
+    python -m benchmarks.bench_load --compare baseline.json --against run.json
+
+Each requester posts its share of the tasks one after another; for every
+task ``--bidders`` agents, drawn from the ``--agents`` registered ones,
+bid at once, the requester selects the winner, the winner submits its
+work, and the work is verified: by hand (the requester scores it) or, with
+``--auto-verify``, by the background verification queue, whose progress
+is polled. ``--concurrency`` caps the requests in flight across everyone.
+
+``--target asgi`` (the default) runs the app in-process and calls it
+through httpx's ASGI transport, so no socket is involved; ``--target
+uvicorn`` starts a local server, and a URL targets a running one.
+
+Throughput and p50/p95/p99 latency are reported per endpoint and can be
+stored as JSON. ``--compare`` checks a run against a stored one and exits
+with status 1 if any endpoint's p95 or p99 latency grew, or its
+throughput fell, by more than ``--threshold``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+# The capability every load-test task requires and every agent has.
+CAPABILITY = "load-test"
+VERIFIER = "app.verifiers:deliverable_succeeded"
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Recorder:
+    """Latencies and failures per endpoint, keyed by method and route template."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        # Unexpected status codes, or transport exceptions, and how often they came up.
+        self.errors: Dict[str, Counter] = defaultdict(Counter)
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            ordered = sorted(self.latencies[name])
+            endpoints[name] = {
+                "requests": len(ordered),
+                "errors": sum(self.errors[name].values()),
+                "error_kinds": dict(self.errors[name]),
+                "throughput": len(ordered) / elapsed,
+                "mean_ms": sum(ordered) / len(ordered) * 1000 if ordered else None,
+                "p50_ms": percentile(ordered, 0.50) * 1000 if ordered else None,
+                "p95_ms": percentile(ordered, 0.95) * 1000 if ordered else None,
+                "p99_ms": percentile(ordered, 0.99) * 1000 if ordered else None,
+            }
+        return endpoints
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace):
+        self.client = client
+        self.args = args
+        self.recorder = Recorder()
+        self.semaphore = asyncio.Semaphore(args.concurrency)
+        self.rng = random.Random(args.seed)
+        self.agent_ids: List[str] = []
+        self.flows = 0
+        self.failed_flows = 0
+
+    async def call(self, name: str, method: str, path: str, expected: int, **kwargs) -> Optional[httpx.Response]:
+        """One timed request, recorded under ``name``; ``None`` if it failed."""
+        async with self.semaphore:
+            sent = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.HTTPError as e:
+                self.recorder.errors[name][type(e).__name__] += 1
+                return None
+            latency = time.perf_counter() - sent
+        if response.status_code != expected:
+            self.recorder.errors[name][str(response.status_code)] += 1
+            return None
+        self.recorder.latencies[name].append(latency)
+        return response
+
+    async def register_agents(self):
+        for _ in range(self.args.agents):
+            response = await self.call("POST /agents/", "POST", "/agents/", 201, json={"capabilities": [CAPABILITY]})
+            if response is None:
+                raise RuntimeError("could not register the load-test agents")
+            self.agent_ids.append(response.json()["agent_id"])
+
+    async def flow(self, requester: int, number: int) -> bool:
+        reward = round(self.rng.uniform(50, 500), 2)
+        task = {
+            "title": f"load {requester}-{number}",
+            "description": "OrderID,SaleAmount\n1,10.0\n2,32.5",
+            "required_capabilities": [CAPABILITY],
+            "reward_amount": reward,
+        }
+        response = await self.call("POST /tasks/", "POST", "/tasks/", 201, json=task)
+        if response is None:
+            return False
+        task_id = response.json()["task_id"]
+
+        bidders = self.rng.sample(self.agent_ids, min(self.args.bidders, len(self.agent_ids)))
+        await asyncio.gather(*(
+            self.call("POST /bids/", "POST", "/bids/", 201, json={
+                "task_id": task_id, "agent_id": agent_id, "bid_amount": round(reward * self.rng.uniform(0.5, 1.0), 2),
+            })
+            for agent_id in bidders
+        ))
+        response = await self.call(
+            "POST /tasks/{task_id}/select_winner/", "POST", f"/tasks/{task_id}/select_winner/", 200
+        )
+        if response is None:
+            return False
+        winner = response.json()["agent_id"]
+
+        deliverable = {"status": "success", "total_sales": 42.5, "number_of_sales": 2}
+        response = await self.call("POST /work_products/", "POST", "/work_products/", 202, json={
+            "task_id": task_id, "agent_id": winner, "deliverable": deliverable,
+        })
+        if response is None:
+            return False
+        work_id = response.json()["work_id"]
+        return await self.verify(work_id, response.headers["location"])
+
+    async def verify(self, work_id: str, location: str) -> bool:
+        deadline = time.monotonic() + self.args.verify_timeout
+        while True:
+            response = await self.call("GET /work_products/{work_id}/verification", "GET", location, 200)
+            if response is None:
+                return False
+            state = response.json()["state"]
+            if state == "MANUAL":
+                score = round(self.rng.uniform(60, 100), 1)
+                response = await self.call(
+                    "POST /work_products/{work_id}/verify/", "POST", f"/work_products/{work_id}/verify/", 200,
+                    params={"score": score},
+                )
+                return response is not None
+            if state in ("VERIFIED", "ERROR"):
+                return state == "VERIFIED"
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(self.args.poll_interval)
+
+    async def requester(self, requester: int, tasks: int):
+        for number in range(tasks):
+            if await self.flow(requester, number):
+                self.flows += 1
+            else:
+                self.failed_flows += 1
+
+    async def run(self) -> dict:
+        await self.register_agents()
+        self.recorder = Recorder()
+        shares = [self.args.tasks // self.args.requesters] * self.args.requesters
+        for i in range(self.args.tasks % self.args.requesters):
+            shares[i] += 1
+        start = time.perf_counter()
+        await asyncio.gather(*(self.requester(i, share) for i, share in enumerate(shares)))
+        elapsed = time.perf_counter() - start
+        endpoints = self.recorder.summary(elapsed)
+        return {
+            "config": {
+                name: getattr(self.args, name)
+                for name in ("target", "tasks", "agents", "requesters", "bidders", "concurrency", "auto_verify", "seed")
+            },
+            "environment": {"python": platform.python_version(), "cpus": os.cpu_count()},
+            "elapsed_s": elapsed,
+            "flows": self.flows,
+            "failed_flows": self.failed_flows,
+            "flows_per_second": self.flows / elapsed,
+            "requests_per_second": sum(e["requests"] for e in endpoints.values()) / elapsed,
+            "endpoints": endpoints,
+        }
+
+
+async def run_asgi(args) -> dict:
+    from app.endpoints import verification_queue
+    from app.main import app
+
+    if args.auto_verify:
+        verification_queue.register(CAPABILITY, VERIFIER)
+    # httpx's transport does not run the lifespan, which starts the verification queue.
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            return await LoadTest(client, args).run()
+
+
+async def run_http(args, url: str) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        return await LoadTest(client, args).run()
+
+
+def run(args) -> dict:
+    if args.target == "asgi":
+        return asyncio.run(run_asgi(args))
+    if args.target != "uvicorn":
+        return asyncio.run(run_http(args, args.target.rstrip("/")))
+
+    from benchmarks.bench_client import free_port, start_server
+
+    if args.auto_verify:
+        os.environ["AEGIS_VERIFIERS"] = f"{CAPABILITY}={VERIFIER}"
+    port = free_port()
+    server = start_server(port)
+    try:
+        return asyncio.run(run_http(args, f"http://127.0.0.1:{port}"))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(results: dict):
+    print(
+        f"{results['flows']} flows ({results['failed_flows']} failed) in {results['elapsed_s']:.2f}s: "
+        f"{results['flows_per_second']:,.1f} flows/s, {results['requests_per_second']:,.0f} req/s"
+    )
+    print(f"{'endpoint':<44} {'req':>7} {'err':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, e in results["endpoints"].items():
+        if not e["requests"]:
+            print(f"{name:<44} {0:>7} {e['errors']:>5}")
+            continue
+        print(
+            f"{name:<44} {e['requests']:>7} {e['errors']:>5} {e['throughput']:>9,.0f} "
+            f"{e['p50_ms']:>8.2f} {e['p95_ms']:>8.2f} {e['p99_ms']:>8.2f}"
+        )
+    for name, e in results["endpoints"].items():
+        if e["error_kinds"]:
+            print(f"{name} failed with: " + ", ".join(f"{kind} x{count}" for kind, count in e["error_kinds"].items()))
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """
+    The regressions of ``current`` against ``baseline``: endpoints whose p95
+    or p99 latency grew, or whose throughput fell, by more than ``threshold``
+    (a fraction), plus endpoints that started failing.
+    """
+    regressions = []
+    for name, old in baseline["endpoints"].items():
+        new = current["endpoints"].get(name)
+        if new is None or not old["requests"]:
+            continue
+        if new["errors"] > old["errors"]:
+            regressions.append(f"{name}: {new['errors']} errors (was {old['errors']})")
+        if not new["requests"]:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if new[metric] > old[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {old[metric]:.2f} -> {new[metric]:.2f}")
+        if new["throughput"] < old["throughput"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {old['throughput']:,.0f} -> {new['throughput']:,.0f} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--target", default="asgi", help="asgi, uvicorn, or the URL of a running server")
+    parser.add_argument("--tasks", type=int, default=1000, help="tasks taken through the whole flow")
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--requesters", type=int, default=16)
+    parser.add_argument("--bidders", type=int, default=5, help="agents bidding on each task")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at most")
+    parser.add_argument("--auto-verify", action="store_true", help="verify through the background queue")
+    parser.add_argument("--verify-timeout", type=float, default=30.0)
+    parser.add_argument("--poll-interval", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="store the results as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against stored results")
+    parser.add_argument("--against", metavar="RESULTS", help="compare stored results instead of running")
+    parser.add_argument("--threshold", type=float, default=0.10, help="tolerated change, as a fraction")
+    args = parser.parse_args()
+
+    if args.against:
+        if not args.compare:
+            parser.error("--against requires --compare")
+        with open(args.against) as f:
+            results = json.load(f)
+    else:
+        results = run(args)
+        report(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Market price statistics kept incrementally, against computing them from the bids.
+
+    python -m benchmarks.bench_market_stats --tasks 20000 --bids-per-task 10 --capability-sets 20
+
+Posts ``--tasks`` tasks over ``--capability-sets`` capability sets, bids on
+each and selects every winner, timing the bidding with the statistics
+updated as it happens. Then compares answering ``GET /market/stats`` from
+the statistics with the same winning-ratio quantiles computed by reading
+every task and its bids.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.components import AgentRegistry, BiddingSystem, TaskBoard
+from app.market_stats import capability_set, market_stats
+from app.models import Agent, Bid, Task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=20_000)
+    parser.add_argument("--bids-per-task", type=int, default=10)
+    parser.add_argument("--capability-sets", type=int, default=20)
+    parser.add_argument("--reads", type=int, default=1_000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    task_board, bidding_system = TaskBoard(), BiddingSystem()
+    capability_sets = [[f"skill{i}", f"skill{i + 1}"] for i in range(args.capability_sets)]
+    agents = AgentRegistry().register_agents([
+        Agent(capabilities=[skill for capabilities in capability_sets for skill in capabilities]) for _ in range(50)
+    ])
+    tasks = task_board.post_tasks([
+        Task(title=f"t{i}", description="", required_capabilities=rng.choice(capability_sets), reward_amount=100.0)
+        for i in range(args.tasks)
+    ])
+    bids = [
+        Bid(task_id=task.task_id, agent_id=rng.choice(agents).agent_id, bid_amount=rng.uniform(30, 100))
+        for task in tasks
+        for _ in range(args.bids_per_task)
+    ]
+    start = time.perf_counter()
+    for bid in bids:
+        bidding_system.submit_bid(bid)
+    for task in tasks:
+        bidding_system.select_winner(task.task_id)
+    elapsed = time.perf_counter() - start
+    print(f"{len(bids)} bids and {len(tasks)} winners in {elapsed:.2f}s "
+          f"({elapsed / (len(bids) + len(tasks)) * 1e6:.1f} us per operation, statistics included)")
+
+    wanted = capability_sets[0]
+    start = time.perf_counter()
+    for _ in range(args.reads):
+        market_stats.summaries(wanted)
+    print(f"from the statistics     {(time.perf_counter() - start) / args.reads * 1e6:10.1f} us per read")
+
+    start = time.perf_counter()
+    ratios = []
+    for task in task_board.get_all_tasks():
+        if capability_set(task.required_capabilities) == tuple(wanted):
+            winner = bidding_system.get_top_bids(task.task_id, 1)
+            if winner:
+                ratios.append(winner[0].bid_amount / task.reward_amount)
+    scanned = time.perf_counter() - start
+    print(f"scanning tasks and bids {scanned * 1e6:10.1f} us per read")
+    [summary] = market_stats.summaries(wanted)
+    print(f"winning ratio median: sketch {summary.winning_ratio.p50:.4f}   exact {statistics.median(ratios):.4f}")
+
+
+if __name__ == "__main__":
+    main()
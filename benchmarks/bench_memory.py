@@ -0,0 +1,90 @@
+"""
+Memory held per task and per bid by the in-memory and compact repositories.
+
+    python -m benchmarks.bench_memory --tasks 200000 --bids-per-task 5
+
+Tasks and bids are built and stored one at a time, so the input models are
+garbage by the time tracemalloc is read and only what the repository (and
+its indexes) keeps alive is counted. Titles are unique per task and the
+descriptions and capability lists repeat, as they do on a real board.
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from uuid import UUID, uuid4
+
+from app.compact_repository import CompactRepository
+from app.indexes import CapabilityIndex, TaskIndex, ReputationIndex
+from app.models import Agent, Bid, Task
+from app.repository import InMemoryRepository
+
+CAPABILITIES = [f"cap{i}" for i in range(40)]
+
+
+def traced() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def measure(repository, args):
+    rng = random.Random(args.seed)
+    agents = [Agent(capabilities=rng.sample(CAPABILITIES, 8)) for _ in range(args.agents)]
+    for agent in agents:
+        repository.add_agent(agent)
+    agent_ids = [agent.agent_id for agent in agents]
+    # IDs are kept as hex strings so that every UUID the repository holds
+    # is allocated while tracing.
+    task_ids = [uuid4().hex for _ in range(args.tasks)]
+
+    start = traced()
+    began = time.perf_counter()
+    for i, task_id in enumerate(task_ids):
+        # Fresh strings for every task, as parsing a request would produce.
+        repository.add_task(Task(
+            task_id=UUID(task_id),
+            title=f"Task {i}",
+            description="".join(["Benchmark ", "task"]),
+            required_capabilities=["".join(["cap", str(rng.randrange(40))]) for _ in range(rng.randint(1, 3))],
+            reward_amount=round(rng.uniform(0, 1000), 2),
+        ))
+    load_seconds = time.perf_counter() - began
+    task_bytes = traced() - start
+
+    bid_task_ids = task_ids[: args.tasks // 5]
+    start = traced()
+    for task_id in bid_task_ids:
+        for agent_id in rng.sample(agent_ids, args.bids_per_task):
+            repository.add_bid(Bid(task_id=UUID(task_id), agent_id=agent_id, bid_amount=round(rng.uniform(0, 1000), 2)))
+    bid_bytes = traced() - start
+    bids = len(bid_task_ids) * args.bids_per_task
+    return task_bytes / args.tasks, bid_bytes / bids, args.tasks / load_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--bids-per-task", type=int, default=5, help="bids on each of the first fifth of the tasks")
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    backends = [
+        ("memory (pydantic)", lambda: InMemoryRepository(
+            {"tasks": {}, "agents": {}, "bids": {}, "work_products": {}},
+            {"capabilities": CapabilityIndex(), "tasks": TaskIndex(), "reputation": ReputationIndex()},
+        )),
+        ("compact", CompactRepository),
+    ]
+    tracemalloc.start()
+    for name, factory in backends:
+        repository = factory()
+        per_task, per_bid, load_rate = measure(repository, args)
+        print(f"{name:<18} {per_task:8.0f} bytes/task   {per_bid:8.0f} bytes/bid   ({load_rate:9.0f} tasks/s loaded)")
+        del repository
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Cost of the /metrics instrumentation: request middleware plus component
+timers, measured with recording switched on and off.
+
+    python -m benchmarks.bench_metrics --requests 5000 --rounds 5
+
+Each round sends the same mix of requests (a bid, a task lookup and a
+page of top bids per task) straight into the ASGI app, once with
+recording enabled and once with it disabled, alternating so drift in
+machine speed hits both alike. The best round of each is compared, and
+the cost of a single histogram observation is timed on its own.
+"""
+import argparse
+import asyncio
+import time
+
+import orjson
+
+from app.endpoints import agent_registry, task_board
+from app.main import app
+from app.metrics import metrics, request_seconds
+from app.models import Agent, Task
+
+
+async def call(method: str, path: str, body: bytes = b""):
+    """Call the app directly and return the response status."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    await app(scope, receive, send)
+    return statuses[0]
+
+
+async def round_trip(task_ids, agent_ids) -> float:
+    start = time.perf_counter()
+    for i, task_id in enumerate(task_ids):
+        bid = {"task_id": task_id, "agent_id": agent_ids[i % len(agent_ids)], "bid_amount": float(i % 97)}
+        assert await call("POST", "/bids/", orjson.dumps(bid)) == 201
+        assert await call("GET", f"/tasks/{task_id}") == 200
+        assert await call("GET", f"/tasks/{task_id}/bids") == 200
+    return time.perf_counter() - start
+
+
+async def run(args):
+    agents = agent_registry.register_agents([Agent(capabilities=["python"]) for _ in range(50)])
+    agent_ids = [str(agent.agent_id) for agent in agents]
+    tasks = task_board.post_tasks([
+        Task(title=f"Task {i}", description="Benchmark task", required_capabilities=["python"], reward_amount=100.0)
+        for i in range(args.requests // 3)
+    ])
+    task_ids = [str(task.task_id) for task in tasks]
+    await round_trip(task_ids[:100], agent_ids)
+
+    timings = {True: [], False: []}
+    for _ in range(args.rounds):
+        for enabled in (True, False):
+            metrics.enabled = enabled
+            timings[enabled].append(await round_trip(task_ids, agent_ids))
+    metrics.enabled = True
+
+    requests = len(task_ids) * 3
+    off, on = min(timings[False]), min(timings[True])
+    print(f"recording off  {off / requests * 1e6:8.1f} us per request")
+    print(f"recording on   {on / requests * 1e6:8.1f} us per request")
+    print(f"overhead       {(on - off) / requests * 1e6:8.1f} us per request ({(on - off) / off:+.1%})")
+
+    labels = ("POST", "/bids/", "201")
+    count = 200_000
+    start = time.perf_counter()
+    for _ in range(count):
+        request_seconds.observe(0.0012, *labels)
+    print(f"one histogram observation {(time.perf_counter() - start) / count * 1e9:8.0f} ns")
+    start = time.perf_counter()
+    text = metrics.render()
+    print(f"rendering /metrics ({len(text.splitlines())} lines) {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=6000, help="requests per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
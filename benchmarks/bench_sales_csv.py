@@ -0,0 +1,88 @@
+"""
+Peak memory and time of the sales analysis skill on a large CSV file: the
+in-memory ``analyze_sales_data`` against ``analyze_sales_data_stream``
+reading a path, a memory-mapped file and a stream of byte chunks.
+
+    python -m benchmarks.bench_sales_csv --rows 5000000
+
+Each variant runs in a fresh process, which reports its own peak RSS; the
+first line is that of a process that only imported pandas. The in-memory
+variant is given the file's contents as a ``str``, as the skill receives
+a task description today.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+
+CHUNK_BYTES = 1 << 20
+
+
+def write_csv(path: str, rows: int, seed: int):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write("OrderID,Date,Region,Product,SaleAmount\n")
+        for i in range(rows):
+            f.write(f"{i},2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},{rng.choice('NESW')},P{rng.randrange(500)},{rng.uniform(1, 500):.2f}\n")
+
+
+def read_chunks(path: str):
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_BYTES):
+            yield chunk
+
+
+def run(variant: str, path: str, connection):
+    import pandas  # noqa: F401 -- loaded up front in every variant, baseline included
+    from example_agent import skills
+
+    start = time.perf_counter()
+    if variant == "in-memory str":
+        with open(path) as f:
+            result = skills.analyze_sales_data(f.read())
+    elif variant == "stream: path":
+        result = skills.analyze_sales_data_stream(path)
+    elif variant == "stream: mmap":
+        result = skills.analyze_sales_data_stream(path, memory_map=True)
+    elif variant == "stream: chunks":
+        result = skills.analyze_sales_data_stream(read_chunks(path))
+    else:
+        result = None
+    elapsed = time.perf_counter() - start
+    connection.send((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, result))
+
+
+def measure(variant: str, path: str):
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.get_context("spawn").Process(target=run, args=(variant, path, sender))
+    process.start()
+    outcome = receiver.recv()
+    process.join()
+    return outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sales.csv")
+        write_csv(path, args.rows, args.seed)
+        print(f"{args.rows} rows, {os.path.getsize(path) / 2**20:.0f} MiB")
+        results = []
+        for variant in ("baseline", "in-memory str", "stream: path", "stream: mmap", "stream: chunks"):
+            elapsed, peak_kib, result = measure(variant, path)
+            print(f"  {variant:<16} peak RSS {peak_kib / 1024:8.0f} MiB   {elapsed:7.2f} s")
+            if result is not None:
+                results.append(result)
+        assert all(result["status"] == "success" for result in results)
+        assert len({result["number_of_sales"] for result in results}) == 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Bid throughput against 1..N shard processes.
+
+    python -m benchmarks.bench_sharding --shards 1 2 4 --clients 8
+
+Client processes (standing in for uvicorn workers) submit single bids
+through a ShardRouter, spread evenly over tasks on every shard. Each shard
+is its own interpreter, so throughput grows with the shard count until the
+machine runs out of cores; with fewer cores than shards plus clients the
+processes just time-share.
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+import tempfile
+import time
+
+from app.models import Agent, Bid, Task
+from app.sharding import ShardRouter, start_shards
+
+
+def client(addresses, authkey, agent_ids, task_ids, bids, barrier, results):
+    shards = ShardRouter(addresses, authkey)
+    barrier.wait()
+    start = time.perf_counter()
+    for i in range(bids):
+        shards.bidding_system.submit_bid(
+            Bid(task_id=task_ids[i % len(task_ids)], agent_id=agent_ids[i % len(agent_ids)], bid_amount=float(i))
+        )
+    results.put(time.perf_counter() - start)
+    shards.close()
+
+
+def run(shard_count, clients, bids_per_client, directory):
+    context = multiprocessing.get_context("spawn")
+    addresses = [os.path.join(directory, f"bench-{shard_count}-{index}.sock") for index in range(shard_count)]
+    authkey = secrets.token_bytes(32)
+    processes = start_shards(addresses, authkey)
+    try:
+        shards = ShardRouter(addresses, authkey)
+        agents = shards.agent_registry.register_agents([Agent(capabilities=[]) for _ in range(50)])
+        tasks = shards.task_board.post_tasks([
+            Task(title=f"t{i}", description="", required_capabilities=[], reward_amount=100.0) for i in range(1000)
+        ])
+        shards.close()
+        barrier = context.Barrier(clients + 1)
+        results = context.Queue()
+        workers = [
+            context.Process(target=client, args=(
+                addresses, authkey, [agent.agent_id for agent in agents], [task.task_id for task in tasks[index::clients]],
+                bids_per_client, barrier, results,
+            ))
+            for index in range(clients)
+        ]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for _ in workers:
+            results.get()
+        elapsed = time.perf_counter() - start
+        for worker in workers:
+            worker.join()
+        return clients * bids_per_client / elapsed
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="client processes")
+    parser.add_argument("--bids", type=int, default=2000, help="bids per client")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores")
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = None
+        for shard_count in args.shards:
+            throughput = run(shard_count, args.clients, args.bids, directory)
+            baseline = baseline or throughput
+            print(f"{shard_count:3d} shards: {throughput:10,.0f} bids/s  ({throughput / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Tasks completed per minute by the example agent's skill executor as the
+number of worker processes grows.
+
+    python -m benchmarks.bench_skill_executor --tasks 64 --rows 20000 --workers 1 2 4
+
+Every task carries its own CSV payload in its description and the work
+product is handed to a no-op ``submit_work``, so only skill execution and
+the hand-off between processes are timed. The default skill uses the
+standard library; pass ``--skill example_agent.skills:analyze_sales_data``
+to time the pandas one.
+"""
+import argparse
+import os
+import random
+import time
+
+from example_agent.executor import SkillExecutor, SkillRegistry
+
+
+def csv_payload(rng: random.Random, rows: int) -> str:
+    lines = ["OrderID,Region,SaleAmount"]
+    lines.extend(f"{i},{rng.choice('NESW')},{rng.uniform(1, 500):.2f}" for i in range(rows))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=64)
+    parser.add_argument("--rows", type=int, default=20000, help="CSV rows per task")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--skill", default="example_agent.skills:summarize_csv")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tasks = [
+        {"task_id": str(i), "required_capabilities": ["csv"], "description": csv_payload(rng, args.rows)}
+        for i in range(args.tasks)
+    ]
+    print(f"{args.tasks} tasks of {args.rows} rows, {os.cpu_count()} cores")
+    for workers in args.workers:
+        executor = SkillExecutor(lambda task, deliverable: None, registry=SkillRegistry({"csv": args.skill}), max_workers=workers)
+        # Start every worker (and its imports) before timing.
+        for future in [executor.submit(task) for task in tasks[:workers]]:
+            future.result()
+        executor.join()
+        executor.completed = 0
+
+        start = time.perf_counter()
+        for task in tasks:
+            executor.submit(task)
+        executor.join()
+        elapsed = time.perf_counter() - start
+        executor.shutdown()
+        print(f"  {workers:>2} workers  {executor.completed * 60 / elapsed:8.0f} tasks/min  ({elapsed:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
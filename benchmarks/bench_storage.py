@@ -0,0 +1,110 @@
+"""
+Compare the in-memory, compact and SQLite repositories on a large task board.
+
+    python -m benchmarks.bench_storage --tasks 1000000
+
+Loads ``--tasks`` tasks (a fifth of them with bids) into each backend, then
+times point lookups, paged listing by status, eligibility queries and top-k
+bid reads.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.compact_repository import CompactRepository
+from app.indexes import CapabilityIndex, TaskIndex, ReputationIndex
+from app.models import Agent, Bid, Task, TaskStatus
+from app.repository import InMemoryRepository
+from app.sqlite_repository import SQLiteRepository
+
+CAPABILITIES = [f"cap{i}" for i in range(40)]
+LOAD_CHUNK = 10000
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {count / elapsed:12.0f} ops/s  ({elapsed * 1e6 / count:9.1f} us/op)")
+
+
+def load(repository, tasks, agents, bids):
+    def insert():
+        for offset in range(0, len(tasks), LOAD_CHUNK):
+            with repository.transaction():
+                for task in tasks[offset:offset + LOAD_CHUNK]:
+                    repository.add_task(task)
+        with repository.transaction():
+            for agent in agents:
+                repository.add_agent(agent)
+        for offset in range(0, len(bids), LOAD_CHUNK):
+            with repository.transaction():
+                for bid in bids[offset:offset + LOAD_CHUNK]:
+                    repository.add_bid(bid)
+
+    timed("insert tasks + bids", len(tasks) + len(bids), insert)
+
+
+def queries(repository, tasks, agents, rng, samples):
+    lookups = [rng.choice(tasks).task_id for _ in range(samples)]
+    timed("get_task", samples, lambda: [repository.get_task(task_id) for task_id in lookups])
+
+    def pages():
+        cursor = None
+        for _ in range(samples // 10):
+            _, cursor = repository.page_tasks(TaskStatus.POSTED, None, None, cursor, 100)
+    timed("page_tasks(status, 100)", samples // 10, pages)
+    timed(
+        "page_tasks(min_reward, 100)",
+        samples // 10,
+        lambda: [repository.page_tasks(None, None, rng.uniform(0, 1000), None, 100) for _ in range(samples // 10)],
+    )
+    timed("eligible_tasks", 10, lambda: [repository.eligible_tasks(rng.choice(agents).capabilities) for _ in range(10)])
+    bid_tasks = [task.task_id for task in tasks[: len(tasks) // 5]]
+    timed("top_bids(10)", samples, lambda: [repository.top_bids(rng.choice(bid_tasks), 10) for _ in range(samples)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tasks = [
+        Task(
+            title=f"Task {i}",
+            description="benchmark",
+            required_capabilities=rng.sample(CAPABILITIES, rng.randint(1, 3)),
+            reward_amount=round(rng.uniform(0, 1000), 2),
+        )
+        for i in range(args.tasks)
+    ]
+    agents = [Agent(capabilities=rng.sample(CAPABILITIES, 8)) for _ in range(args.agents)]
+    bids = [
+        Bid(task_id=task.task_id, agent_id=rng.choice(agents).agent_id, bid_amount=rng.uniform(0, task.reward_amount))
+        for task in tasks[: args.tasks // 5]
+        for _ in range(3)
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        backends = [
+            ("memory", InMemoryRepository(
+                {"tasks": {}, "agents": {}, "bids": {}, "work_products": {}},
+                {"capabilities": CapabilityIndex(), "tasks": TaskIndex(), "reputation": ReputationIndex()},
+            )),
+            ("compact", CompactRepository()),
+            ("sqlite (WAL)", SQLiteRepository(os.path.join(directory, "bench.db"))),
+        ]
+        for name, repository in backends:
+            print(f"{name}: {args.tasks} tasks, {len(bids)} bids")
+            load(repository, tasks, agents, bids)
+            queries(repository, tasks, agents, random.Random(args.seed), args.samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+GET /tasks/ on a board of 100k tasks, through the original response_model
+path and through the cached pre-encoded payloads.
+
+    python -m benchmarks.bench_task_listing --tasks 100000 --limit 1000
+
+Each round pages through the whole board. The original path validates
+and encodes every Task on every request; the optimized path joins cached
+per-task JSON fragments, so only its first (cold) round encodes anything.
+Requests are fed straight into the ASGI app, so the timings are the
+server's own cost without an HTTP client or socket in the way.
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+from urllib.parse import urlencode
+
+import orjson
+from fastapi import Query, Response
+
+from app.encoding import task_payloads
+from app.endpoints import task_board
+from app.main import app
+from app.models import Task
+
+
+@app.get("/benchmark/tasks/", response_model=List[Task])
+def list_tasks_original(response: Response, cursor: Optional[int] = None, limit: int = Query(100, ge=1, le=1000)):
+    """The listing as it was before the cached payload path."""
+    tasks, next_cursor = task_board.list_tasks(None, None, None, cursor, limit)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return tasks
+
+
+async def get(path: str, params: dict):
+    """Call the app directly; returns the status, headers and body."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": urlencode(params).encode(), "root_path": "",
+        "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], {name.decode().lower(): value.decode() for name, value in start["headers"]}, body
+
+
+async def walk(path: str, limit: int) -> float:
+    params = {"limit": limit}
+    start = time.perf_counter()
+    while True:
+        status, headers, _ = await get(path, params)
+        assert status == 200
+        if "x-next-cursor" not in headers:
+            return time.perf_counter() - start
+        params["cursor"] = headers["x-next-cursor"]
+
+
+async def run(args):
+    pages = -(-args.tasks // args.limit)
+    _, _, optimized = await get("/tasks/", {"limit": 5})
+    _, _, original = await get("/benchmark/tasks/", {"limit": 5})
+    assert orjson.loads(optimized) == orjson.loads(original)
+    task_payloads.clear()
+
+    for name, path in (("original response_model", "/benchmark/tasks/"), ("cached payloads", "/tasks/")):
+        timings = [await walk(path, args.limit) for _ in range(args.rounds)]
+        print(
+            f"{name:<24} first round {timings[0] * 1000:8.0f} ms   "
+            f"warm round {min(timings[1:] or timings) * 1000:8.0f} ms   "
+            f"({min(timings) / pages * 1000:.2f} ms per {args.limit}-task page)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=1000, help="page size")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    task_board.post_tasks([
+        Task(title=f"Task {i}", description="Benchmark task", required_capabilities=["python", "sql"], reward_amount=float(i % 500))
+        for i in range(args.tasks)
+    ])
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
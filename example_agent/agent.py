@@ -5,18 +5,41 @@ import uuid
 
 # Local imports
 import marketplace_client as client
-from skills import analyze_sales_data
+from executor import SkillExecutor
 
 # --- Agent Configuration ---
 AGENT_CONFIG_FILE = "agent_config.json"
 AGENT_CAPABILITIES = ["data_analysis", "python", "csv"]
+# "sse" follows the Server-Sent Events stream, "poll" uses long-polling and
+# "mirror" keeps a local copy of the board, fetching only the changes.
+EVENT_TRANSPORT = "sse"
+BIDDABLE_EVENTS = {"posted", "bidding_open"}
+WON_EVENT = "assigned"
+BIDDABLE_STATUSES = {"POSTED", "BIDDING_OPEN"}
+MIRROR_POLL_SECONDS = 2.0
+# Skill worker processes (default: one per core) and how many won tasks
+# may wait for one before the agent stops taking in events.
+SKILL_WORKERS = None
+MAX_PENDING_SKILLS = None
+# Adaptive bidding: bid at this quantile of recent winning bids (as a
+# fraction of the reward) for tasks requiring the same capabilities, never
+# below MIN_BID_RATIO; DEFAULT_BID_RATIO until the market has winners.
+# Market statistics are fetched at most once per refresh interval.
+WINNING_QUANTILE = "p25"
+DEFAULT_BID_RATIO = 0.9
+MIN_BID_RATIO = 0.5
+MARKET_STATS_REFRESH_SECONDS = 60.0
 
 class Agent:
     def __init__(self):
         self.agent_id = None
         self.capabilities = AGENT_CAPABILITIES
         self.bids_made = set()
+        self.tasks_won = set()
+        # Capability set -> (fetched at, bid ratio).
+        self.bid_ratios = {}
         self.load_or_register()
+        self.executor = SkillExecutor(self.submit_work, max_workers=SKILL_WORKERS, max_pending=MAX_PENDING_SKILLS)
 
     def load_or_register(self):
         """Load agent config from file or register a new one."""
@@ -42,40 +65,115 @@ class Agent:
         required = set(task.get('required_capabilities', []))
         return required.issubset(self.capabilities)
 
+    def bid_ratio(self, capabilities: list) -> float:
+        """What fraction of the reward to bid, from recent winning bids on similar tasks."""
+        key = tuple(sorted(set(capabilities)))
+        cached = self.bid_ratios.get(key)
+        if cached is not None and time.monotonic() - cached[0] < MARKET_STATS_REFRESH_SECONDS:
+            return cached[1]
+        stats = client.get_market_stats(list(key))
+        ratio = DEFAULT_BID_RATIO
+        if stats and stats['winning_ratio']:
+            ratio = max(stats['winning_ratio'][WINNING_QUANTILE], MIN_BID_RATIO)
+        self.bid_ratios[key] = (time.monotonic(), ratio)
+        return ratio
+
+    def bid_amount(self, task: dict) -> float:
+        return task['reward_amount'] * self.bid_ratio(task.get('required_capabilities', []))
+
+    def consider_task(self, task: dict):
+        """Bid on a task we have not bid on yet."""
+        task_id_str = task['task_id']
+        if task_id_str in self.bids_made:
+            return
+        print(f"Found new task: {task['title']}")
+        bid_amount = self.bid_amount(task)
+        client.submit_bid(
+            task_id=uuid.UUID(task_id_str),
+            agent_id=self.agent_id,
+            bid_amount=bid_amount
+        )
+        self.bids_made.add(task_id_str)
+
+    def consider_tasks(self, tasks: list):
+        """Bid on every task we have not bid on yet, concurrently."""
+        new_tasks = [task for task in tasks if task['task_id'] not in self.bids_made]
+        if not new_tasks:
+            return
+        print(f"Found {len(new_tasks)} new tasks")
+        client.submit_bids(
+            self.agent_id,
+            [(uuid.UUID(task['task_id']), self.bid_amount(task)) for task in new_tasks],
+        )
+        self.bids_made.update(task['task_id'] for task in new_tasks)
+
+    def check_won(self, task: dict):
+        """Run the skill for an assigned task if our bid is the one that won it."""
+        task_id_str = task['task_id']
+        if task_id_str not in self.bids_made or task_id_str in self.tasks_won:
+            return
+        # Assigned tasks carry the bid they were awarded to.
+        winner = task.get('winning_bid')
+        if winner is None or winner['agent_id'] != str(self.agent_id):
+            return
+        print(f"Won task: {task['title']}")
+        self.tasks_won.add(task_id_str)
+        self.executor.submit(task)
+
+    def submit_work(self, task: dict, deliverable: dict):
+        """Called by the skill executor when a skill has finished; raises if the submission fails."""
+        if client.submit_work(uuid.UUID(task['task_id']), self.agent_id, deliverable) is None:
+            raise RuntimeError("the marketplace did not accept the work")
+        print(f"Completed {self.executor.completed} tasks ({self.executor.tasks_per_minute():.1f}/min)")
+
+    def handle_event(self, event: dict):
+        # The feed is filtered server-side to tasks we are qualified for.
+        if event['type'] in BIDDABLE_EVENTS:
+            self.consider_task(event['task'])
+        elif event['type'] == WON_EVENT:
+            self.check_won(event['task'])
+
+    def run_mirror(self):
+        """Poll the board for changes and bid on new tasks we are qualified for."""
+        while True:
+            changed = client.sync_tasks()
+            self.consider_tasks([
+                task for task in changed if task['status'] in BIDDABLE_STATUSES and self.is_qualified(task)
+            ])
+            for task in changed:
+                if task['status'] == "ASSIGNED":
+                    self.check_won(task)
+            time.sleep(MIRROR_POLL_SECONDS)
+
     def run(self):
         """The main loop for the agent."""
         print(f"--- Starting Agent {self.agent_id} ---")
+        if EVENT_TRANSPORT == "mirror":
+            # The first sync returns the whole board, which covers catching up.
+            return self.run_mirror()
+        # Remember where the feed is before catching up, so nothing posted
+        # in between is missed.
+        last_event_id = client.get_event_position()
+        self.consider_tasks(client.get_eligible_tasks(self.agent_id))
+
         while True:
-            print("Checking for new tasks...")
             try:
-                tasks = client.get_tasks()
-                if not tasks:
-                    print("No tasks found.")
+                if EVENT_TRANSPORT == "sse":
+                    for event in client.stream_events(self.capabilities, last_event_id):
+                        last_event_id = event['id']
+                        self.handle_event(event)
                 else:
-                    for task in tasks:
-                        task_id_str = task['task_id']
-                        # Check if task is open for bidding and if we haven't already bid
-                        if task['status'] == 'POSTED' and task_id_str not in self.bids_made:
-                            print(f"Found new task: {task['title']}")
-                            if self.is_qualified(task):
-                                print("Agent is qualified. Submitting bid.")
-                                # Simple bidding strategy: bid 10% less than the reward
-                                bid_amount = task['reward_amount'] * 0.9
-                                client.submit_bid(
-                                    task_id=uuid.UUID(task_id_str),
-                                    agent_id=self.agent_id,
-                                    bid_amount=bid_amount
-                                )
-                                self.bids_made.add(task_id_str)
-                            else:
-                                print("Agent is not qualified for this task.")
-            
+                    result = client.poll_events(last_event_id, self.capabilities)
+                    if result['truncated']:
+                        # We fell too far behind the feed; resynchronise.
+                        self.consider_tasks(client.get_eligible_tasks(self.agent_id))
+                    for event in result['events']:
+                        self.handle_event(event)
+                    last_event_id = result['last_event_id']
             except Exception as e:
                 print(f"An error occurred in the main loop: {e}")
-
-            # Wait for a bit before the next cycle
-            print("--- Cycle finished. Sleeping for 30 seconds. ---")
-            time.sleep(30)
+                print("--- Reconnecting in 1 second. ---")
+                time.sleep(1)
 
 if __name__ == "__main__":
     agent = Agent()
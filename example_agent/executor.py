@@ -0,0 +1,141 @@
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+# --- Skill Registry ---
+
+# Skills by capability, as "module:function" references. They are imported
+# by the worker processes on first use, never by the agent process itself.
+# Earlier entries win when a task requires several skilled capabilities.
+DEFAULT_SKILLS = {
+    "data_analysis": "skills:analyze_sales_data",
+    "csv": "skills:summarize_csv",
+}
+
+_loaded_skills: Dict[str, Callable[[str], Dict[str, Any]]] = {}
+
+def run_skill(reference: str, data: str) -> Dict[str, Any]:
+    """Runs a skill in a worker process, importing its module on first use."""
+    skill = _loaded_skills.get(reference)
+    if skill is None:
+        module, _, name = reference.partition(":")
+        skill = _loaded_skills[reference] = getattr(importlib.import_module(module), name)
+    return skill(data)
+
+class SkillRegistry:
+    """Maps capabilities to the skills that do the work for them."""
+
+    def __init__(self, skills: Optional[Dict[str, str]] = None):
+        self.skills = dict(DEFAULT_SKILLS if skills is None else skills)
+
+    def register(self, capability: str, reference: str):
+        self.skills[capability] = reference
+
+    def skill_for(self, task: dict) -> Optional[str]:
+        """The skill for a task, or `None` if none of its capabilities has one."""
+        required = set(task.get('required_capabilities', []))
+        for capability, reference in self.skills.items():
+            if capability in required:
+                return reference
+        return None
+
+# --- Skill Executor ---
+
+class SkillExecutor:
+    """
+    Runs skills for won tasks on a pool of worker processes, one task per
+    worker at a time, and hands each result to `submit_work` on one of
+    `submit_workers` threads, so a slow submission holds up neither a
+    worker nor the collection of other results.
+
+    At most `max_pending` tasks are queued or running; `submit` blocks
+    (or gives up after `timeout`) until a slot frees up, which pushes back
+    on whatever is feeding it won tasks. A slot frees up as soon as its
+    skill finishes. Skills take the task's description as their input data.
+    """
+
+    def __init__(
+        self,
+        submit_work: Callable[[dict, Dict[str, Any]], Any],
+        registry: Optional[SkillRegistry] = None,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        submit_workers: int = 4,
+    ):
+        self.submit_work = submit_work
+        self.registry = registry or SkillRegistry()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+        # Workers are spawned rather than forked: the agent already runs the
+        # client's event loop thread, which a forked child would inherit half-copied.
+        self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._submitters = ThreadPoolExecutor(submit_workers, thread_name_prefix="submit-work")
+        self._lock = threading.Lock()
+        # Tasks submitted and not yet handed off, which `join` waits for.
+        self._outstanding = 0
+        self._idle = threading.Condition(self._lock)
+        self._started = time.monotonic()
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, task: dict, timeout: Optional[float] = None) -> Optional[Future]:
+        """Queue a won task; `None` if no skill handles it or no slot freed up in time."""
+        reference = self.registry.skill_for(task)
+        if reference is None:
+            print(f"No skill for task {task['task_id']} (requires {task.get('required_capabilities')})")
+            return None
+        if not self._slots.acquire(timeout=timeout):
+            return None
+        try:
+            future = self._pool.submit(run_skill, reference, task['description'])
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._outstanding += 1
+        future.add_done_callback(partial(self._finished, task))
+        return future
+
+    def _finished(self, task: dict, future: Future):
+        # Called on the process pool's result thread, which must not wait on the network.
+        self._slots.release()
+        self._submitters.submit(self._hand_off, task, future)
+
+    def _hand_off(self, task: dict, future: Future):
+        # A task fails if its skill raises or reports an error, or if
+        # `submit_work` raises; only the rest count as completed.
+        try:
+            result = future.result()
+            if isinstance(result, dict) and result.get("status") == "error":
+                raise RuntimeError(result.get("message") or "the skill reported an error")
+            self.submit_work(task, result)
+            succeeded = True
+        except Exception as e:
+            print(f"Task {task['task_id']} failed: {e}")
+            succeeded = False
+        with self._lock:
+            if succeeded:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._outstanding -= 1
+            if not self._outstanding:
+                self._idle.notify_all()
+
+    def join(self):
+        """Wait until every submitted task has finished and been handed off."""
+        with self._idle:
+            self._idle.wait_for(lambda: not self._outstanding)
+
+    def tasks_per_minute(self) -> float:
+        return self.completed * 60.0 / max(time.monotonic() - self._started, 1e-9)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+        self._submitters.shutdown(wait=wait)
@@ -1,76 +1,523 @@
+import asyncio
+import json
+import random
 import requests
+import sys
+import threading
 import uuid
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+
+import httpx
 
 # --- Configuration ---
 # This should be the address of your running marketplace API
 MARKETPLACE_URL = "http://127.0.0.1:8000"
 
+# Responses worth retrying: the server is overloaded or briefly unavailable.
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+# Of those, the ones sent before the request was acted on (rate limiting
+# and load shedding), which any request can safely be retried after. A
+# 502 or 504 comes from a proxy that may have passed the request on.
+UNPROCESSED_STATUS_CODES = {429, 503}
+# Transport errors raised before the request was sent.
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Deliverables larger than this (JSON-encoded) are uploaded to the blob
+# store and submitted by reference, as the server would store them anyway.
+INLINE_DELIVERABLE_LIMIT = 64 * 1024
+
+# Full re-reads of the board per sync when the change log keeps moving on
+# past the mirror; after that the last full read stands until the next sync.
+MAX_RESYNCS = 3
+
+# --- Task Board Mirror ---
+
+class TaskMirror:
+    """
+    Local copy of the task board, kept current by applying the deltas from
+    `GET /tasks/changes` instead of re-reading the whole board.
+    """
+
+    def __init__(self):
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.version: Optional[int] = None
+        self.epoch: Optional[str] = None
+
+    def reset(self, tasks: List[Dict[str, Any]], version: Optional[int], epoch: Optional[str]):
+        self.tasks = {task["task_id"]: task for task in tasks}
+        self.version = version
+        self.epoch = epoch
+
+    def apply(self, changes: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Apply one `GET /tasks/changes` response; returns the changed tasks."""
+        for task in changes["tasks"]:
+            self.tasks[task["task_id"]] = task
+        self.version = changes["version"]
+        self.epoch = changes["epoch"]
+        return changes["tasks"]
+
+    def select(self, status: str = None, capability: str = None, min_reward: float = None) -> List[Dict[str, Any]]:
+        """Mirrored tasks matching the filters, ordered like `GET /tasks/`."""
+        tasks = [
+            task for task in self.tasks.values()
+            if (status is None or task["status"] == status)
+            and (capability is None or capability in task["required_capabilities"])
+            and (min_reward is None or task["reward_amount"] >= min_reward)
+        ]
+        if min_reward is not None:
+            tasks.sort(key=lambda task: task["reward_amount"])
+        return tasks
+
+# --- Async Client ---
+
+class AsyncMarketplaceClient:
+    """
+    Asynchronous marketplace client over a pool of keep-alive connections.
+
+    Requests that fail with a transport error (connection refused, timeout,
+    reset) or a 429/502/503/504 response are retried with exponential
+    backoff and full jitter, honouring ``Retry-After`` when the server sends
+    it. Requests that are not idempotent, such as registering an agent or
+    submitting work, are only retried when they cannot have reached the
+    server: the connection was never made, or it answered 429 or 503.
+    Retrying a bid is safe: the bid carries its own ID and an agent holds
+    one live bid per task, so a repeat replaces rather than duplicates it.
+    Blobs are stored by digest, so a repeated upload is harmless as well.
+
+    Methods return the decoded JSON body and raise ``httpx.HTTPStatusError``
+    for error responses.
+    """
+
+    def __init__(
+        self,
+        base_url: str = MARKETPLACE_URL,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 64,
+        max_retries: int = 3,
+        backoff: float = 0.1,
+        max_backoff: float = 2.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.mirror = TaskMirror()
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "AsyncMarketplaceClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def request(self, method: str, path: str, idempotent: Optional[bool] = None, **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying transient failures; raise for error responses.
+        ``idempotent`` overrides what the method says about whether a
+        request that may have been processed can be sent again.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_status_codes = RETRY_STATUS_CODES if idempotent else UNPROCESSED_STATUS_CODES
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self._http.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries or not (idempotent or isinstance(e, UNSENT_ERRORS)):
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+                continue
+            if response.status_code in retry_status_codes and attempt < self.max_retries:
+                await asyncio.sleep(self._delay(attempt, response))
+                continue
+            response.raise_for_status()
+            return response
+
+    async def register_agent(self, capabilities: List[str]) -> Dict[str, Any]:
+        response = await self.request("POST", "/agents/", json={"capabilities": capabilities})
+        return response.json()
+
+    async def get_tasks(
+        self, status: str = None, capability: str = None, min_reward: float = None, page_size: int = 500
+    ) -> List[Dict[str, Any]]:
+        """All matching tasks, following the pagination cursor."""
+        params = {"limit": page_size}
+        for name, value in (("status", status), ("capability", capability), ("min_reward", min_reward)):
+            if value is not None:
+                params[name] = value
+        tasks, _ = await self._list_tasks(params)
+        return tasks
+
+    async def _list_tasks(self, params: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], httpx.Headers]:
+        """Every page of a listing, plus the headers of the first page."""
+        tasks, first_headers = [], None
+        while True:
+            response = await self.request("GET", "/tasks/", params=params)
+            first_headers = first_headers or response.headers
+            tasks.extend(response.json())
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if next_cursor is None:
+                return tasks, first_headers
+            params["cursor"] = next_cursor
+
+    async def sync_tasks(self, page_size: int = 500) -> List[Dict[str, Any]]:
+        """
+        Bring ``self.mirror`` up to date and return the tasks that changed
+        (every task after a full resynchronisation).
+
+        In the steady state this is a single small request returning only
+        the changes; the whole board is re-read only the first time and when
+        the server's change log no longer reaches back to the mirror (at
+        most ``MAX_RESYNCS`` times per call). A server without a change log
+        (no board version headers, or a 501 from `GET /tasks/changes`) is
+        re-read in full on every call.
+        """
+        changed: List[Dict[str, Any]] = []
+        for _ in range(MAX_RESYNCS):
+            if self.mirror.version is None:
+                tasks, headers = await self._list_tasks({"limit": page_size})
+                version, epoch = headers.get("X-Board-Version"), headers.get("X-Board-Epoch")
+                if version is None or epoch is None:
+                    self.mirror.reset(tasks, None, None)
+                    return tasks
+                self.mirror.reset(tasks, int(version), epoch)
+                changed = tasks
+            try:
+                # Also picks up whatever changed while a full read was under way.
+                return changed + await self._changes_since_mirror()
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 501:
+                    tasks, _ = await self._list_tasks({"limit": page_size})
+                    self.mirror.reset(tasks, None, None)
+                    return tasks
+                if e.response.status_code != 410:
+                    raise
+                self.mirror.version = None
+        return changed
+
+    async def _changes_since_mirror(self) -> List[Dict[str, Any]]:
+        changed = []
+        while True:
+            params = {"since": self.mirror.version, "epoch": self.mirror.epoch}
+            response = await self.request("GET", "/tasks/changes", params=params)
+            changes = response.json()
+            changed.extend(self.mirror.apply(changes))
+            if not changes["has_more"]:
+                return changed
+
+    async def get_task(self, task_id: uuid.UUID) -> Dict[str, Any]:
+        response = await self.request("GET", f"/tasks/{task_id}")
+        return response.json()
+
+    async def get_eligible_tasks(self, agent_id: uuid.UUID) -> List[Dict[str, Any]]:
+        response = await self.request("GET", f"/agents/{agent_id}/eligible_tasks")
+        return response.json()
+
+    async def submit_bid(self, task_id: uuid.UUID, agent_id: uuid.UUID, bid_amount: float) -> Dict[str, Any]:
+        bid_data = {
+            "bid_id": str(uuid.uuid4()),
+            "task_id": str(task_id),
+            "agent_id": str(agent_id),
+            "bid_amount": bid_amount,
+        }
+        response = await self.request("POST", "/bids/", idempotent=True, json=bid_data)
+        return response.json()
+
+    async def submit_bids(
+        self, agent_id: uuid.UUID, bids: Iterable[Tuple[uuid.UUID, float]], concurrency: int = 16
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Submit ``(task_id, bid_amount)`` bids concurrently, at most
+        ``concurrency`` in flight. Each result is the accepted bid or the
+        exception it failed with.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def submit(task_id, bid_amount):
+            async with semaphore:
+                return await self.submit_bid(task_id, agent_id, bid_amount)
+
+        return await asyncio.gather(*(submit(task_id, amount) for task_id, amount in bids), return_exceptions=True)
+
+    async def get_top_bids(self, task_id: uuid.UUID, top: int = 10) -> List[Dict[str, Any]]:
+        response = await self.request("GET", f"/tasks/{task_id}/bids", params={"top": top})
+        return response.json()
+
+    async def select_winner(self, task_id: uuid.UUID) -> Dict[str, Any]:
+        response = await self.request("POST", f"/tasks/{task_id}/select_winner/")
+        return response.json()
+
+    async def get_market_stats(self, capabilities: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        params = {"capabilities": capabilities} if capabilities else {}
+        response = await self.request("GET", "/market/stats", params=params)
+        return response.json()
+
+    async def upload_blob(self, content: bytes, media_type: str = "application/octet-stream") -> Dict[str, Any]:
+        """Stores `content` in the marketplace's blob store; returns its reference."""
+        response = await self.request(
+            "POST", "/blobs/", idempotent=True, content=content, headers={"Content-Type": media_type}
+        )
+        return response.json()
+
+    async def submit_work(self, task_id: uuid.UUID, agent_id: uuid.UUID, deliverable: Dict[str, Any]) -> Dict[str, Any]:
+        work_data = {
+            "work_id": str(uuid.uuid4()),
+            "task_id": str(task_id),
+            "agent_id": str(agent_id),
+        }
+        encoded = json.dumps(deliverable).encode()
+        if len(encoded) > INLINE_DELIVERABLE_LIMIT:
+            # Upload large deliverables on their own and submit a reference.
+            work_data["deliverable_blob"] = await self.upload_blob(encoded, "application/json")
+        else:
+            work_data["deliverable"] = deliverable
+        response = await self.request("POST", "/work_products/", json=work_data)
+        return response.json()
+
+    async def poll_events(
+        self, after: int, capabilities: Optional[List[str]] = None, timeout: float = 25.0
+    ) -> Dict[str, Any]:
+        params = {"after": after, "timeout": timeout}
+        if capabilities:
+            params["capabilities"] = capabilities
+        response = await self.request("GET", "/events/poll", params=params, timeout=timeout + 10)
+        return response.json()
+
+    async def get_event_position(self) -> int:
+        return (await self.poll_events(after=sys.maxsize, timeout=0))["last_event_id"]
+
+
+class MarketplaceClient:
+    """
+    Blocking facade over ``AsyncMarketplaceClient`` for synchronous callers.
+
+    The async client runs on a private event loop thread, so the connection
+    pool is shared by every call (and every thread) using this facade.
+    """
+
+    def __init__(self, **options):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="marketplace-client", daemon=True)
+        self._thread.start()
+        self._async = self._run(self._open(options))
+
+    @staticmethod
+    async def _open(options) -> AsyncMarketplaceClient:
+        return AsyncMarketplaceClient(**options)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self):
+        self._run(self._async.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def register_agent(self, capabilities: List[str]) -> Dict[str, Any]:
+        return self._run(self._async.register_agent(capabilities))
+
+    def get_tasks(self, status: str = None, capability: str = None, min_reward: float = None, page_size: int = 500):
+        return self._run(self._async.get_tasks(status, capability, min_reward, page_size))
+
+    def sync_tasks(self, page_size: int = 500) -> List[Dict[str, Any]]:
+        return self._run(self._async.sync_tasks(page_size))
+
+    @property
+    def mirror(self) -> TaskMirror:
+        return self._async.mirror
+
+    def get_task(self, task_id: uuid.UUID) -> Dict[str, Any]:
+        return self._run(self._async.get_task(task_id))
+
+    def get_eligible_tasks(self, agent_id: uuid.UUID) -> List[Dict[str, Any]]:
+        return self._run(self._async.get_eligible_tasks(agent_id))
+
+    def submit_bid(self, task_id: uuid.UUID, agent_id: uuid.UUID, bid_amount: float) -> Dict[str, Any]:
+        return self._run(self._async.submit_bid(task_id, agent_id, bid_amount))
+
+    def submit_bids(self, agent_id: uuid.UUID, bids: Iterable[Tuple[uuid.UUID, float]], concurrency: int = 16):
+        return self._run(self._async.submit_bids(agent_id, list(bids), concurrency))
+
+    def get_top_bids(self, task_id: uuid.UUID, top: int = 10) -> List[Dict[str, Any]]:
+        return self._run(self._async.get_top_bids(task_id, top))
+
+    def select_winner(self, task_id: uuid.UUID) -> Dict[str, Any]:
+        return self._run(self._async.select_winner(task_id))
+
+    def get_market_stats(self, capabilities: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        return self._run(self._async.get_market_stats(capabilities))
+
+    def upload_blob(self, content: bytes, media_type: str = "application/octet-stream") -> Dict[str, Any]:
+        return self._run(self._async.upload_blob(content, media_type))
+
+    def submit_work(self, task_id: uuid.UUID, agent_id: uuid.UUID, deliverable: Dict[str, Any]) -> Dict[str, Any]:
+        return self._run(self._async.submit_work(task_id, agent_id, deliverable))
+
+    def poll_events(self, after: int, capabilities: Optional[List[str]] = None, timeout: float = 25.0):
+        return self._run(self._async.poll_events(after, capabilities, timeout))
+
+    def get_event_position(self) -> int:
+        return self._run(self._async.get_event_position())
+
+
+_client: Optional[MarketplaceClient] = None
+_client_lock = threading.Lock()
+
+def default_client() -> MarketplaceClient:
+    """The shared client behind the module-level functions below."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MarketplaceClient(base_url=MARKETPLACE_URL)
+        return _client
+
 # --- API Client Functions ---
 
 def register_agent(capabilities: List[str]) -> Dict[str, Any]:
     """Registers a new agent with the marketplace."""
-    agent_data = {
-        "capabilities": capabilities,
-        "reputation_score": 0.0,
-        "completed_tasks": 0,
-        "success_rate": 0.0
-    }
     try:
-        response = requests.post(f"{MARKETPLACE_URL}/agents/", json=agent_data)
-        response.raise_for_status()  # Raise an exception for bad status codes
+        agent = default_client().register_agent(capabilities)
         print("Agent registered successfully!")
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return agent
+    except httpx.HTTPError as e:
         print(f"Error registering agent: {e}")
         return None
 
-def get_tasks() -> List[Dict[str, Any]]:
-    """Fetches all tasks from the marketplace."""
+def get_tasks(status: str = None, capability: str = None, min_reward: float = None, page_size: int = 500) -> List[Dict[str, Any]]:
+    """Fetches tasks from the marketplace, answered from a local mirror of the board."""
+    client = default_client()
     try:
-        response = requests.get(f"{MARKETPLACE_URL}/tasks/")
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        client.sync_tasks(page_size)
+    except httpx.HTTPError as e:
         print(f"Error fetching tasks: {e}")
+    return client.mirror.select(status, capability, min_reward)
+
+def sync_tasks() -> List[Dict[str, Any]]:
+    """Updates the local mirror of the board; returns the tasks that changed since the last call."""
+    try:
+        return default_client().sync_tasks()
+    except httpx.HTTPError as e:
+        print(f"Error syncing tasks: {e}")
         return []
 
+def get_eligible_tasks(agent_id: uuid.UUID) -> List[Dict[str, Any]]:
+    """Fetches the open tasks the agent is qualified for."""
+    try:
+        return default_client().get_eligible_tasks(agent_id)
+    except httpx.HTTPError as e:
+        print(f"Error fetching eligible tasks: {e}")
+        return []
+
+def get_event_position() -> int:
+    """Returns the ID of the newest event, to follow the feed from 'now'."""
+    return default_client().get_event_position()
+
+def poll_events(after: int, capabilities: Optional[List[str]] = None, timeout: float = 25.0) -> Dict[str, Any]:
+    """Long-polls for task events newer than `after`; returns as soon as any arrive."""
+    return default_client().poll_events(after, capabilities, timeout)
+
+def stream_events(capabilities: Optional[List[str]] = None, last_event_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Follows the Server-Sent Events feed, yielding events as they are published."""
+    params = {"capabilities": capabilities} if capabilities else {}
+    headers = {"Accept": "text/event-stream"}
+    if last_event_id is not None:
+        headers["Last-Event-ID"] = str(last_event_id)
+    with requests.get(f"{MARKETPLACE_URL}/events/stream", params=params, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        event = {}
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                if "data" in event:
+                    yield {"id": event.get("id"), "type": event.get("event"), "task": json.loads(event["data"])}
+                event = {}
+            elif not line.startswith(":"):
+                field, _, value = line.partition(":")
+                event[field] = value.lstrip(" ")
+                if field == "id":
+                    event["id"] = int(event["id"])
+
 def get_task(task_id: uuid.UUID) -> Dict[str, Any]:
     """Fetches a single task by its ID."""
     try:
-        response = requests.get(f"{MARKETPLACE_URL}/tasks/{task_id}")
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return default_client().get_task(task_id)
+    except httpx.HTTPError as e:
         print(f"Error fetching task {task_id}: {e}")
         return None
 
+def _report_bid_error(task_id: uuid.UUID, e: Exception):
+    # The marketplace might return a 4xx error if the bid is invalid, which is expected
+    if isinstance(e, httpx.HTTPStatusError) and 400 <= e.response.status_code < 500:
+        print(f"Could not submit bid for task {task_id}: {e.response.json().get('detail')}")
+    else:
+        print(f"Error submitting bid for task {task_id}: {e}")
+
 def submit_bid(task_id: uuid.UUID, agent_id: uuid.UUID, bid_amount: float) -> Dict[str, Any]:
     """Submits a bid for a specific task."""
-    bid_data = {
-        "task_id": str(task_id),
-        "agent_id": str(agent_id),
-        "bid_amount": bid_amount,
-    }
     try:
-        response = requests.post(f"{MARKETPLACE_URL}/bids/", json=bid_data)
-        response.raise_for_status()
+        bid = default_client().submit_bid(task_id, agent_id, bid_amount)
         print(f"Successfully submitted bid for task {task_id} with amount {bid_amount}")
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        # The marketplace might return a 4xx error if the bid is invalid, which is expected
-        if e.response is not None and e.response.status_code >= 400 and e.response.status_code < 500:
-             print(f"Could not submit bid for task {task_id}: {e.response.json().get('detail')}")
-        else:
-            print(f"Error submitting bid for task {task_id}: {e}")
+        return bid
+    except httpx.HTTPError as e:
+        _report_bid_error(task_id, e)
         return None
 
+def submit_bids(agent_id: uuid.UUID, bids: List[Tuple[uuid.UUID, float]]) -> List[Optional[Dict[str, Any]]]:
+    """Submits `(task_id, bid_amount)` bids concurrently; `None` marks a bid that failed."""
+    results = default_client().submit_bids(agent_id, bids)
+    for (task_id, _), result in zip(bids, results):
+        if isinstance(result, Exception):
+            _report_bid_error(task_id, result)
+    print(f"Submitted {sum(not isinstance(result, Exception) for result in results)} of {len(bids)} bids")
+    return [None if isinstance(result, Exception) else result for result in results]
+
 def select_winner(task_id: uuid.UUID) -> Dict[str, Any]:
     """Selects the winning bid for a task."""
     try:
-        response = requests.post(f"{MARKETPLACE_URL}/tasks/{str(task_id)}/select_winner/")
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return default_client().select_winner(task_id)
+    except httpx.HTTPError as e:
         print(f"Error selecting winner for task {task_id}: {e}")
         return None
+
+def get_market_stats(capabilities: List[str]) -> Optional[Dict[str, Any]]:
+    """Recent prices for tasks requiring exactly `capabilities`; `None` if there are none yet."""
+    try:
+        stats = default_client().get_market_stats(capabilities)
+    except httpx.HTTPError as e:
+        print(f"Error fetching market stats: {e}")
+        return None
+    wanted = sorted(set(capabilities))
+    return next((entry for entry in stats if entry['capabilities'] == wanted), None)
+
+def get_winning_bid(task_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+    """The bid a task was awarded to; `None` until it is assigned."""
+    task = get_task(task_id)
+    return task.get('winning_bid') if task else None
+
+def submit_work(task_id: uuid.UUID, agent_id: uuid.UUID, deliverable: Dict[str, Any]) -> Dict[str, Any]:
+    """Submits the work product for a task the agent has won."""
+    try:
+        work_product = default_client().submit_work(task_id, agent_id, deliverable)
+        print(f"Submitted work for task {task_id}")
+        return work_product
+    except httpx.HTTPError as e:
+        print(f"Error submitting work for task {task_id}: {e}")
+        return None
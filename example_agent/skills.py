@@ -1,28 +1,37 @@
-import pandas as pd
+import csv
 import io
+import os
+from typing import Iterable, Union
+
+# Skills run in the skill executor's worker processes (see executor.py).
+# Heavy libraries such as pandas are imported inside the skill that needs
+# them, so importing this module, and starting the agent, stays cheap.
 
 def analyze_sales_data(data: str) -> dict:
     """
     A simple skill that takes a string of CSV data, analyzes it,
     and returns a dictionary with some basic metrics.
-    
+
     In a real scenario, this skill would be much more complex.
     """
     print("Executing 'analyze_sales_data' skill...")
     try:
+        import pandas as pd
+
         # Read the string data into a pandas DataFrame
         string_io = io.StringIO(data)
         df = pd.read_csv(string_io)
-        
+
         # Perform some basic analysis
         total_sales = df['SaleAmount'].sum()
         average_sale = df['SaleAmount'].mean()
         number_of_sales = len(df)
-        
+
         result = {
             "status": "success",
             "total_sales": float(total_sales),
-            "average_sale": float(average_sale),
+            # None rather than NaN, which JSON cannot carry, when no sale has an amount.
+            "average_sale": None if pd.isna(average_sale) else float(average_sale),
             "number_of_sales": int(number_of_sales)
         }
         print("Skill execution completed successfully.")
@@ -32,6 +41,109 @@ def analyze_sales_data(data: str) -> dict:
         print(f"Error during skill execution: {e}")
         return {"status": "error", "message": str(e)}
 
+def summarize_csv(data: str) -> dict:
+    """
+    Row count and, for every numeric column, its sum, minimum and maximum,
+    using only the standard library.
+    """
+    try:
+        reader = csv.DictReader(io.StringIO(data))
+        rows = 0
+        columns = {}
+        for row in reader:
+            rows += 1
+            for name, value in row.items():
+                try:
+                    number = float(value)
+                except (TypeError, ValueError):
+                    continue
+                stats = columns.get(name)
+                if stats is None:
+                    columns[name] = {"sum": number, "min": number, "max": number}
+                else:
+                    stats["sum"] += number
+                    stats["min"] = min(stats["min"], number)
+                    stats["max"] = max(stats["max"], number)
+        return {"status": "success", "rows": rows, "columns": columns}
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+# Rows parsed at a time by the streaming skill; this bounds its memory use.
+SALES_CHUNK_ROWS = 100_000
+
+class _ChunkStream(io.RawIOBase):
+    """A readable binary file over an iterable of byte chunks."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+def analyze_sales_data_stream(
+    source: Union[str, os.PathLike, Iterable[bytes]],
+    chunk_rows: int = SALES_CHUNK_ROWS,
+    memory_map: bool = False,
+) -> dict:
+    """
+    `analyze_sales_data` for inputs too large to hold in memory.
+
+    `source` is a path to a CSV file (read through a memory map with
+    `memory_map`), a binary file-like object, or an iterable of byte chunks
+    such as a streamed download. Only the `SaleAmount` column is parsed,
+    `chunk_rows` rows at a time, and the totals are combined as the chunks
+    go by, so memory use does not grow with the size of the input. (With
+    `memory_map` the mapped pages count towards RSS, but they belong to
+    the page cache and are dropped under memory pressure.)
+    """
+    try:
+        import pandas as pd
+
+        if isinstance(source, (str, os.PathLike)) or hasattr(source, "read"):
+            handle = source
+        else:
+            handle = io.BufferedReader(_ChunkStream(source), buffer_size=1 << 20)
+        chunks = pd.read_csv(
+            handle,
+            usecols=["SaleAmount"],
+            dtype={"SaleAmount": "float64"},
+            chunksize=chunk_rows,
+            memory_map=memory_map,
+        )
+        total_sales = 0.0
+        priced_sales = 0
+        number_of_sales = 0
+        with chunks:
+            for chunk in chunks:
+                amounts = chunk["SaleAmount"]
+                total_sales += float(amounts.sum())
+                priced_sales += int(amounts.count())
+                number_of_sales += len(amounts)
+        return {
+            "status": "success",
+            "total_sales": total_sales,
+            # Like DataFrame.mean(), over the rows that have an amount.
+            "average_sale": total_sales / priced_sales if priced_sales else None,
+            "number_of_sales": number_of_sales,
+        }
+
+    except Exception as e:
+        print(f"Error during skill execution: {e}")
+        return {"status": "error", "message": str(e)}
+
 # --- You can add more skills below ---
 
 def another_skill():
@@ -0,0 +1,119 @@
+import httpx
+import pytest
+from app.main import app
+from example_agent.marketplace_client import AsyncMarketplaceClient
+
+
+@pytest.mark.asyncio
+async def test_async_client_bids_concurrently():
+    async with AsyncMarketplaceClient(base_url="http://marketplace", transport=httpx.ASGITransport(app=app)) as client:
+        agent = await client.register_agent(["geo"])
+        tasks = [
+            (await client.request("POST", "/tasks/", json={
+                "title": f"t{i}", "description": "", "required_capabilities": ["geo"], "reward_amount": 10.0,
+            })).json()
+            for i in range(5)
+        ]
+        results = await client.submit_bids(
+            agent["agent_id"], [(task["task_id"], 9.0) for task in tasks] + [("00000000-0000-0000-0000-000000000000", 1.0)]
+        )
+        assert [result["task_id"] for result in results[:-1]] == [task["task_id"] for task in tasks]
+        assert isinstance(results[-1], httpx.HTTPStatusError) and results[-1].response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_async_client_retries_transient_failures():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("connection refused")
+        if len(attempts) == 2:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        return httpx.Response(200, json={"task_id": "t"})
+
+    async with AsyncMarketplaceClient(base_url="http://marketplace", transport=httpx.MockTransport(handler), backoff=0.001) as client:
+        assert await client.get_task("t") == {"task_id": "t"}
+        assert len(attempts) == 3
+
+        # Give up once the retries are used up.
+        attempts.clear()
+        client.max_retries = 1
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.get_task("t")
+        assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_client_retries_registration_only_when_unsent():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("connection refused")
+        if len(attempts) == 2:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        if len(attempts) == 3:
+            # The server may have registered the agent before the connection dropped.
+            raise httpx.ReadError("connection reset")
+        return httpx.Response(201, json={"agent_id": "a"})
+
+    async with AsyncMarketplaceClient(base_url="http://marketplace", transport=httpx.MockTransport(handler), backoff=0.001) as client:
+        with pytest.raises(httpx.ReadError):
+            await client.register_agent(["geo"])
+        assert len(attempts) == 3
+
+
+@pytest.mark.asyncio
+async def test_task_mirror_applies_deltas():
+    async with AsyncMarketplaceClient(base_url="http://marketplace", transport=httpx.ASGITransport(app=app)) as client:
+        await client.sync_tasks()
+        board_size = len(client.mirror.tasks)
+
+        task = (await client.request("POST", "/tasks/", json={
+            "title": "Mirrored", "description": "", "required_capabilities": ["mirror"], "reward_amount": 3.0,
+        })).json()
+        assert [changed["task_id"] for changed in await client.sync_tasks()] == [task["task_id"]]
+        assert await client.sync_tasks() == []
+        assert len(client.mirror.tasks) == board_size + 1
+        assert [t["task_id"] for t in client.mirror.select(capability="mirror", status="POSTED")] == [task["task_id"]]
+
+        # A mirror from an earlier server run is rebuilt from scratch.
+        client.mirror.epoch = "previous-run"
+        assert len(await client.sync_tasks()) == board_size + 1
+
+
+@pytest.mark.asyncio
+async def test_task_mirror_falls_back_to_full_reads():
+    from example_agent.marketplace_client import MAX_RESYNCS
+
+    board = [{"task_id": "t", "status": "POSTED", "required_capabilities": [], "reward_amount": 1.0}]
+    server = {"headers": {}, "changes": 501}
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        if request.url.path == "/tasks/":
+            return httpx.Response(200, json=board, headers=server["headers"])
+        return httpx.Response(server["changes"])
+
+    async with AsyncMarketplaceClient(base_url="http://marketplace", transport=httpx.MockTransport(handler)) as client:
+        # Without board version headers (as from an older sharded server), every sync is a full read.
+        assert await client.sync_tasks() == board
+        assert await client.sync_tasks() == board
+        assert requests == ["/tasks/", "/tasks/"]
+
+        # With the headers but no change log behind them, likewise.
+        server["headers"] = {"X-Board-Version": "1", "X-Board-Epoch": "e"}
+        requests.clear()
+        assert await client.sync_tasks() == board
+        assert requests == ["/tasks/", "/tasks/changes", "/tasks/"]
+
+        # A change log that never reaches back far enough is given up on after a few full reads.
+        server["changes"] = 410
+        requests.clear()
+        assert await client.sync_tasks() == board
+        assert requests.count("/tasks/") == MAX_RESYNCS
+        assert client.mirror.tasks == {"t": board[0]}
@@ -0,0 +1,125 @@
+import threading
+import pytest
+from app.models import Agent, Task, Bid, WorkProduct, TaskStatus
+from app.components import TaskBoard, AgentRegistry, BiddingSystem, WorkVerificationService, InvalidTransition, NotAssigned
+from app.indexes import CapabilityIndex, TaskIndex, ReputationIndex
+from app.repository import InMemoryRepository
+
+
+@pytest.fixture
+def repository():
+    return InMemoryRepository(
+        {"tasks": {}, "agents": {}, "bids": {}, "work_products": {}},
+        {"capabilities": CapabilityIndex(), "tasks": TaskIndex(), "reputation": ReputationIndex()},
+    )
+
+
+def run_threads(count, target):
+    """Run ``target(index)`` on ``count`` threads at once; fails with the first error any of them raised."""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def worker(index):
+        barrier.wait()
+        try:
+            target(index)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def test_bids_race_with_winner_selection(repository):
+    """No bid is accepted after assignment and exactly one selector wins."""
+    tasks = TaskBoard(repository).post_tasks([
+        Task(title=f"t{i}", description="", required_capabilities=[], reward_amount=100.0) for i in range(20)
+    ])
+    agents = AgentRegistry(repository).register_agents([Agent(capabilities=[]) for _ in range(16)])
+    bidding_system = BiddingSystem(repository)
+    accepted, winners = [], []
+    record = threading.Lock()
+
+    def bid_and_select(index):
+        for round_number in range(20):
+            task = tasks[round_number]
+            if index % 4 == 0:
+                winner = bidding_system.select_winner(task.task_id)
+                if winner:
+                    with record:
+                        winners.append((task.task_id, winner))
+                continue
+            bid = Bid(task_id=task.task_id, agent_id=agents[index].agent_id, bid_amount=float(index + round_number))
+            try:
+                bidding_system.submit_bid(bid)
+            except ValueError as e:
+                assert str(e) == "Task is not open for bidding"
+                continue
+            with record:
+                accepted.append(bid)
+
+    run_threads(16, bid_and_select)
+
+    winner_by_task = dict(winners)
+    assert len(winner_by_task) == len(winners)
+    for task in tasks:
+        live = repository.top_bids(task.task_id, 100)
+        assert sorted(bid.bid_id for bid in live) == sorted(bid.bid_id for bid in accepted if bid.task_id == task.task_id)
+        if task.task_id in winner_by_task:
+            assert task.status == TaskStatus.ASSIGNED
+            # The winner is the best of every bid that got in before assignment.
+            assert winner_by_task[task.task_id] == live[0]
+        else:
+            assert task.status in (TaskStatus.POSTED, TaskStatus.BIDDING_OPEN)
+
+
+def test_status_transitions_follow_lifecycle(repository):
+    task = TaskBoard(repository).post_task(Task(title="t", description="", required_capabilities=[], reward_amount=1.0))
+    agent = AgentRegistry(repository).register_agent(Agent(capabilities=[]))
+    work_verification_service = WorkVerificationService(repository)
+
+    with pytest.raises(InvalidTransition):
+        work_verification_service.submit_work(WorkProduct(task_id=task.task_id, agent_id=agent.agent_id, deliverable={}))
+    assert task.status == TaskStatus.POSTED
+    assert repository.all_work_products() == []
+
+    BiddingSystem(repository).submit_bid(Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=1.0))
+    BiddingSystem(repository).select_winner(task.task_id)
+    assert BiddingSystem(repository).select_winner(task.task_id) is None
+
+    # Only the winner may submit work for the task.
+    other = AgentRegistry(repository).register_agent(Agent(capabilities=[]))
+    with pytest.raises(NotAssigned):
+        work_verification_service.submit_work(WorkProduct(task_id=task.task_id, agent_id=other.agent_id, deliverable={}))
+    assert task.status == TaskStatus.ASSIGNED
+    assert repository.all_work_products() == []
+
+    work = work_verification_service.submit_work(WorkProduct(task_id=task.task_id, agent_id=agent.agent_id, deliverable={}))
+    work_verification_service.verify_work(work.work_id, 90.0)
+    with pytest.raises(InvalidTransition):
+        work_verification_service.verify_work(work.work_id, 10.0)
+    assert task.status == TaskStatus.VERIFIED
+
+
+def test_concurrent_verification_applies_once(repository):
+    task = TaskBoard(repository).post_task(Task(title="t", description="", required_capabilities=[], reward_amount=1.0))
+    agent = AgentRegistry(repository).register_agent(Agent(capabilities=[]))
+    BiddingSystem(repository).submit_bid(Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=1.0))
+    BiddingSystem(repository).select_winner(task.task_id)
+    work = WorkVerificationService(repository).submit_work(WorkProduct(task_id=task.task_id, agent_id=agent.agent_id, deliverable={}))
+    outcomes = []
+
+    def verify(index):
+        try:
+            WorkVerificationService(repository).verify_work(work.work_id, 90.0 if index % 2 else 10.0)
+            outcomes.append("ok")
+        except InvalidTransition:
+            outcomes.append("rejected")
+
+    run_threads(8, verify)
+    assert outcomes.count("ok") == 1
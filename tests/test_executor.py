@@ -0,0 +1,62 @@
+import threading
+from example_agent.executor import SkillExecutor, SkillRegistry
+
+
+def test_skill_executor_runs_skills_and_submits_work():
+    submitted = []
+    executor = SkillExecutor(
+        lambda task, deliverable: submitted.append((task["task_id"], deliverable)),
+        registry=SkillRegistry({"json": "json:loads"}),
+        max_workers=1,
+        max_pending=2,
+    )
+    try:
+        tasks = [{"task_id": str(i), "required_capabilities": ["json"], "description": f'{{"n": {i}}}'} for i in range(4)]
+        assert executor.submit({"task_id": "x", "required_capabilities": ["geo"], "description": ""}) is None
+        for task in tasks:
+            executor.submit(task)
+        executor.join()
+    finally:
+        executor.shutdown()
+    assert sorted(submitted) == [(str(i), {"n": i}) for i in range(4)]
+    assert (executor.completed, executor.failed) == (4, 0)
+
+
+def test_slow_submissions_do_not_hold_skill_slots():
+    release = threading.Event()
+    submitted = []
+
+    def submit_work(task, deliverable):
+        release.wait(10)
+        submitted.append(task["task_id"])
+
+    executor = SkillExecutor(submit_work, registry=SkillRegistry({"json": "json:loads"}), max_workers=1, max_pending=1)
+    try:
+        tasks = [{"task_id": str(i), "required_capabilities": ["json"], "description": "{}"} for i in range(3)]
+        # Each task gets the only slot once the previous skill is done, though its submission is still blocked.
+        assert all(executor.submit(task, timeout=10) is not None for task in tasks)
+        release.set()
+        executor.join()
+    finally:
+        executor.shutdown()
+    assert sorted(submitted) == ["0", "1", "2"]
+
+
+def test_failed_skills_and_submissions_are_not_counted_as_completed():
+    submitted = []
+
+    def submit_work(task, deliverable):
+        if task["task_id"] == "rejected":
+            raise RuntimeError("the marketplace did not accept the work")
+        submitted.append(task["task_id"])
+
+    executor = SkillExecutor(submit_work, registry=SkillRegistry({"json": "json:loads"}), max_workers=1, max_pending=3)
+    try:
+        descriptions = {"ok": "{}", "error": '{"status": "error", "message": "bad input"}', "rejected": "{}"}
+        for task_id, description in descriptions.items():
+            executor.submit({"task_id": task_id, "required_capabilities": ["json"], "description": description})
+        executor.join()
+    finally:
+        executor.shutdown()
+    assert submitted == ["ok"]
+    assert (executor.completed, executor.failed) == (1, 2)
@@ -1,14 +1,17 @@
+import time
 from uuid import uuid4
 import pytest
 from app.models import Agent, Task, Bid, WorkProduct, TaskStatus
 from app.components import (
     TaskBoard,
+    AgentRegistry,
     QualificationEngine,
     BiddingSystem,
     WorkVerificationService,
     ReputationLedger,
+    REPUTATION_HALF_LIFE,
 )
-from app.database import db
+from app.database import db, indexes
 
 @pytest.fixture(autouse=True)
 def clear_db():
@@ -17,6 +20,8 @@ def clear_db():
     db["agents"].clear()
     db["bids"].clear()
     db["work_products"].clear()
+    for index in indexes.values():
+        index.clear()
 
 def test_full_marketplace_flow():
     """
@@ -101,10 +106,307 @@ def test_full_marketplace_flow():
     reputation_ledger.record_success(agent1.agent_id, 95.0)
     
     assert agent1.completed_tasks == initial_completed_tasks + 1
-    # The new reputation score will be (initial_reputation + 95.0) / (initial_completed_tasks + 1)
-    # However, the current implementation is (reputation_score + score) / completed_tasks
-    # which is not correct. Let's stick to the current implementation for now.
-    assert agent1.reputation_score > initial_reputation
+    # The reputation score is the mean of the verification scores so far.
+    assert agent1.reputation_score == 95.0 > initial_reputation
 
 
 
+
+def test_capability_index_tracks_open_tasks():
+    """Eligible tasks come from the capability index and drop out once assigned."""
+    task_board = TaskBoard()
+    qualification_engine = QualificationEngine()
+    agent = Agent(capabilities=["python", "csv", "data_analysis"])
+    db["agents"][agent.agent_id] = agent
+
+    matching = task_board.post_task(Task(title="a", description="", required_capabilities=["python", "csv"], reward_amount=10.0))
+    unrestricted = task_board.post_task(Task(title="b", description="", required_capabilities=[], reward_amount=10.0))
+    task_board.post_task(Task(title="c", description="", required_capabilities=["python", "rust"], reward_amount=10.0))
+
+    eligible = {task.task_id for task in qualification_engine.get_eligible_tasks(agent)}
+    assert eligible == {matching.task_id, unrestricted.task_id}
+
+    bidding_system = BiddingSystem()
+    bidding_system.submit_bid(Bid(task_id=matching.task_id, agent_id=agent.agent_id, bid_amount=5.0))
+    assert matching.task_id in {task.task_id for task in qualification_engine.get_eligible_tasks(agent)}
+
+    bidding_system.select_winner(matching.task_id)
+    assert [task.task_id for task in qualification_engine.get_eligible_tasks(agent)] == [unrestricted.task_id]
+
+def test_task_listing_pages_through_secondary_indexes():
+    """Listing follows the cursor and serves filters from the ordered indexes."""
+    task_board = TaskBoard()
+    tasks = [
+        task_board.post_task(Task(title=f"t{i}", description="", required_capabilities=["python"] if i % 2 else ["sql"], reward_amount=float(i)))
+        for i in range(10)
+    ]
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = task_board.list_tasks(cursor=cursor, limit=3)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert seen == tasks
+
+    page, cursor = task_board.list_tasks(capability="python", limit=10)
+    assert page == tasks[1::2] and cursor is None
+
+    page, cursor = task_board.list_tasks(min_reward=6.5, limit=2)
+    assert page == tasks[7:9]
+    page, cursor = task_board.list_tasks(min_reward=6.5, cursor=cursor, limit=2)
+    assert page == tasks[9:] and cursor is None
+
+    agent = Agent(capabilities=["python", "sql"])
+    db["agents"][agent.agent_id] = agent
+    BiddingSystem().submit_bid(Bid(task_id=tasks[4].task_id, agent_id=agent.agent_id, bid_amount=1.0))
+    page, _ = task_board.list_tasks(status=TaskStatus.BIDDING_OPEN)
+    assert page == [tasks[4]]
+    page, _ = task_board.list_tasks(status=TaskStatus.POSTED, capability="sql")
+    assert page == [tasks[0], tasks[2], tasks[6], tasks[8]]
+    page, _ = task_board.list_tasks(status=TaskStatus.BIDDING_OPEN, capability="sql")
+    assert page == [tasks[4]]
+
+def test_bid_book_replacement_withdrawal_and_top_k():
+    """The order book keeps one live bid per agent and serves the best bids cheaply."""
+    task = TaskBoard().post_task(Task(title="t", description="", required_capabilities=[], reward_amount=100.0))
+    agents = [Agent(capabilities=[]) for _ in range(4)]
+    for agent in agents:
+        db["agents"][agent.agent_id] = agent
+
+    bidding_system = BiddingSystem()
+    bids = [
+        bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=amount))
+        for agent, amount in zip(agents, [50.0, 40.0, 60.0, 40.0])
+    ]
+    # Ties go to the earlier bid.
+    assert bidding_system.get_top_bids(task.task_id, 2) == [bids[1], bids[3]]
+
+    # Re-bidding replaces the agent's previous bid instead of piling up.
+    cheaper = bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=agents[2].agent_id, bid_amount=30.0))
+    assert len(db["bids"][task.task_id]) == 4
+    assert bids[2] not in db["bids"][task.task_id]
+    assert bidding_system.get_top_bids(task.task_id, 1) == [cheaper]
+
+    assert bidding_system.withdraw_bid(task.task_id, cheaper.bid_id) == cheaper
+    assert bidding_system.withdraw_bid(task.task_id, cheaper.bid_id) is None
+
+    assert bidding_system.select_winner(task.task_id) == bids[1]
+    with pytest.raises(ValueError):
+        bidding_system.withdraw_bid(task.task_id, bids[0].bid_id)
+
+def test_reputation_statistics_and_leaderboard():
+    """Outcomes update running statistics in O(1) and re-rank the agent."""
+    agents = [Agent(capabilities=["sql"] if i % 2 else ["python"]) for i in range(4)]
+    for agent in agents:
+        AgentRegistry().register_agent(agent)
+    ledger = ReputationLedger()
+
+    ledger.record_outcome(agents[1].agent_id, 90.0, passed=True, now=0.0)
+    ledger.record_outcome(agents[1].agent_id, 60.0, passed=False, now=REPUTATION_HALF_LIFE)
+    agent = db["agents"][agents[1].agent_id]
+    assert (agent.completed_tasks, agent.failed_tasks, agent.success_rate) == (1, 1, 0.5)
+    assert agent.reputation_score == 75.0 and agent.score_variance == 225.0
+    # The older score has decayed to half weight.
+    assert agent.recent_score == pytest.approx((90.0 * 0.5 + 60.0) / 1.5)
+
+    ledger.record_success(agents[3].agent_id, 80.0)
+    ledger.record_success(agents[0].agent_id, 70.0)
+    assert [agent.agent_id for agent in ledger.leaderboard(k=3)] == [agents[3].agent_id, agents[1].agent_id, agents[0].agent_id]
+    assert [agent.agent_id for agent in ledger.leaderboard("sql")] == [agents[3].agent_id, agents[1].agent_id]
+    assert ledger.rank(agents[1].agent_id) == 2
+    assert ledger.rank(agents[1].agent_id, "sql") == 2
+    assert ledger.rank(agents[1].agent_id, "python") is None
+
+
+def test_task_payload_cache_reencodes_on_status_change():
+    from app.encoding import TaskPayloadCache
+
+    cache = TaskPayloadCache()
+    task = Task(title="Cached", description="", required_capabilities=["python"], reward_amount=5.0)
+    first = cache.encode(task)
+    assert first == task.model_dump_json().encode()
+    assert cache.encode(task) is first
+
+    task.status = TaskStatus.ASSIGNED
+    assert cache.encode(task) == task.model_dump_json().encode()
+    assert cache.encode_list([task, task]) == b"[" + cache.encode(task) + b"," + cache.encode(task) + b"]"
+
+def test_auction_scheduler_closes_auctions_at_their_deadline():
+    from app.auctions import AuctionScheduler
+
+    task_board = TaskBoard()
+    agent_registry = AgentRegistry()
+    bidding_system = BiddingSystem()
+    agent = agent_registry.register_agent(Agent(capabilities=["python"]))
+    now = 1_000.0
+    scheduler = AuctionScheduler(bidding_system.close_auction, clock=lambda: now, batch_size=2)
+
+    tasks = [
+        task_board.post_task(Task(title=f"t{i}", description="", required_capabilities=["python"], reward_amount=10.0))
+        for i in range(4)
+    ]
+    for i, task in enumerate(tasks[:3]):
+        bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=5.0))
+        scheduler.schedule(task.task_id, now + 10 * (i + 1))
+    scheduler.schedule(tasks[3].task_id, now + 5)  # no bids
+    scheduler.schedule(tasks[2].task_id, now + 100)  # rescheduled later
+    assert scheduler.pending() == 4
+    assert scheduler.next_deadline() == now + 5
+
+    assert scheduler.run_due(now + 20) == 2
+    statuses = [task_board.get_task(task.task_id).status for task in tasks]
+    assert statuses == [TaskStatus.ASSIGNED, TaskStatus.ASSIGNED, TaskStatus.BIDDING_OPEN, TaskStatus.EXPIRED]
+    # An expired auction is no longer on offer.
+    posted, _ = task_board.list_tasks(status=TaskStatus.POSTED)
+    assert tasks[3].task_id not in {task.task_id for task in posted}
+    eligible = QualificationEngine().get_eligible_tasks(agent)
+    assert tasks[3].task_id not in {task.task_id for task in eligible}
+    assert scheduler.pending() == 1 and scheduler.next_deadline() == now + 100
+
+    scheduler.cancel(tasks[2].task_id)
+    assert scheduler.run_due(now + 1_000) == 0
+    assert task_board.get_task(tasks[2].task_id).status == TaskStatus.BIDDING_OPEN
+
+def test_bids_after_the_deadline_are_rejected():
+    task_board = TaskBoard()
+    agent = AgentRegistry().register_agent(Agent(capabilities=[]))
+    task = task_board.post_task(
+        Task(title="late", description="", required_capabilities=[], reward_amount=1.0, bidding_deadline=time.time() - 1)
+    )
+    with pytest.raises(ValueError, match="deadline"):
+        BiddingSystem().submit_bid(Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=1.0))
+
+def test_solve_assignment_respects_capacities_at_lowest_total_cost():
+    from app.clearing import solve_assignment
+
+    # "a" is cheapest for everything but can take two tasks; task 2 loses least by going to "b".
+    options = [[("a", 1.0), ("b", 9.0)], [("a", 2.0), ("b", 9.0)], [("a", 3.0), ("b", 4.0)], [("b", 5.0)]]
+    assert solve_assignment(options, {"a": 2, "b": 2}, unassigned_cost=100.0) == ["a", "a", "b", "b"]
+    # With room for one task only at "b", the costliest-to-move task is left out.
+    assert solve_assignment(options, {"a": 2, "b": 1}, unassigned_cost=100.0) == ["a", "a", "b", None]
+
+def test_market_clearing_weighs_reputation_and_capacity():
+    from app.clearing import MarketClearer
+
+    task_board = TaskBoard()
+    agent_registry = AgentRegistry()
+    bidding_system = BiddingSystem()
+    cheap, proven, other = agent_registry.register_agents([Agent(capabilities=[]) for _ in range(3)])
+    for _ in range(3):
+        ReputationLedger().record_success(proven.agent_id, 100.0)
+    tasks = [task_board.post_task(Task(title=f"t{i}", description="", required_capabilities=[], reward_amount=50.0)) for i in range(3)]
+    for task in tasks:
+        # A proven agent beats a slightly cheaper unproven one.
+        bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=cheap.agent_id, bid_amount=10.0))
+        bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=proven.agent_id, bid_amount=12.0))
+    bidding_system.submit_bid(Bid(task_id=tasks[2].task_id, agent_id=other.agent_id, bid_amount=20.0))
+
+    clearer = MarketClearer(task_board, agent_registry, bidding_system)
+    preview = clearer.clear(capacity=1, dry_run=True)
+    assert preview.tasks == 3 and len(preview.assignments) == 3
+    assert all(task.status == TaskStatus.BIDDING_OPEN for task in tasks)
+
+    result = clearer.clear(capacity=1)
+    winners = {bid.task_id: bid.agent_id for bid in result.assignments}
+    assert sorted(winners.values(), key=str) == sorted([cheap.agent_id, proven.agent_id, other.agent_id], key=str)
+    assert winners[tasks[2].task_id] == other.agent_id
+    for task in tasks:
+        assert task_board.get_task(task.task_id).status == TaskStatus.ASSIGNED
+        assert task_board.get_task(task.task_id).winning_bid.agent_id == winners[task.task_id]
+    # Losing bids stay in place.
+    assert bidding_system.get_top_bids(tasks[0].task_id, 2)[0].bid_amount == 10.0
+    assert clearer.clear().tasks == 0
+
+    # Each of them now holds a task, so with a capacity of 1 a new task stays open until one submits.
+    task = task_board.post_task(Task(title="t3", description="", required_capabilities=[], reward_amount=50.0))
+    bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=cheap.agent_id, bid_amount=10.0))
+    assert clearer.clear(capacity=1).unassigned == [task.task_id]
+    held = next(task_id for task_id, agent_id in winners.items() if agent_id == cheap.agent_id)
+    WorkVerificationService().submit_work(WorkProduct(task_id=held, agent_id=cheap.agent_id, deliverable={}))
+    assert [bid.agent_id for bid in clearer.clear(capacity=1).assignments] == [cheap.agent_id]
+
+def test_quantile_sketch_is_accurate_and_mergeable():
+    import random
+    from app.market_stats import QuantileSketch
+
+    rng = random.Random(0)
+    values = [rng.lognormvariate(0, 1) for _ in range(20_000)]
+    halves = QuantileSketch(), QuantileSketch()
+    for i, value in enumerate(values):
+        halves[i % 2].add(value)
+    sketch = halves[0]
+    sketch.merge(halves[1])
+    values.sort()
+    for q, estimate in zip((0.1, 0.5, 0.99), sketch.quantiles((0.1, 0.5, 0.99))):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(estimate - exact) <= 0.011 * exact
+    assert sketch.count == len(values) and len(sketch._buckets) < 1000
+
+def test_market_statistics_roll_over_windows():
+    from app.market_stats import MarketStatistics
+
+    now = 1_000.0
+    stats = MarketStatistics(window_seconds=60, clock=lambda: now)
+    task = Task(title="t", description="", required_capabilities=["python", "csv", "python"], reward_amount=100.0)
+    stats.task_posted(task)
+    for amount in (90.0, 80.0, 70.0):
+        stats.bid_submitted(task, Bid(task_id=task.task_id, agent_id=uuid4(), bid_amount=amount))
+    now += 30
+    stats.task_awarded(task, Bid(task_id=task.task_id, agent_id=uuid4(), bid_amount=70.0), live_bids=3)
+
+    [summary] = stats.summaries(["csv", "python"])
+    assert summary.capabilities == ["csv", "python"]
+    assert (summary.bids, summary.awarded, summary.mean_bids_per_award) == (3, 1, 3.0)
+    assert summary.bid_ratio.p50 == pytest.approx(0.8, rel=0.01)
+    assert summary.winning_ratio.p50 == pytest.approx(0.7, rel=0.01)
+    assert summary.assignment_seconds.p50 == pytest.approx(30, rel=0.01)
+    assert stats.summaries(["python"]) == []
+
+    now += 60  # the activity is now in the previous window
+    assert stats.summaries()[0].bids == 3
+    now += 60
+    assert stats.summaries() == []
+
+    # Post times of auctions never awarded are dropped at a roll once past the retention.
+    stats = MarketStatistics(window_seconds=60, clock=lambda: now, post_time_retention=120)
+    stats.task_posted(task)
+    now += 90
+    stats.summaries()
+    assert task.task_id in stats._posted_at
+    now += 60
+    stats.summaries()
+    assert stats._posted_at == {}
+
+def test_rate_limiter_refills_and_evicts_idle_keys():
+    from app.admission import RateLimiter
+
+    now = 0.0
+    limiter = RateLimiter(rate=2.0, burst=3.0, clock=lambda: now, max_keys=2)
+    assert [limiter.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("a") == pytest.approx(0.5)
+    now += 0.5
+    assert limiter.acquire("a") == 0.0
+    limiter.acquire("b")
+    limiter.acquire("c")  # "a" is the least recently used
+    assert len(limiter) == 2
+    assert [limiter.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.wait("a") == limiter.wait("a") > 0  # waiting takes nothing
+    assert RateLimiter(rate=0, burst=0).acquire("a") == 0.0
+
+def test_bids_per_task_are_capped_but_can_be_replaced(monkeypatch):
+    from app import components
+
+    monkeypatch.setattr(components, "MAX_BIDS_PER_TASK", 2)
+    task = TaskBoard().post_task(Task(title="t", description="", required_capabilities=[], reward_amount=10.0))
+    agents = AgentRegistry().register_agents([Agent(capabilities=[]) for _ in range(3)])
+    bidding_system = BiddingSystem()
+    for agent in agents[:2]:
+        bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=5.0))
+    with pytest.raises(ValueError, match="too many bids"):
+        bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=agents[2].agent_id, bid_amount=1.0))
+    bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=agents[0].agent_id, bid_amount=4.0))
+    assert [bid.bid_amount for bid in bidding_system.get_top_bids(task.task_id, 10)] == [4.0, 5.0]
+    assert bidding_system.repository.has_bid(task.task_id, agents[0].agent_id)
+    assert not bidding_system.repository.has_bid(task.task_id, agents[2].agent_id)
@@ -0,0 +1,172 @@
+import threading
+import pytest
+from app.models import Agent, Task, Bid, WorkProduct, TaskStatus, VerificationStatus
+from app.archive import ColdStore, TaskArchiver, set_cold_store
+from app.components import TaskBoard, AgentRegistry, BiddingSystem, WorkVerificationService, ReputationLedger, snapshot_state
+from app.indexes import CapabilityIndex, TaskIndex, ReputationIndex
+from app.journal import Journal, set_journal
+from app.repository import InMemoryRepository
+
+
+def fresh_repository():
+    return InMemoryRepository(
+        {"tasks": {}, "agents": {}, "bids": {}, "work_products": {}},
+        {"capabilities": CapabilityIndex(), "tasks": TaskIndex(), "reputation": ReputationIndex()},
+    )
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = Journal(str(tmp_path / "journal"))
+    journal.start()
+    set_journal(journal)
+    yield journal
+    set_journal(None)
+    journal.close()
+
+
+def run_marketplace(repository):
+    agent = AgentRegistry(repository).register_agent(Agent(capabilities=["python"]))
+    task = TaskBoard(repository).post_task(Task(title="t", description="", required_capabilities=["python"], reward_amount=10.0))
+    other = TaskBoard(repository).post_tasks([Task(title="o", description="", required_capabilities=[], reward_amount=5.0)])[0]
+    bidding_system = BiddingSystem(repository)
+    bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=9.0))
+    withdrawn = bidding_system.submit_bid(Bid(task_id=other.task_id, agent_id=agent.agent_id, bid_amount=4.0))
+    bidding_system.withdraw_bid(other.task_id, withdrawn.bid_id)
+    bidding_system.select_winner(task.task_id)
+    work = WorkVerificationService(repository).submit_work(WorkProduct(task_id=task.task_id, agent_id=agent.agent_id, deliverable={"ok": True}))
+    WorkVerificationService(repository).verify_work(work.work_id, 80.0)
+    ReputationLedger(repository).record_success(agent.agent_id, 80.0)
+    return agent, task, other, work
+
+
+def test_restore_replays_journal(journal):
+    agent, task, other, work = run_marketplace(fresh_repository())
+    journal.flush()
+
+    restored = fresh_repository()
+    assert Journal(journal.directory).restore(restored) == 10
+    assert restored.get_task(task.task_id).status == TaskStatus.VERIFIED
+    assert restored.get_task(task.task_id).winning_bid.agent_id == agent.agent_id
+    assert restored.get_task(other.task_id).status == TaskStatus.BIDDING_OPEN
+    assert restored.count_bids(other.task_id) == 0
+    assert restored.get_work_product(work.work_id).verification_status == VerificationStatus.PASSED
+    assert restored.get_agent(agent.agent_id).completed_tasks == 1
+
+
+def test_snapshot_compacts_journal(journal):
+    repository = fresh_repository()
+    agent, task, _, _ = run_marketplace(repository)
+    journal.write_snapshot(*snapshot_state(repository))
+    late = TaskBoard(repository).post_task(Task(title="late", description="", required_capabilities=[], reward_amount=1.0))
+    journal.flush()
+
+    restored = fresh_repository()
+    # Only the record written after the snapshot is replayed.
+    assert Journal(journal.directory).restore(restored) == 1
+    assert restored.get_task(late.task_id) is not None
+    assert restored.get_task(task.task_id).status == TaskStatus.VERIFIED
+    assert restored.get_agent(agent.agent_id).completed_tasks == 1
+
+
+def test_snapshot_dumped_alongside_writers_recovers(journal):
+    repository = fresh_repository()
+    agent, task, other, _ = run_marketplace(repository)
+    dump = repository.dump
+    bidding_system = BiddingSystem(repository)
+
+    def dump_while_writing():
+        # Writes land between the journal rollover and the dump.
+        bid = bidding_system.submit_bid(Bid(task_id=other.task_id, agent_id=agent.agent_id, bid_amount=3.0))
+        TaskBoard(repository).post_task(Task(title="late", description="", required_capabilities=[], reward_amount=1.0))
+        state = dump()
+        bidding_system.withdraw_bid(other.task_id, bid.bid_id)
+        return state
+
+    repository.dump = dump_while_writing
+    journal.write_snapshot(*snapshot_state(repository))
+    journal.flush()
+
+    restored = fresh_repository()
+    assert Journal(journal.directory).restore(restored) == 3
+    assert restored.count_bids(other.task_id) == 0
+    assert restored.get_task(other.task_id).status == TaskStatus.BIDDING_OPEN
+    assert len(restored.all_tasks()) == 3
+    assert restored.get_task(task.task_id).status == TaskStatus.VERIFIED
+
+
+def test_concurrent_writers_share_group_commits(journal):
+    repository = fresh_repository()
+    task_board = TaskBoard(repository)
+
+    def post_many():
+        for i in range(50):
+            task_board.post_task(Task(title=f"t{i}", description="", required_capabilities=[], reward_amount=1.0))
+
+    threads = [threading.Thread(target=post_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert journal.last_seq == 400
+    assert journal.fsync_count < 400
+    assert Journal(journal.directory).restore(fresh_repository()) == 400
+
+
+def test_archiver_moves_finished_tasks_to_the_cold_store(journal, tmp_path):
+    repository = fresh_repository()
+    agent, task, other, work = run_marketplace(repository)
+    # Seal the segment after every write, so reads go through index files too.
+    store = ColdStore(str(tmp_path / "archive"), segment_bytes=1)
+    set_cold_store(store)
+    now = [1000.0]
+    archiver = TaskArchiver(TaskBoard(repository), store, retention_seconds=60.0, clock=lambda: now[0])
+    try:
+        assert archiver.run() == 0
+        now[0] += 60.0
+        assert archiver.run() == 1
+        assert repository.get_task(task.task_id) is None and repository.get_work_product(work.work_id) is None
+        assert repository.get_task(other.task_id) is not None
+        archived = TaskBoard(repository).get_archived_task(task.task_id)
+        assert archived.task.status == TaskStatus.VERIFIED and archived.archived_at == 1060.0
+        assert [bid.agent_id for bid in archived.bids] == [agent.agent_id]
+        assert [work_product.work_id for work_product in archived.work_products] == [work.work_id]
+        assert TaskBoard(repository).get_archived_task(other.task_id) is None
+    finally:
+        set_cold_store(None)
+        store.close()
+
+    journal.flush()
+    restored = fresh_repository()
+    Journal(journal.directory).restore(restored)
+    assert restored.get_task(task.task_id) is None and restored.get_work_product(work.work_id) is None
+    assert restored.get_task(other.task_id) is not None
+
+    # A torn write at the end of the active segment is cut off on opening.
+    with open(tmp_path / "archive" / "archive-000001.log", "ab") as f:
+        f.write(b"\x00" * 5)
+    reopened = ColdStore(store.directory)
+    assert reopened.get(task.task_id).task.task_id == task.task_id
+    assert len(reopened) == 1 and reopened.size_bytes() == (tmp_path / "archive" / "archive-000000.log").stat().st_size
+    reopened.close()
+
+
+def test_archiver_thread_survives_a_failed_run(tmp_path):
+    store = ColdStore(str(tmp_path / "archive"))
+    archiver = TaskArchiver(TaskBoard(fresh_repository()), store)
+    runs = []
+
+    def run():
+        runs.append(None)
+        if len(runs) == 1:
+            raise OSError("No space left on device")
+        archiver._stopping.set()
+        return 0
+
+    archiver.run = run
+    archiver.start(0.01)
+    archiver._thread.join(5)
+    archiver.close()
+    store.close()
+    assert len(runs) == 2
@@ -1,6 +1,10 @@
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import status
+import json
+import os
+import threading
+import time
 import uuid
 
 # Import the FastAPI app instance
@@ -84,7 +88,7 @@ async def test_full_workflow():
             "deliverable": {"result": "This is the completed work."}
         }
         work_response = client.post("/work_products/", json=work_data)
-        assert work_response.status_code == status.HTTP_201_CREATED
+        assert work_response.status_code == status.HTTP_202_ACCEPTED
         work_product = work_response.json()
         work_id = work_product["work_id"]
         
@@ -101,3 +105,586 @@ async def test_full_workflow():
         assert updated_agent["completed_tasks"] == 1
         assert updated_agent["reputation_score"] > agent["reputation_score"]
 
+
+def test_only_the_winner_may_submit_work():
+    with TestClient(app) as client:
+        winner_id = client.post("/agents/", json={"capabilities": ["python"]}).json()["agent_id"]
+        other_id = client.post("/agents/", json={"capabilities": ["python"]}).json()["agent_id"]
+        task_id = client.post("/tasks/", json={
+            "title": "Winner only", "description": "", "required_capabilities": ["python"], "reward_amount": 10.0,
+        }).json()["task_id"]
+        client.post("/bids/", json={"task_id": task_id, "agent_id": winner_id, "bid_amount": 5.0})
+        client.post("/bids/", json={"task_id": task_id, "agent_id": other_id, "bid_amount": 8.0})
+        client.post(f"/tasks/{task_id}/select_winner/")
+
+        for deliverable in ({"result": "mine"}, {"rows": list(range(20000))}):
+            response = client.post("/work_products/", json={"task_id": task_id, "agent_id": other_id, "deliverable": deliverable})
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert client.get(f"/tasks/{task_id}").json()["status"] == "ASSIGNED"
+
+        response = client.post("/work_products/", json={"task_id": task_id, "agent_id": winner_id, "deliverable": {"result": "mine"}})
+        assert response.status_code == status.HTTP_202_ACCEPTED
+
+
+@pytest.mark.asyncio
+async def test_eligible_tasks():
+    with TestClient(app) as client:
+        agent = client.post("/agents/", json={"capabilities": ["geo", "sql"]}).json()
+        eligible_task = client.post("/tasks/", json={
+            "title": "Eligible",
+            "description": "Needs geo",
+            "required_capabilities": ["geo"],
+            "reward_amount": 10.0,
+        }).json()
+        other_task = client.post("/tasks/", json={
+            "title": "Not eligible",
+            "description": "Needs geo and rust",
+            "required_capabilities": ["geo", "rust"],
+            "reward_amount": 10.0,
+        }).json()
+
+        response = client.get(f"/agents/{agent['agent_id']}/eligible_tasks")
+        assert response.status_code == status.HTTP_200_OK
+        task_ids = {task["task_id"] for task in response.json()}
+        assert eligible_task["task_id"] in task_ids
+        assert other_task["task_id"] not in task_ids
+
+        missing = client.get(f"/agents/{uuid.uuid4()}/eligible_tasks")
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_list_tasks_pagination():
+    with TestClient(app) as client:
+        capability = f"cap-{uuid.uuid4()}"
+        created = [
+            client.post("/tasks/", json={
+                "title": f"Paged {i}",
+                "description": "",
+                "required_capabilities": [capability],
+                "reward_amount": 1.0,
+            }).json()["task_id"]
+            for i in range(5)
+        ]
+
+        first = client.get("/tasks/", params={"capability": capability, "limit": 2})
+        assert first.status_code == status.HTTP_200_OK
+        assert [task["task_id"] for task in first.json()] == created[:2]
+        cursor = first.headers["X-Next-Cursor"]
+
+        rest = client.get("/tasks/", params={"capability": capability, "cursor": cursor, "limit": 10})
+        assert [task["task_id"] for task in rest.json()] == created[2:]
+        assert "X-Next-Cursor" not in rest.headers
+
+        filtered = client.get("/tasks/", params={"capability": capability, "status": "ASSIGNED"})
+        assert filtered.json() == []
+
+
+@pytest.mark.asyncio
+async def test_long_poll_events():
+    from app.events import event_bus
+
+    with TestClient(app) as client:
+        after = event_bus.last_id
+        empty = client.get("/events/poll", params={"after": after, "timeout": 0})
+        assert empty.json()["events"] == []
+
+        capability = f"cap-{uuid.uuid4()}"
+        task_data = {
+            "title": "Announced",
+            "description": "",
+            "required_capabilities": [capability],
+            "reward_amount": 5.0,
+        }
+        # Post from another thread while the poll is waiting.
+        timer = threading.Timer(0.2, lambda: client.post("/tasks/", json=task_data))
+        timer.start()
+        response = client.get("/events/poll", params={"after": after, "capabilities": [capability], "timeout": 5})
+        timer.join()
+
+        body = response.json()
+        assert [event["type"] for event in body["events"]] == ["posted"]
+        assert body["events"][0]["task"]["title"] == "Announced"
+
+        unqualified = client.get("/events/poll", params={"after": after, "capabilities": ["other"], "timeout": 0})
+        assert unqualified.json()["events"] == []
+        assert unqualified.json()["last_event_id"] >= body["last_event_id"]
+
+
+@pytest.mark.asyncio
+async def test_top_bids_and_withdrawal():
+    with TestClient(app) as client:
+        task_id = client.post("/tasks/", json={
+            "title": "Contested",
+            "description": "",
+            "required_capabilities": [],
+            "reward_amount": 100.0,
+        }).json()["task_id"]
+        bids = []
+        for amount in (70.0, 50.0, 60.0):
+            agent_id = client.post("/agents/", json={"capabilities": []}).json()["agent_id"]
+            response = client.post("/bids/", json={"task_id": task_id, "agent_id": agent_id, "bid_amount": amount})
+            assert response.status_code == status.HTTP_201_CREATED
+            bids.append(response.json())
+
+        top = client.get(f"/tasks/{task_id}/bids", params={"top": 2})
+        assert [bid["bid_amount"] for bid in top.json()] == [50.0, 60.0]
+
+        withdrawn = client.delete(f"/tasks/{task_id}/bids/{bids[1]['bid_id']}")
+        assert withdrawn.status_code == status.HTTP_200_OK
+        again = client.delete(f"/tasks/{task_id}/bids/{bids[1]['bid_id']}")
+        assert again.status_code == status.HTTP_404_NOT_FOUND
+
+        winner = client.post(f"/tasks/{task_id}/select_winner/")
+        assert winner.json()["bid_amount"] == 60.0
+
+
+@pytest.mark.asyncio
+async def test_batch_ingest():
+    with TestClient(app) as client:
+        capability = f"cap-{uuid.uuid4()}"
+        agents = client.post("/agents/batch", json=[
+            {"capabilities": [capability]},
+            {"capabilities": []},
+        ])
+        assert agents.status_code == status.HTTP_200_OK
+        qualified_id, unqualified_id = [result["id"] for result in agents.json()]
+
+        ndjson = "\n".join(json.dumps(task) for task in [
+            {"title": "Batch 1", "description": "", "required_capabilities": [capability], "reward_amount": 10.0},
+            {"title": "Batch 2", "description": "", "required_capabilities": [capability]},
+            {"title": "Batch 3", "description": "", "required_capabilities": [capability], "reward_amount": 30.0},
+        ])
+        tasks = client.post("/tasks/batch", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+        results = tasks.json()
+        assert [result["status_code"] for result in results] == [201, 422, 201]
+        assert "reward_amount" in results[1]["error"]
+        task_id = results[0]["id"]
+        assert client.get(f"/tasks/{task_id}").status_code == status.HTTP_200_OK
+
+        bids = client.post("/bids/batch", json=[
+            {"task_id": task_id, "agent_id": qualified_id, "bid_amount": 9.0},
+            {"task_id": task_id, "agent_id": unqualified_id, "bid_amount": 8.0},
+            {"task_id": str(uuid.uuid4()), "agent_id": qualified_id, "bid_amount": 8.0},
+        ])
+        assert [result["status_code"] for result in bids.json()] == [201, 403, 404]
+        assert client.get(f"/tasks/{task_id}").json()["status"] == "BIDDING_OPEN"
+
+
+def test_duplicate_task_ids_are_a_conflict():
+    task = {"task_id": str(uuid.uuid4()), "title": "Twice", "description": "", "required_capabilities": [], "reward_amount": 5.0}
+    with TestClient(app) as client:
+        assert client.post("/tasks/", json=task).status_code == 201
+        response = client.post("/tasks/", json={**task, "reward_amount": 7.0})
+        assert response.status_code == 409
+        assert client.get(f"/tasks/{task['task_id']}").json()["reward_amount"] == 5.0
+
+        fresh = {**task, "task_id": str(uuid.uuid4())}
+        results = client.post("/tasks/batch", json=[task, fresh, fresh]).json()
+        assert [result["status_code"] for result in results] == [409, 201, 409]
+
+
+def test_oversized_batches_are_rejected_before_validation(monkeypatch):
+    from app import endpoints
+
+    monkeypatch.setattr(endpoints, "MAX_BATCH_ITEMS", 2)
+    monkeypatch.setattr(endpoints, "MAX_BATCH_BYTES", 1000)
+    with TestClient(app) as client:
+        # Counted before validation, so even invalid items are not inspected.
+        response = client.post("/agents/batch", json=[{}, {}, {}])
+        assert response.status_code == 413
+        response = client.post("/agents/batch", content=b"{}\n" * 3, headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 413
+        response = client.post("/agents/batch", content=b" " * 1001, headers={"Content-Type": "application/json"})
+        assert response.status_code == 413 and "bytes" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_leaderboard_and_rank():
+    with TestClient(app) as client:
+        capability = f"cap-{uuid.uuid4()}"
+        agents = [client.post("/agents/", json={"capabilities": [capability]}).json() for _ in range(3)]
+        for agent, score in zip(agents, [80, 95, 60]):
+            task = client.post("/tasks/", json={
+                "title": "Ranked", "description": "", "required_capabilities": [capability], "reward_amount": 10.0,
+            }).json()
+            client.post("/bids/", json={"task_id": task["task_id"], "agent_id": agent["agent_id"], "bid_amount": 5.0})
+            client.post(f"/tasks/{task['task_id']}/select_winner/")
+            work = client.post("/work_products/", json={
+                "task_id": task["task_id"], "agent_id": agent["agent_id"], "deliverable": {},
+            }).json()
+            client.post(f"/work_products/{work['work_id']}/verify/?score={score}")
+
+        response = client.get("/agents/leaderboard", params={"capability": capability, "top": 2})
+        assert response.status_code == status.HTTP_200_OK
+        assert [agent["agent_id"] for agent in response.json()] == [agents[1]["agent_id"], agents[0]["agent_id"]]
+
+        failed = client.get(f"/agents/{agents[2]['agent_id']}").json()
+        assert failed["failed_tasks"] == 1 and failed["success_rate"] == 0.0
+        rank = client.get(f"/agents/{agents[2]['agent_id']}/rank", params={"capability": capability}).json()
+        assert rank["rank"] == 3
+        assert client.get(f"/agents/{agents[2]['agent_id']}/rank", params={"capability": "none"}).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_and_task_changes():
+    with TestClient(app) as client:
+        board = client.get("/tasks/", params={"limit": 1})
+        etag, version = board.headers["ETag"], int(board.headers["X-Board-Version"])
+        unchanged = client.get("/tasks/", params={"limit": 1}, headers={"If-None-Match": etag})
+        assert unchanged.status_code == status.HTTP_304_NOT_MODIFIED and unchanged.content == b""
+
+        task = client.post("/tasks/", json={
+            "title": "Delta", "description": "", "required_capabilities": [], "reward_amount": 1.0,
+        }).json()
+        agent = client.post("/agents/", json={"capabilities": []}).json()
+        client.post("/bids/", json={"task_id": task["task_id"], "agent_id": agent["agent_id"], "bid_amount": 1.0})
+        assert client.get("/tasks/", params={"limit": 1}, headers={"If-None-Match": etag}).status_code == 200
+
+        changes = client.get("/tasks/changes", params={"since": version}).json()
+        # Posted, then opened for bidding: one entry in its latest state.
+        assert [(t["task_id"], t["status"]) for t in changes["tasks"]] == [(task["task_id"], "BIDDING_OPEN")]
+        assert changes["version"] == version + 2 and not changes["has_more"]
+
+        caught_up = client.get("/tasks/changes", params={"since": changes["version"], "epoch": changes["epoch"]}).json()
+        assert caught_up["tasks"] == [] and caught_up["version"] == changes["version"]
+        assert client.get("/tasks/changes", params={"since": version, "epoch": "previous-run"}).status_code == 410
+        assert client.get("/tasks/changes", params={"since": changes["version"] + 100}).status_code == 410
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_large_deliverables_go_to_the_blob_store(tmp_path, compress):
+    from app.blobs import BlobStore, set_blob_store
+
+    set_blob_store(BlobStore(str(tmp_path), compress=compress))
+    try:
+        with TestClient(app) as client:
+            agent_id = client.post("/agents/", json={"capabilities": ["blob"]}).json()["agent_id"]
+            task_id = client.post("/tasks/", json={
+                "title": "Blob", "description": "", "required_capabilities": ["blob"], "reward_amount": 5.0,
+            }).json()["task_id"]
+            client.post("/bids/", json={"task_id": task_id, "agent_id": agent_id, "bid_amount": 4.0})
+            client.post(f"/tasks/{task_id}/select_winner/")
+
+            deliverable = {"rows": list(range(20000))}
+            work = client.post("/work_products/", json={"task_id": task_id, "agent_id": agent_id, "deliverable": deliverable})
+            assert work.status_code == 202
+            assert work.json()["deliverable"] is None
+            ref = work.json()["deliverable_blob"]
+            assert ref["media_type"] == "application/json"
+
+            full = client.get(f"/work_products/{work.json()['work_id']}/deliverable")
+            assert full.status_code == 200 and json.loads(full.content) == deliverable
+            assert len(full.content) == ref["size"]
+
+            partial = client.get(f"/blobs/{ref['digest']}", headers={"Range": "bytes=1-8"})
+            assert partial.status_code == 206 and partial.content == full.content[1:9]
+            assert partial.headers["content-range"] == f"bytes 1-8/{ref['size']}"
+            suffix = client.get(f"/blobs/{ref['digest']}", headers={"Range": "bytes=-5"})
+            assert suffix.content == full.content[-5:]
+            assert client.get(f"/blobs/{ref['digest']}", headers={"Range": f"bytes={ref['size']}-"}).status_code == 416
+
+            # Uploading the same content again is deduplicated.
+            uploaded = client.post("/blobs/", content=full.content, headers={"Content-Type": "application/json"})
+            assert uploaded.status_code == 201 and uploaded.json() == ref
+            assert len([name for _, _, names in os.walk(tmp_path) for name in names]) == 1
+
+            missing = {"digest": "0" * 64, "size": 1}
+            response = client.post("/work_products/", json={"task_id": task_id, "agent_id": agent_id, "deliverable_blob": missing})
+            assert response.status_code == 404
+
+            # A submission that cannot be accepted leaves no blob behind.
+            other = {"rows": list(range(30000))}
+            response = client.post("/work_products/", json={"task_id": task_id, "agent_id": agent_id, "deliverable": other})
+            assert response.status_code == 409
+            assert len([name for _, _, names in os.walk(tmp_path) for name in names]) == 1
+    finally:
+        set_blob_store(None)
+
+
+def test_blob_uploads_and_reads_are_bounded(tmp_path, monkeypatch):
+    from app import endpoints
+    from app.blobs import READ_CHUNK_BYTES, BlobStore, set_blob_store
+
+    store = BlobStore(str(tmp_path), compress=True)
+    # Compresses about a thousandfold; reads must not inflate it all at once.
+    ref = store.put(b"\0" * (16 * 1024 * 1024))
+    assert max(len(chunk) for chunk in store.read(ref.digest)) <= READ_CHUNK_BYTES
+    assert sum(len(chunk) for chunk in store.read(ref.digest, 100, 10_000_000)) == 10_000_000 - 100
+
+    set_blob_store(store)
+    monkeypatch.setattr(endpoints, "MAX_BLOB_BYTES", 1000)
+    try:
+        with TestClient(app) as client:
+            assert client.post("/blobs/", content=b"x" * 1001).status_code == 413
+            # Without a Content-Length, the limit is enforced as the body arrives.
+            assert client.post("/blobs/", content=iter([b"x" * 600, b"x" * 600])).status_code == 413
+            assert client.post("/blobs/", content=iter([b"x" * 500, b"x" * 500])).status_code == 201
+    finally:
+        set_blob_store(None)
+    assert len([name for _, _, names in os.walk(tmp_path) for name in names]) == 2
+
+
+def test_submitted_work_is_verified_in_the_background():
+    from app.endpoints import verification_queue
+
+    verification_queue.register("autoverified", "app.verifiers:deliverable_succeeded")
+    try:
+        with TestClient(app) as client:
+            agent_id = client.post("/agents/", json={"capabilities": ["autoverified"]}).json()["agent_id"]
+            work_ids = []
+            for outcome in ("success", "error"):
+                task_id = client.post("/tasks/", json={
+                    "title": outcome, "description": "", "required_capabilities": ["autoverified"], "reward_amount": 5.0,
+                }).json()["task_id"]
+                client.post("/bids/", json={"task_id": task_id, "agent_id": agent_id, "bid_amount": 4.0})
+                client.post(f"/tasks/{task_id}/select_winner/")
+                response = client.post("/work_products/", json={
+                    "task_id": task_id, "agent_id": agent_id, "deliverable": {"status": outcome},
+                })
+                assert response.status_code == 202
+                work_ids.append(response.json()["work_id"])
+                assert response.headers["location"] == f"/work_products/{work_ids[-1]}/verification"
+
+            deadline = time.monotonic() + 5
+            while client.get("/verification/queue").json()["verified"] < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            jobs = [client.get(f"/work_products/{work_id}/verification").json() for work_id in work_ids]
+            assert [(job["state"], job["score"]) for job in jobs] == [("VERIFIED", 100.0), ("VERIFIED", 0.0)]
+            agent = client.get(f"/agents/{agent_id}").json()
+            assert (agent["completed_tasks"], agent["failed_tasks"]) == (1, 1)
+    finally:
+        del verification_queue.verifiers["autoverified"]
+
+
+def test_verification_queue_prefers_higher_rewards():
+    from app.models import Task, WorkProduct
+    from app.verification import VerificationQueue
+
+    queue = VerificationQueue(lambda work_id, score: None, lambda work_product: {}, verifiers={"v": "x:y"}, batch_size=2)
+    rewards = [5.0, 50.0, 1.0, 20.0]
+    work = [WorkProduct(task_id=uuid.uuid4(), agent_id=uuid.uuid4(), deliverable={}) for _ in rewards]
+    for work_product, reward in zip(work, rewards):
+        queue.submit(work_product, Task(title="", description="", required_capabilities=["v"], reward_amount=reward))
+    manual = WorkProduct(task_id=uuid.uuid4(), agent_id=uuid.uuid4(), deliverable={})
+    assert queue.submit(manual, Task(title="", description="", required_capabilities=[], reward_amount=1.0)).state == "MANUAL"
+    assert queue.depth() == 4
+    assert [item[0] for item in queue.take_batch()] == [work[1], work[3]]
+    assert [item[0] for item in queue.take_batch()] == [work[0], work[2]]
+    assert queue.stats().in_progress == 4
+
+
+def test_metrics_endpoint_reports_route_latencies_and_counts():
+    with TestClient(app) as client:
+        agent_id = client.post("/agents/", json={"capabilities": ["metrics"]}).json()["agent_id"]
+        task_id = client.post("/tasks/", json={
+            "title": "Metered", "description": "", "required_capabilities": ["metrics"], "reward_amount": 10.0,
+        }).json()["task_id"]
+        client.post("/bids/", json={"task_id": task_id, "agent_id": agent_id, "bid_amount": 5.0})
+        assert client.post(f"/tasks/{task_id}/select_winner/").status_code == 200
+        client.get(f"/tasks/{task_id}")
+        client.get("/events/poll", params={"timeout": 0})
+
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    # Requests are labelled by route template, not by concrete path.
+    assert any(line.startswith('aegis_http_request_duration_seconds_count{method="GET",route="/tasks/{task_id}",status="200"}') for line in lines)
+    assert not any(task_id in line for line in lines)
+    # Long-lived event requests are not timed.
+    assert not any('route="/events/' in line for line in lines)
+    assert any(line.startswith('aegis_component_operation_duration_seconds_count{component="bidding_system",operation="select_winner"}') for line in lines)
+    assert any(line.startswith("aegis_bids_per_task_count ") for line in lines)
+    assert any(line.startswith('aegis_entities{kind="tasks"}') for line in lines)
+
+
+def test_auctions_close_automatically_at_the_bidding_deadline():
+    with TestClient(app) as client:
+        agent_id = client.post("/agents/", json={"capabilities": []}).json()["agent_id"]
+        task_id = client.post("/tasks/", json={
+            "title": "Timed", "description": "", "required_capabilities": [], "reward_amount": 10.0,
+            "bidding_deadline": time.time() + 0.3,
+        }).json()["task_id"]
+        assert client.post("/bids/", json={"task_id": task_id, "agent_id": agent_id, "bid_amount": 4.0}).status_code == 201
+
+        deadline = time.monotonic() + 5
+        while client.get(f"/tasks/{task_id}").json()["status"] != "ASSIGNED":
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        late = client.post("/bids/", json={"task_id": task_id, "agent_id": agent_id, "bid_amount": 3.0})
+    assert late.status_code == 400
+
+
+def test_deciding_an_auction_by_hand_cancels_its_deadline():
+    from app.endpoints import auction_scheduler
+
+    with TestClient(app) as client:
+        agent_id = client.post("/agents/", json={"capabilities": []}).json()["agent_id"]
+        task_id = client.post("/tasks/", json={
+            "title": "Timed", "description": "", "required_capabilities": [], "reward_amount": 10.0,
+            "bidding_deadline": time.time() + 3600,
+        }).json()["task_id"]
+        pending = auction_scheduler.pending()
+        client.post("/bids/", json={"task_id": task_id, "agent_id": agent_id, "bid_amount": 4.0})
+        assert client.post(f"/tasks/{task_id}/select_winner/").status_code == 200
+        assert auction_scheduler.pending() == pending - 1
+
+
+def test_market_clearing_endpoint():
+    with TestClient(app) as client:
+        agent_ids = [client.post("/agents/", json={"capabilities": ["clearing"]}).json()["agent_id"] for _ in range(2)]
+        task_ids = [
+            client.post("/tasks/", json={
+                "title": f"Cleared {i}", "description": "", "required_capabilities": ["clearing"], "reward_amount": 10.0,
+            }).json()["task_id"]
+            for i in range(2)
+        ]
+        for task_id in task_ids:
+            client.post("/bids/", json={"task_id": task_id, "agent_id": agent_ids[0], "bid_amount": 1.0})
+            client.post("/bids/", json={"task_id": task_id, "agent_id": agent_ids[1], "bid_amount": 2.0})
+
+        response = client.post("/market/clear", params={"capacity": 1})
+        assert response.status_code == 200
+        result = response.json()
+        mine = [bid for bid in result["assignments"] if bid["task_id"] in task_ids]
+        assert sorted(bid["agent_id"] for bid in mine) == sorted(agent_ids)
+        for task_id in task_ids:
+            assert client.get(f"/tasks/{task_id}").json()["status"] == "ASSIGNED"
+
+def test_market_stats_endpoint():
+    capabilities = ["pricing", "stats"]
+    with TestClient(app) as client:
+        agent_ids = [client.post("/agents/", json={"capabilities": capabilities}).json()["agent_id"] for _ in range(2)]
+        for amount in (40.0, 60.0):
+            task_id = client.post("/tasks/", json={
+                "title": "Priced", "description": "", "required_capabilities": capabilities, "reward_amount": 100.0,
+            }).json()["task_id"]
+            client.post("/bids/", json={"task_id": task_id, "agent_id": agent_ids[0], "bid_amount": amount})
+            client.post("/bids/", json={"task_id": task_id, "agent_id": agent_ids[1], "bid_amount": 90.0})
+            client.post(f"/tasks/{task_id}/select_winner/")
+
+        response = client.get("/market/stats", params={"capabilities": ["stats", "pricing"]})
+        assert response.status_code == 200
+        [stats] = response.json()
+        assert stats["capabilities"] == capabilities
+        assert stats["bids"] == 4 and stats["awarded"] == 2 and stats["mean_bids_per_award"] == 2.0
+        assert stats["winning_ratio"]["p10"] == pytest.approx(0.4, rel=0.01)
+        assert stats["bid_ratio"]["p90"] == pytest.approx(0.9, rel=0.01)
+        assert stats["assignment_seconds"] is not None
+        assert capabilities in [entry["capabilities"] for entry in client.get("/market/stats").json()]
+
+def test_archived_tasks_are_still_served(tmp_path):
+    from app.archive import ColdStore, TaskArchiver, set_cold_store
+    from app.endpoints import task_board
+
+    store = ColdStore(str(tmp_path / "archive"))
+    set_cold_store(store)
+    try:
+        with TestClient(app) as client:
+            agent_id = client.post("/agents/", json={"capabilities": ["archived"]}).json()["agent_id"]
+            task_id = client.post("/tasks/", json={
+                "title": "Archived", "description": "", "required_capabilities": ["archived"], "reward_amount": 10.0,
+            }).json()["task_id"]
+            client.post("/bids/", json={"task_id": task_id, "agent_id": agent_id, "bid_amount": 5.0})
+            client.post(f"/tasks/{task_id}/select_winner/")
+            work = client.post("/work_products/", json={"task_id": task_id, "agent_id": agent_id, "deliverable": {}}).json()
+            client.post(f"/work_products/{work['work_id']}/verify/?score=90")
+            hot = client.get(f"/tasks/{task_id}").json()
+
+            assert TaskArchiver(task_board, store, retention_seconds=0.0).run() >= 1
+            assert task_board.get_task(uuid.UUID(task_id)) is None
+            assert client.get(f"/tasks/{task_id}").json() == hot == {**hot, "status": "VERIFIED"}
+            assert [bid["agent_id"] for bid in client.get(f"/tasks/{task_id}/bids").json()] == [agent_id]
+            assert client.get(f"/tasks/{uuid.uuid4()}").status_code == 404
+    finally:
+        set_cold_store(None)
+        store.close()
+
+def test_bid_rate_limits_return_429_with_retry_after(monkeypatch):
+    from app.admission import RateLimiter
+    from app import endpoints
+
+    monkeypatch.setattr(endpoints, "agent_bid_limiter", RateLimiter(rate=0.1, burst=2))
+    with TestClient(app) as client:
+        agent_id = client.post("/agents/", json={"capabilities": ["limited"]}).json()["agent_id"]
+        task_ids = [
+            client.post("/tasks/", json={
+                "title": f"Limited {i}", "description": "", "required_capabilities": ["limited"], "reward_amount": 10.0,
+            }).json()["task_id"]
+            for i in range(3)
+        ]
+        bid = {"task_id": task_ids[0], "agent_id": agent_id, "bid_amount": 5.0}
+        assert client.post("/bids/", json=bid).status_code == 201
+        response = client.post("/bids/batch", json=[{**bid, "task_id": task_id} for task_id in task_ids[1:]])
+        assert [result["status_code"] for result in response.json()] == [201, 429]
+        assert int(response.headers["Retry-After"]) == 10
+        response = client.post("/bids/", json=bid)
+        assert response.status_code == 429 and int(response.headers["Retry-After"]) >= 1
+
+def test_a_bid_over_its_task_limit_costs_its_agent_nothing(monkeypatch):
+    from app.admission import RateLimiter
+    from app.models import Bid
+    from app import endpoints
+
+    monkeypatch.setattr(endpoints, "agent_bid_limiter", RateLimiter(rate=0.1, burst=2))
+    monkeypatch.setattr(endpoints, "task_bid_limiter", RateLimiter(rate=0.1, burst=1))
+    agent_id, busy, quiet = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    assert endpoints._bid_admission_wait(Bid(task_id=busy, agent_id=agent_id, bid_amount=1.0)) == 0.0
+    for _ in range(3):
+        assert endpoints._bid_admission_wait(Bid(task_id=busy, agent_id=agent_id, bid_amount=1.0)) > 0
+    assert endpoints._bid_admission_wait(Bid(task_id=quiet, agent_id=agent_id, bid_amount=1.0)) == 0.0
+
+@pytest.mark.asyncio
+async def test_load_shedding_rejects_requests_beyond_the_in_flight_limit():
+    import asyncio
+    from app.admission import LoadShedMiddleware
+
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    shedder = LoadShedMiddleware(slow_app, max_in_flight=2)
+    statuses, headers = [], []
+
+    async def request(path="/bids/"):
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+                headers.append(dict(message["headers"]))
+        await shedder({"type": "http", "path": path}, None, send)
+
+    running = [asyncio.create_task(request()) for _ in range(2)]
+    await asyncio.sleep(0)
+    await request()
+    assert statuses == [503] and headers[0][b"retry-after"] == b"1"
+    exempt = asyncio.create_task(request("/events/poll"))
+    await asyncio.sleep(0)
+    assert shedder.in_flight == 2
+    release.set()
+    await asyncio.gather(*running, exempt)
+    assert statuses[1:] == [200, 200, 200] and shedder.in_flight == 0
+
+def test_bids_from_unknown_ids_are_not_charged_to_the_rate_limits(monkeypatch):
+    from app.admission import RateLimiter
+    from app import endpoints
+
+    limiter = RateLimiter(rate=0.1, burst=1, max_keys=2)
+    monkeypatch.setattr(endpoints, "agent_bid_limiter", limiter)
+    with TestClient(app) as client:
+        agent_id = client.post("/agents/", json={"capabilities": ["flooded"]}).json()["agent_id"]
+        task_id = client.post("/tasks/", json={
+            "title": "Flooded", "description": "", "required_capabilities": ["flooded"], "reward_amount": 10.0,
+        }).json()["task_id"]
+        bid = {"task_id": task_id, "agent_id": agent_id, "bid_amount": 5.0}
+        assert client.post("/bids/", json=bid).status_code == 201
+        # Made-up agents get 404s without buckets of their own, so the real agent's drained one stays.
+        for _ in range(3):
+            assert client.post("/bids/", json={**bid, "agent_id": str(uuid.uuid4())}).status_code == 404
+        response = client.post("/bids/batch", json=[{**bid, "agent_id": str(uuid.uuid4())} for _ in range(3)])
+        assert [result["status_code"] for result in response.json()] == [404, 404, 404]
+        assert len(limiter) == 1
+        assert client.post("/bids/", json=bid).status_code == 429
@@ -0,0 +1,206 @@
+import pytest
+from app.models import Agent, Task, Bid, WorkProduct, TaskStatus, VerificationStatus
+from app.components import TaskBoard, AgentRegistry, QualificationEngine, BiddingSystem, WorkVerificationService, ReputationLedger
+from app.indexes import CapabilityIndex, TaskIndex, ReputationIndex
+from app.compact_repository import CompactRepository
+from app.repository import AlreadyExists, InMemoryRepository
+from app.sqlite_repository import SQLiteRepository
+
+
+@pytest.fixture(params=["memory", "compact", "sqlite"])
+def repository(request, tmp_path):
+    """Each test runs against both storage backends."""
+    if request.param == "memory":
+        repository = InMemoryRepository(
+            {"tasks": {}, "agents": {}, "bids": {}, "work_products": {}},
+            {"capabilities": CapabilityIndex(), "tasks": TaskIndex(), "reputation": ReputationIndex()},
+        )
+    elif request.param == "compact":
+        repository = CompactRepository()
+    else:
+        repository = SQLiteRepository(str(tmp_path / "marketplace.db"))
+    yield repository
+    repository.clear()
+
+
+def test_full_flow_through_repository(repository):
+    agent = AgentRegistry(repository).register_agent(Agent(capabilities=["python", "sql"]))
+    task = TaskBoard(repository).post_task(Task(title="t", description="", required_capabilities=["python"], reward_amount=50.0))
+
+    bidding_system = BiddingSystem(repository)
+    bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=45.0))
+    assert repository.get_task(task.task_id).status == TaskStatus.BIDDING_OPEN
+
+    winner = bidding_system.select_winner(task.task_id)
+    assert winner.agent_id == agent.agent_id
+    assert repository.get_task(task.task_id).status == TaskStatus.ASSIGNED
+
+    work = WorkVerificationService(repository).submit_work(
+        WorkProduct(task_id=task.task_id, agent_id=agent.agent_id, deliverable={"rows": [1, 2]})
+    )
+    verified = WorkVerificationService(repository).verify_work(work.work_id, 90.0)
+    assert verified.verification_status == VerificationStatus.PASSED
+    assert repository.get_work_product(work.work_id).verification_status == VerificationStatus.PASSED
+    assert repository.get_work_product(work.work_id).deliverable == {"rows": [1, 2]}
+    assert repository.get_task(task.task_id).status == TaskStatus.VERIFIED
+
+    ReputationLedger(repository).record_success(agent.agent_id, 90.0)
+    assert repository.get_agent(agent.agent_id).completed_tasks == 1
+
+
+def test_leaderboard_and_rank(repository):
+    ledger = ReputationLedger(repository)
+    agents = AgentRegistry(repository).register_agents([Agent(capabilities=["sql"] if i % 2 else []) for i in range(4)])
+    for agent, score in zip(agents, [60.0, 70.0, 80.0, 90.0]):
+        ledger.record_success(agent.agent_id, score)
+    ledger.record_failure(agents[3].agent_id, 10.0)
+
+    agent = repository.get_agent(agents[3].agent_id)
+    assert (agent.reputation_score, agent.score_variance, agent.failed_tasks, agent.success_rate) == (50.0, 1600.0, 1, 0.5)
+    assert [agent.agent_id for agent in ledger.leaderboard(None, 2)] == [agents[2].agent_id, agents[1].agent_id]
+    assert [agent.agent_id for agent in ledger.leaderboard("sql", 5)] == [agents[1].agent_id, agents[3].agent_id]
+    assert ledger.rank(agents[3].agent_id, None) == 4
+    assert ledger.rank(agents[3].agent_id, "sql") == 2
+    assert ledger.rank(agents[0].agent_id, "sql") is None
+
+
+def test_listing_eligibility_and_bid_book(repository):
+    task_board = TaskBoard(repository)
+    tasks = [
+        task_board.post_task(Task(title=f"t{i}", description="", required_capabilities=["python"] if i % 2 else ["sql", "python"], reward_amount=float(i)))
+        for i in range(6)
+    ]
+
+    page, cursor = repository.page_tasks(None, None, None, None, 4)
+    assert [task.task_id for task in page] == [task.task_id for task in tasks[:4]]
+    page, cursor = repository.page_tasks(None, None, None, cursor, 4)
+    assert [task.task_id for task in page] == [task.task_id for task in tasks[4:]] and cursor is None
+
+    page, cursor = repository.page_tasks(None, "sql", 1.0, None, 1)
+    assert [task.task_id for task in page] == [tasks[2].task_id]
+    page, cursor = repository.page_tasks(None, "sql", 1.0, cursor, 5)
+    assert [task.task_id for task in page] == [tasks[4].task_id]
+
+    python_agent = AgentRegistry(repository).register_agent(Agent(capabilities=["python"]))
+    both_agent = AgentRegistry(repository).register_agent(Agent(capabilities=["python", "sql"]))
+    eligible = QualificationEngine(repository).get_eligible_tasks(python_agent)
+    assert {task.task_id for task in eligible} == {task.task_id for task in tasks[1::2]}
+    qualified = QualificationEngine(repository).get_qualified_agents(tasks[0])
+    assert [agent.agent_id for agent in qualified] == [both_agent.agent_id]
+
+    first = Bid(task_id=tasks[1].task_id, agent_id=python_agent.agent_id, bid_amount=3.0)
+    second = Bid(task_id=tasks[1].task_id, agent_id=both_agent.agent_id, bid_amount=2.0)
+    assert repository.add_bid(first) is None
+    repository.add_bid(second)
+    replacement = Bid(task_id=tasks[1].task_id, agent_id=python_agent.agent_id, bid_amount=1.0)
+    assert repository.add_bid(replacement).bid_id == first.bid_id
+    assert [bid.bid_id for bid in repository.top_bids(tasks[1].task_id, 5)] == [replacement.bid_id, second.bid_id]
+    assert repository.count_bids(tasks[1].task_id) == 2
+    assert repository.withdraw_bid(tasks[1].task_id, replacement.bid_id).bid_id == replacement.bid_id
+    assert repository.withdraw_bid(tasks[1].task_id, replacement.bid_id) is None
+
+
+def test_listing_by_status_and_reward_order(repository):
+    task_board = TaskBoard(repository)
+    tasks = [
+        task_board.post_task(Task(title=f"t{i}", description="", required_capabilities=[], reward_amount=reward))
+        for i, reward in enumerate([2.5, -1.0, 0.0, -3.5, 2.5])
+    ]
+    repository.update_task_status(tasks[2], TaskStatus.BIDDING_OPEN)
+
+    page, cursor = repository.page_tasks(TaskStatus.POSTED, None, None, None, 2)
+    assert [task.task_id for task in page] == [tasks[0].task_id, tasks[1].task_id]
+    page, cursor = repository.page_tasks(TaskStatus.POSTED, None, None, cursor, 5)
+    assert [task.task_id for task in page] == [tasks[3].task_id, tasks[4].task_id] and cursor is None
+
+    page, _ = repository.page_tasks(None, None, -2.0, None, 10)
+    assert [task.task_id for task in page] == [tasks[i].task_id for i in (1, 2, 0, 4)]
+    assert repository.get_task(tasks[2].task_id) == tasks[2]
+
+
+def test_bidding_deadlines_and_entity_counts(repository):
+    task_board = TaskBoard(repository)
+    timed = task_board.post_task(Task(title="timed", description="", required_capabilities=[], reward_amount=1.0, bidding_deadline=1234.5))
+    untimed = task_board.post_task(Task(title="untimed", description="", required_capabilities=[], reward_amount=1.0))
+    assert repository.get_task(timed.task_id).bidding_deadline == 1234.5
+    assert repository.get_task(untimed.task_id).bidding_deadline is None
+    assert repository.count_entities() == {"tasks": 2, "agents": 0, "bids": 0, "work_products": 0}
+
+
+def test_removing_tasks_with_their_bids_and_work(repository):
+    agent = AgentRegistry(repository).register_agent(Agent(capabilities=["python"]))
+    task_board = TaskBoard(repository)
+    kept, removed = task_board.post_tasks([
+        Task(title=f"t{i}", description="", required_capabilities=["python"], reward_amount=10.0) for i in range(2)
+    ])
+    bidding_system = BiddingSystem(repository)
+    for task in (kept, removed):
+        bidding_system.submit_bid(Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=5.0))
+    work = WorkProduct(task_id=removed.task_id, agent_id=agent.agent_id, deliverable={})
+    repository.add_work_product(work)
+
+    assert repository.remove_task(removed.task_id).task_id == removed.task_id
+    assert repository.remove_work_product(work.work_id).work_id == work.work_id
+    assert repository.get_task(removed.task_id) is None and repository.count_bids(removed.task_id) == 0
+    assert repository.has_bid(kept.task_id, agent.agent_id) and not repository.has_bid(removed.task_id, agent.agent_id)
+    assert repository.get_work_product(work.work_id) is None
+    assert repository.remove_task(removed.task_id) is None
+    assert [task.task_id for task in repository.all_tasks()] == [kept.task_id]
+    assert [task.task_id for task in repository.eligible_tasks(["python"])] == [kept.task_id]
+    page, _ = repository.page_tasks(None, "python", None, None, 10)
+    assert [task.task_id for task in page] == [kept.task_id]
+    assert repository.count_entities() == {"tasks": 1, "agents": 1, "bids": 1, "work_products": 0}
+
+
+def test_adding_a_task_twice_is_rejected(repository):
+    task = Task(title="t", description="", required_capabilities=["python"], reward_amount=5.0)
+    repository.add_task(task)
+    with pytest.raises(AlreadyExists):
+        repository.add_task(task.model_copy(update={"reward_amount": 7.0}))
+    assert repository.get_task(task.task_id).reward_amount == 5.0
+    assert repository.count_entities()["tasks"] == 1
+
+    posted = TaskBoard(repository).post_tasks([task, Task(title="new", description="", required_capabilities=[], reward_amount=1.0)])
+    assert [posted_task.title for posted_task in posted] == ["new"]
+
+
+def test_a_bid_cannot_take_another_agents_bid_id(repository):
+    task = TaskBoard(repository).post_task(Task(title="t", description="", required_capabilities=[], reward_amount=5.0))
+    owner, other = (AgentRegistry(repository).register_agent(Agent(capabilities=[])) for _ in range(2))
+    bid = Bid(task_id=task.task_id, agent_id=owner.agent_id, bid_amount=3.0)
+    repository.add_bid(bid)
+
+    with pytest.raises(AlreadyExists):
+        repository.add_bid(bid.model_copy(update={"agent_id": other.agent_id, "bid_amount": 1.0}))
+    assert repository.top_bids(task.task_id, 5) == [bid]
+    assert not repository.has_bid(task.task_id, other.agent_id)
+
+    # The owner may still rebid under the same id.
+    rebid = bid.model_copy(update={"bid_amount": 2.0})
+    assert repository.add_bid(rebid) == bid
+    assert repository.top_bids(task.task_id, 5) == [rebid]
+
+
+def test_awards_are_recorded_and_held_tasks_counted(repository):
+    first, second = AgentRegistry(repository).register_agents([Agent(capabilities=[]) for _ in range(2)])
+    task_board = TaskBoard(repository)
+    cleared, selected = task_board.post_tasks([
+        Task(title=f"t{i}", description="", required_capabilities=[], reward_amount=10.0) for i in range(2)
+    ])
+    bidding_system = BiddingSystem(repository)
+    chosen = bidding_system.submit_bid(Bid(task_id=cleared.task_id, agent_id=first.agent_id, bid_amount=8.0))
+    bidding_system.submit_bid(Bid(task_id=cleared.task_id, agent_id=second.agent_id, bid_amount=6.0))
+    bidding_system.submit_bid(Bid(task_id=selected.task_id, agent_id=first.agent_id, bid_amount=5.0))
+
+    # Awarding a bid other than the lowest keeps the other bids.
+    assert bidding_system.award_bid(cleared.task_id, chosen.bid_id) == chosen
+    assert repository.get_task(cleared.task_id).winning_bid == chosen
+    assert repository.count_bids(cleared.task_id) == 2
+    winner = bidding_system.select_winner(selected.task_id)
+    assert repository.get_task(selected.task_id).winning_bid == winner
+    assert task_board.held_task_counts([first.agent_id, second.agent_id]) == {first.agent_id: 2}
+
+    WorkVerificationService(repository).submit_work(WorkProduct(task_id=cleared.task_id, agent_id=first.agent_id, deliverable={}))
+    assert repository.count_held_tasks([first.agent_id]) == {first.agent_id: 1}
+    repository.remove_task(selected.task_id)
+    assert repository.count_held_tasks([first.agent_id]) == {}
@@ -0,0 +1,125 @@
+import secrets
+import time
+import pytest
+from app.events import EventBus
+from app.models import Agent, Task, Bid, WorkProduct, TaskStatus, VerificationStatus
+from app.sharding import EventRelay, ShardRouter, start_shards, shard_index
+
+
+@pytest.fixture(scope="module")
+def shards(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("shards")
+    addresses = [str(directory / f"shard-{index}.sock") for index in range(2)]
+    authkey = secrets.token_bytes(32)
+    processes = start_shards(addresses, authkey)
+    router = ShardRouter(addresses, authkey)
+    yield router
+    router.close()
+    for process in processes:
+        process.terminate()
+        process.join()
+
+
+def test_task_state_is_partitioned_by_task_id(shards):
+    tasks = shards.task_board.post_tasks([
+        Task(title=f"t{i}", description="", required_capabilities=["python"], reward_amount=float(i)) for i in range(20)
+    ])
+    for task in tasks:
+        owner = shard_index(task.task_id, 2)
+        assert shards.call(owner, "get_task", task.task_id).task_id == task.task_id
+        assert shards.call(1 - owner, "get_task", task.task_id) is None
+
+    listed, cursor = [], None
+    while True:
+        page, cursor = shards.task_board.list_tasks(capability="python", cursor=cursor, limit=3)
+        listed.extend(task.task_id for task in page)
+        if cursor is None:
+            break
+    assert sorted(listed) == sorted(task.task_id for task in tasks)
+
+
+def test_full_flow_across_shards(shards):
+    agent = shards.agent_registry.register_agent(Agent(capabilities=["sql"]))
+    tasks = shards.task_board.post_tasks([
+        Task(title=f"t{i}", description="", required_capabilities=["sql"], reward_amount=10.0) for i in range(8)
+    ])
+    # Agents are replicated, so every shard can qualify bids locally.
+    assert {task.task_id for task in shards.qualification_engine.get_eligible_tasks(agent)} == {task.task_id for task in tasks}
+    results = shards.bidding_system.submit_bids(
+        [Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=9.0) for task in tasks]
+        + [Bid(task_id=tasks[0].task_id, agent_id=Agent(capabilities=[]).agent_id, bid_amount=1.0)]
+    )
+    assert results[:-1] == [None] * len(tasks)
+    assert str(results[-1]) == "Agent not found"
+
+    task = tasks[0]
+    assert shards.bidding_system.select_winner(task.task_id).agent_id == agent.agent_id
+    work = shards.work_verification_service.submit_work(WorkProduct(task_id=task.task_id, agent_id=agent.agent_id, deliverable={}))
+    verified = shards.work_verification_service.verify_work(work.work_id, 90.0)
+    assert verified.verification_status == VerificationStatus.PASSED
+    assert shards.task_board.get_task(task.task_id).status == TaskStatus.VERIFIED
+    with pytest.raises(ValueError):
+        shards.work_verification_service.verify_work(work.work_id, 90.0)
+
+    shards.reputation_ledger.record_success(agent.agent_id, 90.0)
+    assert [replica.completed_tasks for replica in shards.broadcast("get_agent", agent.agent_id)] == [1, 1]
+
+
+def test_pending_work_is_gathered_from_every_shard(shards):
+    agent = shards.agent_registry.register_agent(Agent(capabilities=["ocr"]))
+    tasks = shards.task_board.post_tasks([
+        Task(title=f"t{i}", description="", required_capabilities=["ocr"], reward_amount=1.0) for i in range(6)
+    ])
+    shards.bidding_system.submit_bids([Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=1.0) for task in tasks])
+    work = []
+    for task in tasks:
+        shards.bidding_system.select_winner(task.task_id)
+        work.append(shards.work_verification_service.submit_work(
+            WorkProduct(task_id=task.task_id, agent_id=agent.agent_id, deliverable={})
+        ))
+    shards.work_verification_service.verify_work(work[0].work_id, 90.0)
+    pending = {work_product.work_id: task for work_product, task in shards.work_verification_service.pending_work()}
+    assert {work_product.work_id for work_product in work[1:]} <= set(pending) and work[0].work_id not in pending
+    assert all(pending[work_product.work_id].task_id == work_product.task_id for work_product in work[1:])
+
+
+def test_shards_close_auctions_at_their_deadline(shards):
+    agent = shards.agent_registry.register_agent(Agent(capabilities=["timed"]))
+    tasks = shards.task_board.post_tasks([
+        Task(title=f"t{i}", description="", required_capabilities=["timed"], reward_amount=1.0,
+             bidding_deadline=time.time() + 0.3)
+        for i in range(6)
+    ])
+    shards.bidding_system.submit_bids([Bid(task_id=task.task_id, agent_id=agent.agent_id, bid_amount=1.0) for task in tasks])
+    deadline = time.monotonic() + 5
+    while any(shards.task_board.get_task(task.task_id).status != TaskStatus.ASSIGNED for task in tasks):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_event_relay_follows_every_shard(shards):
+    bus = EventBus()
+    relay = EventRelay(shards, bus, poll_seconds=0.05)
+    relay.start()
+    try:
+        tasks = shards.task_board.post_tasks([
+            Task(title=f"t{i}", description="", required_capabilities=["go"], reward_amount=1.0) for i in range(10)
+        ])
+        assert {shard_index(task.task_id, 2) for task in tasks} == {0, 1}
+        deadline = time.monotonic() + 5
+        while bus.last_id < len(tasks) and time.monotonic() < deadline:
+            bus.wait_blocking(bus.last_id, 0.1)
+    finally:
+        relay.close()
+    events, last_id, truncated = bus.events_after(0)
+    assert sorted(event["task"]["task_id"] for event in events) == sorted(str(task.task_id) for task in tasks)
+    assert [event["id"] for event in events] == list(range(1, 11)) and last_id == 10 and not truncated
+
+
+def test_shards_are_never_reached_without_an_authkey(monkeypatch):
+    from app.sharding import router_from_env
+
+    monkeypatch.setenv("AEGIS_SHARDS", "127.0.0.1:7600")
+    monkeypatch.delenv("AEGIS_SHARD_AUTHKEY", raising=False)
+    with pytest.raises(RuntimeError, match="AEGIS_SHARD_AUTHKEY"):
+        router_from_env()
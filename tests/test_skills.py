@@ -0,0 +1,21 @@
+import pytest
+from example_agent.skills import analyze_sales_data, analyze_sales_data_stream
+
+
+def test_streaming_sales_analysis_matches_in_memory():
+    pytest.importorskip("pandas")
+    data = "OrderID,SaleAmount,Region\n" + "".join(f"{i},{'' if i % 7 == 0 else i * 1.5},N\n" for i in range(1000))
+    expected = analyze_sales_data(data)
+    chunks = [data.encode()[i:i + 97] for i in range(0, len(data), 97)]
+    streamed = analyze_sales_data_stream(chunks, chunk_rows=64)
+    assert streamed["number_of_sales"] == expected["number_of_sales"] == 1000
+    assert streamed["total_sales"] == pytest.approx(expected["total_sales"])
+    assert streamed["average_sale"] == pytest.approx(expected["average_sale"])
+
+
+def test_sales_analysis_without_amounts_has_no_average():
+    pytest.importorskip("pandas")
+    data = "OrderID,SaleAmount,Region\n1,,N\n2,,S\n"
+    for result in (analyze_sales_data(data), analyze_sales_data_stream([data.encode()])):
+        assert result["status"] == "success"
+        assert result["average_sale"] is None and result["number_of_sales"] == 2